@@ -153,7 +153,8 @@ optional_dependencies = {'cthreeML': [False,'needed by HAWC plugin'],
                          'pymultinest': [False, 'provides the Multinest sampler for Bayesian analysis'],
                          'pyOpt': [False, 'provides more optimizers'],
                          'ROOT': [False, 'provides the ROOT optimizer'],
-                         'ipywidgets': [False, 'provides widget for jypyter (like the HTML progress bar)']}
+                         'ipywidgets': [False, 'provides widget for jypyter (like the HTML progress bar)'],
+                         'h5py': [False, 'provides the HDF5 format for analysis results']}
 
 for dep_name in optional_dependencies:
 
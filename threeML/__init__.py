@@ -1,10 +1,19 @@
+import os
+
+# Profile the import of threeML if requested (see get_import_times)
+
+from threeML.utils.import_profiler import import_profiler, get_import_times
+
+if os.environ.get('THREEML_PROFILE_IMPORTS') is not None:
+
+    import_profiler.start()
+
 # We import matplotlib first, because we need control on the backend
 # Indeed, if no DISPLAY variable is set, matplotlib 2.0 crashes (at the moment, 05/26/2017)
 import pandas as pd
 
 pd.set_option('max_columns', None)
 
-import os
 import warnings
 
 if os.environ.get('DISPLAY') is None:
@@ -19,9 +28,8 @@ from .io.serialization import *
 
 from .exceptions.custom_exceptions import custom_warnings
 
-import glob
-import imp
-import traceback
+import sys
+import types
 
 from version import __version__
 
@@ -49,146 +57,9 @@ except ImportError:
                          "the C/C++ interface (currently HAWC)",
                          custom_exceptions.CppInterfaceNotAvailable)
 
-# Now look for plugins
-
-# This verifies if a module is importable
-
-def is_module_importable(module_full_path):
-
-    try:
-
-        _ = imp.load_source('__', module_full_path)
-
-    except:
-
-        return False, traceback.format_exc()
-
-    else:
-
-        return True, '%s imported ok' % module_full_path
-
-plugins_dir = os.path.join(os.path.dirname(__file__), "plugins")
-
-found_plugins = glob.glob(os.path.join(plugins_dir, "*.py"))
-
-# Filter out __init__
-
-found_plugins = filter(lambda x: x.find("__init__") < 0, found_plugins)
-
-_working_plugins = {}
-_not_working_plugins = {}
-
-# Loop over each candidates plugins and check if it is importable
-
-for i, module_full_path in enumerate(found_plugins):
-
-    plugin_name = os.path.splitext(os.path.basename(module_full_path))[0]
-
-    is_importable, failure_traceback = is_module_importable(module_full_path)
-
-    if not is_importable:
-
-        custom_warnings.warn("Could not import plugin %s. Do you have the relative instrument software installed "
-                             "and configured?" % os.path.basename(module_full_path),
-                             custom_exceptions.CannotImportPlugin)
-
-        _not_working_plugins[plugin_name] = failure_traceback
-
-        continue
-
-    else:
-
-        # First get the instrument name
-        try:
-
-            exec("from threeML.plugins.%s import __instrument_name" % plugin_name)
-
-        except ImportError:
-
-            # This module does not contain a plugin, continue
-            continue
-
-        # Now import the plugin itself
-
-        import_command = "from threeML.plugins.%s import %s" % (plugin_name, plugin_name)
-
-        try:
-
-            exec(import_command)
-
-        except ImportError:
-
-            pass
-
-        else:
-
-            _working_plugins[__instrument_name] = plugin_name
-
-
-# Now some convenience functions
-
-def get_available_plugins():
-    """
-    Print a list of available plugins
-
-    :return:
-    """
-    print("Available plugins:\n")
-
-    for instrument, class_name in _working_plugins.items():
-
-        print("%s for %s" % (class_name, instrument))
-
-
-def _display_plugin_traceback(plugin):
-
-    print("#############################################################")
-    print("\nCouldn't import plugin %s" % plugin)
-    print("\nTraceback:\n")
-    print(_not_working_plugins[plugin])
-    print("#############################################################")
-
-
-def is_plugin_available(plugin):
-    """
-    Test whether the plugin for the provided instrument is available
-
-    :param plugin: the name of the plugin class
-    :return: True or False
-    """
-
-    if plugin in _working_plugins.values():
-
-        # FIXME
-        if plugin == "FermipyLike":
-
-            try:
-
-                _ = FermipyLike.__new__(FermipyLike, test=True)
-
-            except:
-
-                # Do not register it
-
-                _not_working_plugins[plugin] = traceback.format_exc()
-
-                _display_plugin_traceback(plugin)
-
-                return False
-
-        return True
-
-    else:
-
-        if plugin in _not_working_plugins:
-
-            _display_plugin_traceback(plugin)
+# Plugins are imported the first time they are used (see the end of this file)
 
-            return False
-
-        else:
-
-            raise RuntimeError("Plugin %s is not known" % plugin)
+from .plugin_registry import get_plugin_names, get_plugin_class, get_available_plugins, is_plugin_available
 
 # Import the classic Maximum Likelihood Estimation package
 
@@ -209,7 +80,8 @@ from threeML.io.plotting.post_process_data_plots import display_spectrum_model_c
     display_photometry_model_magnitudes
 
 # Import the joint likelihood set
-from .classicMLE.joint_likelihood_set import JointLikelihoodSet, JointLikelihoodSetAnalyzer
+from .classicMLE.joint_likelihood_set import JointLikelihoodSet, JointLikelihoodSetAnalyzer, \
+    load_joint_likelihood_set_checkpoint
 from .classicMLE.likelihood_ratio_test import LikelihoodRatioTest
 from .classicMLE.goodness_of_fit import GoodnessOfFit
 
@@ -283,3 +155,52 @@ for var in var_to_check:
 
         custom_warnings.warn("Env. variable %s is not set. Please set it to 1 for optimal performances in 3ML" % var,
                              RuntimeWarning)
+
+if os.environ.get('THREEML_PROFILE_IMPORTS') is not None:
+
+    import_profiler.stop()
+
+
+class _ThreeMLModule(types.ModuleType):
+    """
+    The threeML package, which imports plugins on first access (threeML.OGIPLike, from threeML import OGIPLike), so
+    that "import threeML" does not import any plugin. A star import (from threeML import *) exports every plugin which
+    can be imported, so it imports all of them (as it always did)
+    """
+
+    def __getattr__(self, name):
+
+        # This is called only if the attribute was not found in the normal way
+
+        if name in get_plugin_names():
+
+            plugin_class = get_plugin_class(name)
+
+            if plugin_class is not None:
+
+                setattr(self, name, plugin_class)
+
+                return plugin_class
+
+            raise AttributeError("Plugin %s is not available. Use is_plugin_available('%s') to see why" % (name, name))
+
+        raise AttributeError("'module' object has no attribute '%s'" % name)
+
+    @property
+    def __all__(self):
+
+        public_names = [name for name in self.__dict__ if not name.startswith("_")]
+
+        plugins = [name for name in get_plugin_names() if get_plugin_class(name) is not None]
+
+        return sorted(set(public_names + plugins))
+
+
+# Replace this module with the lazy one. Keep a reference to the original module, otherwise Python would clear
+# its globals (which are used by the functions defined here)
+
+_lazy_module = _ThreeMLModule(__name__, __doc__)
+_lazy_module.__dict__.update(globals())
+_lazy_module._original_module = sys.modules[__name__]
+
+sys.modules[__name__] = _lazy_module
@@ -3,6 +3,7 @@ import datetime
 import functools
 import inspect
 import math
+import os
 
 import astromodels
 import astropy.units as u
@@ -25,6 +26,18 @@ else:
 
     has_chainconsumer = True
 
+try:
+
+    import h5py
+
+except ImportError:
+
+    has_h5py = False
+
+else:
+
+    has_h5py = True
+
 from threeML.exceptions.custom_exceptions import custom_warnings
 from threeML.io.file_utils import sanitize_filename
 from threeML.io.fits_file import fits, FITSFile, FITSExtension
@@ -60,57 +73,92 @@ def load_analysis_results(fits_file):
     """
     Load the results of one or more analysis from a FITS file produced by 3ML
 
-    :param fits_file: path to the FITS file containing the results, as output by MLEResults or BayesianResults
-    :return: a new instance of either MLEResults or Bayesian results dending on the type of the input FITS file
+    A file with a set of results is read lazily: the summary of the parameters of all results is read immediately (see
+    AnalysisResultsSet.get_summary_frame), while each result (with its model and its samples) is built only when it
+    is accessed for the first time. The samples are read from the file (memory-mapped) as they are needed, so the file
+    is kept open until the set is closed. Close it with its close() method, or use it as a context manager:
+
+        with load_analysis_results("results.fits") as results:
+
+            ...
+
+    A file with only one result is read immediately and closed.
+
+    Files in the HDF5 format (see AnalysisResultsHDF5) are recognized automatically and read in the same way.
+
+    :param fits_file: path to the FITS (or HDF5) file containing the results, as output by MLEResults or
+    BayesianResults
+    :return: a new instance of either MLEResults or Bayesian results dending on the type of the input FITS file, or
+    an AnalysisResultsSet
     """
 
-    with fits.open(fits_file) as f:
+    if has_h5py and h5py.is_hdf5(sanitize_filename(fits_file)):
+
+        return _load_results_from_hdf5(fits_file)
+
+    f = fits.open(fits_file, memmap=True)
+
+    n_results = map(lambda x: x.name, f).count('ANALYSIS_RESULTS')
 
-        n_results = map(lambda x: x.name, f).count('ANALYSIS_RESULTS')
+    if n_results == 1:
 
-        if n_results == 1:
+        try:
 
             return _load_one_results(f['ANALYSIS_RESULTS', 1])
 
-        else:
+        finally:
 
-            return _load_set_of_results(f, n_results)
+            f.close()
 
+    else:
 
-def _load_one_results(fits_extension):
-    # Gather analysis type
-    analysis_type = fits_extension.header.get("RESUTYPE")
+        return _load_set_of_results(f, n_results)
 
-    # Gather the optimized model
-    serialized_model = _escape_back_yaml_from_fits(fits_extension.header.get("MODEL"))
-    model_dict = my_yaml.load(serialized_model)
 
-    optimized_model = ModelParser(model_dict=model_dict).get_model()
+def _get_statistic_values(header):
+    """
+    Read the values of the statistic for each plugin (STATi and PNi keywords) and the statistical measures (MEASi and
+    MVi keywords) from the header of an ANALYSIS_RESULTS extension
+
+    :param header: the header
+    :return: (statistic values, statistical measures) as ordered dictionaries
+    """
 
-    # Gather statistics values
     statistic_values = collections.OrderedDict()
 
+    i = 0
+
+    while "STAT%i" % i in header:
+
+        statistic_values[header["PN%i" % i]] = float(header["STAT%i" % i])
+
+        i += 1
+
     measure_values = collections.OrderedDict()
 
-    for key in fits_extension.header.keys():
+    i = 0
+
+    while "MEAS%i" % i in header:
+
+        measure_values[header["MEAS%i" % i]] = float(header["MV%i" % i])
 
-        if key.find("STAT") == 0:
-            # Found a keyword with a statistic for a plugin
-            # Gather info about it
+        i += 1
 
-            id = int(key.replace("STAT", ""))
-            value = float(fits_extension.header.get(key))
-            name = fits_extension.header.get("PN%i" % id)
-            statistic_values[name] = value
+    return statistic_values, measure_values
 
-        if key.find("MEAS") == 0:
-            # Found a keyword with a statistic for a plugin
-            # Gather info about it
 
-            id = int(key.replace("MEAS", ""))
-            name = fits_extension.header.get(key)
-            value = float(fits_extension.header.get("MV%i" % id))
-            measure_values[name] = value
+def _load_one_results(fits_extension):
+    # Gather analysis type
+    analysis_type = fits_extension.header.get("RESUTYPE")
+
+    # Gather the optimized model
+    serialized_model = _escape_back_yaml_from_fits(fits_extension.header.get("MODEL"))
+    model_dict = my_yaml.load(serialized_model)
+
+    optimized_model = ModelParser(model_dict=model_dict).get_model()
+
+    # Gather statistics values
+    statistic_values, measure_values = _get_statistic_values(fits_extension.header)
 
     if analysis_type == "MLE":
 
@@ -132,14 +180,51 @@ def _load_one_results(fits_extension):
         return BayesianResults(optimized_model, samples.T, statistic_values, statistical_measures=measure_values)
 
 
+def _get_summary_frame(fits_extensions):
+    """
+    Build the summary of the parameters of a set of results from the columns of their ANALYSIS_RESULTS extensions,
+    without building the results themselves
+
+    :param fits_extensions: list of ANALYSIS_RESULTS extensions
+    :return: a pandas DataFrame (see AnalysisResultsSet.get_summary_frame)
+    """
+
+    frames = []
+
+    for fits_extension in fits_extensions:
+
+        data = fits_extension.data
+
+        columns = collections.OrderedDict()
+
+        columns['value'] = np.array(data.field('VALUE'), float)
+        columns['negative_error'] = np.array(data.field('NEGATIVE_ERROR'), float)
+        columns['positive_error'] = np.array(data.field('POSITIVE_ERROR'), float)
+        columns['error'] = np.array(data.field('ERROR'), float)
+        columns['unit'] = map(str, data.field('UNIT'))
+
+        frame = pd.DataFrame(columns, index=map(str, data.field('NAME')))
+
+        frames.append(frame)
+
+    return pd.concat(frames, keys=range(len(frames)), names=['result', 'parameter'])
+
+
 def _load_set_of_results(open_fits_file, n_results):
-    # Gather all results
-    all_results = []
 
-    for i in range(n_results):
-        all_results.append(_load_one_results(open_fits_file['ANALYSIS_RESULTS', i + 1]))
+    # (the extensions are written in order of EXTVER)
+
+    results_extensions = [hdu for hdu in open_fits_file if hdu.name == 'ANALYSIS_RESULTS']
+
+    assert len(results_extensions) == n_results
+
+    this_set = AnalysisResultsSet([functools.partial(_load_one_results, ext) for ext in results_extensions])
 
-    this_set = AnalysisResultsSet(all_results)
+    this_set._summary_frame = _get_summary_frame(results_extensions)
+
+    # Keep the file open, the results will read from it when they are accessed
+
+    this_set._open_fits_file = open_fits_file
 
     # Now gather the SEQUENCE extension and set the characterization frame accordingly
 
@@ -150,21 +235,152 @@ def _load_set_of_results(open_fits_file, n_results):
     # Build the data tuple
     record = sequence_ext.data
 
+    columns = [(column.name, record[column.name], column.unit) for column in record.columns]
+
+    this_set.characterize_sequence(seq_type, _get_sequence_tuple(columns))
+
+    return this_set
+
+
+def _get_sequence_tuple(columns):
+    """
+    Build the data tuple for AnalysisResultsSet.characterize_sequence
+
+    :param columns: list of (name, values, unit or None)
+    :return: tuple of (name, values), where values are astropy Quantities if they have units
+    """
+
     data_list = []
 
-    for column in record.columns:
+    for name, values, unit in columns:
+
+        if unit is None:
+
+            data_list.append((name, values))
+
+        else:
+
+            data_list.append((name, values * u.Unit(unit)))
+
+    return tuple(data_list)
+
+
+def _read_hdf5_strings(dataset):
+
+    return map(str, dataset[()])
 
-        if column.unit is None:
 
-            this_tuple = (column.name, record[column.name])
+def _load_results_from_hdf5(filename):
+    """
+    Load the results written by AnalysisResultsHDF5. As for FITS files, a set of results is read lazily
+
+    :param filename: the HDF5 file
+    :return: an instance of MLEResults or BayesianResults, or an AnalysisResultsSet
+    """
+
+    f = h5py.File(sanitize_filename(filename), "r")
+
+    results_group = f['results']
+
+    analysis_types = _read_hdf5_strings(results_group['analysis_type'])
+    model_ids = results_group['model'][()]
+    model_rows = results_group['model_row'][()]
+
+    n_results = len(analysis_types)
+
+    # Read the columnar tables of statistics and measures at once, and split them among the results
+
+    statistic_values = [collections.OrderedDict() for _ in range(n_results)]
+    measure_values = [collections.OrderedDict() for _ in range(n_results)]
+
+    for table_name, destination in (('statistics', statistic_values), ('measures', measure_values)):
+
+        if table_name in f:
+
+            table = f[table_name]
+
+            for result_id, name, value in zip(table['result'][()], _read_hdf5_strings(table['name']),
+                                              table['value'][()]):
+
+                destination[result_id][name] = float(value)
+
+    # The model of each structure is parsed only once (the first time it is needed)
+
+    models = {}
+
+    def load_one(i):
+
+        model_id = model_ids[i]
+
+        model_group = f['models/%i' % model_id]
+
+        if model_id not in models:
+
+            model_dict = my_yaml.load(str(model_group['yaml'][()]))
+
+            models[model_id] = ModelParser(model_dict=model_dict).get_model()
+
+        model = models[model_id]
+
+        # Apply the values of the parameters for this result (the results make a copy of the model)
+
+        for path, value in zip(_read_hdf5_strings(model_group['parameters']), model_group['values'][model_rows[i]]):
+
+            model.parameters[path].value = value
+
+        if analysis_types[i] == "MLE":
+
+            covariance_matrix = np.atleast_2d(f['covariance/%i' % i][()])
+
+            return MLEResults(model, covariance_matrix, statistic_values[i], statistical_measures=measure_values[i])
 
         else:
 
-            this_tuple = (column.name, record[column.name] * u.Unit(column.unit))
+            samples = f['samples/%i' % i][()]
+
+            return BayesianResults(model, samples, statistic_values[i], statistical_measures=measure_values[i])
+
+    if n_results == 1:
+
+        try:
+
+            return load_one(0)
+
+        finally:
+
+            f.close()
+
+    this_set = AnalysisResultsSet([functools.partial(load_one, i) for i in range(n_results)])
+
+    # Summary of the parameters
+
+    parameters = f['parameters']
+
+    summary_columns = collections.OrderedDict()
+
+    for column in ('value', 'negative_error', 'positive_error', 'error'):
+
+        summary_columns[column] = parameters[column][()]
 
-        data_list.append(this_tuple)
+    summary_columns['unit'] = _read_hdf5_strings(parameters['unit'])
 
-    this_set.characterize_sequence(seq_type, tuple(data_list))
+    index = pd.MultiIndex.from_arrays([parameters['result'][()], _read_hdf5_strings(parameters['name'])],
+                                      names=['result', 'parameter'])
+
+    this_set._summary_frame = pd.DataFrame(summary_columns, index=index)
+
+    # Keep the file open, the results will read from it when they are accessed
+
+    this_set._open_hdf5_file = f
+
+    if 'sequence' in f:
+
+        sequence_group = f['sequence']
+
+        columns = [(str(name), sequence_group[name][()], sequence_group[name].attrs.get('unit'))
+                   for name in sequence_group.attrs['columns']]
+
+        this_set.characterize_sequence(str(sequence_group.attrs['name']), _get_sequence_tuple(columns))
 
     return this_set
 
@@ -333,6 +549,323 @@ class AnalysisResultsFITS(FITSFile):
         self._hdu_list[0].header.set("ORIGIN", "3ML", comment=('Multi-Mission Max. Likelihood v. %s' % __version__))
 
 
+def _get_model_structure(model_dict):
+    """
+    Returns a copy of the dictionary of a model where the values of the parameters have been removed. Two models with
+    the same structure differ only for the values of their parameters
+
+    :param model_dict: the dictionary of the model (as from to_dict_with_types)
+    :return: the dictionary without values
+    """
+
+    structure = collections.OrderedDict()
+
+    for key, value in model_dict.items():
+
+        if isinstance(value, dict):
+
+            if 'value' in value and 'free' in value and isinstance(value['value'], (int, float)):
+
+                # This is a parameter
+
+                value = collections.OrderedDict(value)
+                value['value'] = None
+
+            else:
+
+                value = _get_model_structure(value)
+
+        structure[key] = value
+
+    return structure
+
+
+def _append_to_hdf5_column(group, name, values, dtype):
+    """
+    Append values to a resizable one-dimensional dataset, creating it if needed
+
+    :param group: the HDF5 group containing the dataset
+    :param name: name of the dataset
+    :param values: values to append
+    :param dtype: type of the dataset
+    :return: none
+    """
+
+    if len(values) == 0:
+
+        return
+
+    values = np.array(values, dtype=object if dtype is str else dtype)
+
+    if name not in group:
+
+        group.create_dataset(name, data=values, maxshape=(None,), chunks=True,
+                             dtype=h5py.special_dtype(vlen=str) if dtype is str else dtype)
+
+    else:
+
+        dataset = group[name]
+
+        n_existing = dataset.shape[0]
+
+        dataset.resize(n_existing + len(values), axis=0)
+
+        dataset[n_existing:] = values
+
+
+class AnalysisResultsHDF5(object):
+    """
+    A HDF5 file for storing one or more results from 3ML analysis. Results are written one at a time with append(),
+    so a long sequence of analysis can stream its results to disk. An existing file can be opened with append=True
+    to add more results to it. load_analysis_results reads these files.
+
+    Content of the file:
+
+    * models/<k>: the models, stored once for each structure (models differing only for the values of their parameters
+      have the same structure). Each has the YAML serialization of the model, the paths of its parameters and a table
+      of the values of the parameters with one row for each result using that model
+    * results: analysis type, model and row in the table of values for each result
+    * covariance/<i> (MLE) or samples/<i> (Bayesian): for each result, samples are in a chunked and compressed dataset
+    * statistics, measures: columnar tables (result, name, value) of the statistic values and statistical measures
+    * parameters: columnar table of the best fit values and the (equal-tail) errors of the free parameters
+    * sequence: the characterization of the sequence of results, if any (see AnalysisResultsSet.characterize_sequence)
+
+    :param filename: name of the file
+    :param overwrite: overwrite the file if it exists
+    :param append: add the results to the existing file, if any
+    """
+
+    def __init__(self, filename, overwrite=False, append=False):
+
+        assert has_h5py, "You need to install h5py to use the HDF5 format for the results"
+
+        filename = sanitize_filename(filename)
+
+        if os.path.exists(filename) and not overwrite and not append:
+
+            raise IOError("File %s already exists. Use overwrite=True or append=True" % filename)
+
+        self._file = h5py.File(filename, "a" if append else "w")
+
+        if not append or 'results' not in self._file:
+
+            self._file.attrs['ORIGIN'] = '3ML v. %s' % __version__
+            self._file.attrs['DATE'] = datetime.datetime.now().isoformat()
+
+            self._file.create_group('results')
+
+        self._n_results = self._file['results']['analysis_type'].shape[0] \
+            if 'analysis_type' in self._file['results'] else 0
+
+        self._repair()
+
+        # Structures of the models already in the file
+
+        self._model_structures = {}
+
+        if 'models' in self._file:
+
+            for model_id in self._file['models']:
+
+                self._model_structures[str(self._file['models'][model_id]['structure'][()])] = int(model_id)
+
+    def _repair(self):
+        """
+        Remove what was written by an append() which was interrupted (for example by a crash) before completing
+
+        :return: none
+        """
+
+        f = self._file
+        n = self._n_results
+
+        for name in ('model', 'model_row'):
+
+            if name in f['results'] and f['results'][name].shape[0] > n:
+
+                f['results'][name].resize(n, axis=0)
+
+        for group_name in ('covariance', 'samples'):
+
+            if group_name in f:
+
+                for name in list(f[group_name]):
+
+                    if int(name) >= n:
+
+                        del f[group_name][name]
+
+        for table_name in ('statistics', 'measures', 'parameters'):
+
+            if table_name in f and 'result' in f[table_name]:
+
+                table = f[table_name]
+
+                n_rows = int(np.sum(table['result'][()] < n))
+
+                for name in table:
+
+                    if table[name].shape[0] > n_rows:
+
+                        table[name].resize(n_rows, axis=0)
+
+    @property
+    def n_results(self):
+
+        return self._n_results
+
+    def append(self, analysis_results):
+        """
+        Write one result in the file
+
+        :param analysis_results: an instance of MLEResults or BayesianResults
+        :return: none
+        """
+
+        f = self._file
+        i = self._n_results
+
+        optimized_model = analysis_results.optimized_model
+
+        model_dict = optimized_model.to_dict_with_types()
+
+        structure = my_yaml.dump(_get_model_structure(model_dict))
+
+        # The values of the parameters which are not linked to other parameters are stored for each result
+
+        parameters = [(path, parameter) for path, parameter in optimized_model.parameters.items()
+                      if not parameter.has_auxiliary_variable()]
+
+        values = np.array([parameter.value for _, parameter in parameters], dtype=float)
+
+        if structure not in self._model_structures:
+
+            model_id = len(self._model_structures)
+
+            model_group = f.create_group('models/%i' % model_id)
+
+            model_group.create_dataset('yaml', data=my_yaml.dump(model_dict))
+            model_group.create_dataset('structure', data=structure)
+            model_group.create_dataset('parameters', data=np.array([path for path, _ in parameters], dtype=object),
+                                       dtype=h5py.special_dtype(vlen=str))
+            model_group.create_dataset('values', shape=(0, len(values)), maxshape=(None, len(values)),
+                                       dtype=float, chunks=True)
+
+            self._model_structures[structure] = model_id
+
+        model_id = self._model_structures[structure]
+
+        values_dataset = f['models/%i/values' % model_id]
+
+        model_row = values_dataset.shape[0]
+
+        values_dataset.resize(model_row + 1, axis=0)
+        values_dataset[model_row] = values
+
+        # Covariance or samples
+
+        if analysis_results.analysis_type == "MLE":
+
+            f.create_dataset('covariance/%i' % i, data=analysis_results.covariance_matrix)
+
+        else:
+
+            # (the samples are stored as n_samples x n_parameters)
+
+            f.create_dataset('samples/%i' % i, data=np.asarray(analysis_results.samples).T, chunks=True,
+                             compression='gzip', shuffle=True)
+
+        # Columnar tables
+
+        for table_name, series in (('statistics', analysis_results.optimal_statistic_values),
+                                   ('measures', analysis_results.statistical_measures)):
+
+            table = f.require_group(table_name)
+
+            _append_to_hdf5_column(table, 'result', [i] * len(series), int)
+            _append_to_hdf5_column(table, 'name', map(str, series.index), str)
+            _append_to_hdf5_column(table, 'value', series.values, float)
+
+        data_frame = analysis_results.get_data_frame(error_type="equal tail")
+
+        table = f.require_group('parameters')
+
+        _append_to_hdf5_column(table, 'result', [i] * data_frame.shape[0], int)
+        _append_to_hdf5_column(table, 'name', map(str, data_frame.index), str)
+
+        for column in ('value', 'negative_error', 'positive_error', 'error'):
+
+            _append_to_hdf5_column(table, column, data_frame[column].values, float)
+
+        _append_to_hdf5_column(table, 'unit', map(str, data_frame['unit'].values), str)
+
+        # The analysis type is written last: a result is in the file only when this has been written (see _repair)
+
+        results_group = f['results']
+
+        _append_to_hdf5_column(results_group, 'model', [model_id], int)
+        _append_to_hdf5_column(results_group, 'model_row', [model_row], int)
+        _append_to_hdf5_column(results_group, 'analysis_type', [analysis_results.analysis_type], str)
+
+        self._n_results += 1
+
+        # Make sure that what has been written so far is on disk
+
+        f.flush()
+
+    def set_sequence(self, name, data_tuple):
+        """
+        Write the characterization of the sequence of results (see AnalysisResultsSet.characterize_sequence)
+
+        :param name: name of the sequence
+        :param data_tuple: tuple of (column name, values), where values can be astropy Quantities
+        :return: none
+        """
+
+        if 'sequence' in self._file:
+
+            del self._file['sequence']
+
+        sequence_group = self._file.create_group('sequence')
+
+        sequence_group.attrs['name'] = str(name)
+        sequence_group.attrs['columns'] = np.array([str(column_name) for column_name, _ in data_tuple])
+
+        for column_name, values in data_tuple:
+
+            if isinstance(values, u.Quantity):
+
+                dataset = sequence_group.create_dataset(column_name, data=values.value)
+                dataset.attrs['unit'] = str(values.unit)
+
+            else:
+
+                sequence_group.create_dataset(column_name, data=np.asarray(values))
+
+    def close(self):
+
+        self._file.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.close()
+
+
+def _is_hdf5_filename(filename):
+    """
+    Results are written in the HDF5 format when the file has one of these extensions: .h5, .hdf5, .hdf
+
+    :param filename: name of the file
+    :return: True or False
+    """
+
+    return os.path.splitext(filename)[1].lower() in ('.h5', '.hdf5', '.hdf')
+
+
 class _AnalysisResults(object):
     """
     A unified class to store results from a maximum likelihood or a Bayesian analysis, which provides a unique interface
@@ -404,13 +937,22 @@ class _AnalysisResults(object):
 
     def write_to(self, filename, overwrite=False):
         """
-        Write results to a FITS file
+        Write results to a FITS file, or to a HDF5 file if the name ends in .h5, .hdf5 or .hdf (see
+        AnalysisResultsHDF5)
 
         :param filename:
         :param overwrite:
         :return: None
         """
 
+        if _is_hdf5_filename(filename):
+
+            with AnalysisResultsHDF5(filename, overwrite=overwrite) as hdf5_file:
+
+                hdf5_file.append(self)
+
+            return
+
         fits_file = AnalysisResultsFITS(self)
 
         fits_file.writeto(sanitize_filename(filename), overwrite=overwrite)
@@ -670,7 +1212,7 @@ class _AnalysisResults(object):
 
     def get_point_source_flux(self, ene_min, ene_max, sources=(), confidence_level=0.68,
                               flux_unit='erg/(s cm2)', use_components=False, components_to_use=(),
-                              sum_sources=False):
+                              sum_sources=False, use_cache=False):
         """
 
         :param ene_min: minimum energy (an astropy quantity, like 1.0 * u.keV. You can also use a frequency, like
@@ -684,6 +1226,7 @@ class _AnalysisResults(object):
         :param use_components: plot the components of each source (default: False)
         :param components_to_use: (optional) list of string names of the components to plot: including 'total'
         :param sum_sources: (optional) if True, also the sum of all sources will be plotted
+        :param use_cache: (optional) if True, read/write the propagated fluxes from/to the on-disk cache
         :return:
         """
 
@@ -701,6 +1244,7 @@ class _AnalysisResults(object):
             'components_to_use': components_to_use,
             'sources_to_use': sources,
             'sum_sources': sum_sources,
+            'use_cache': use_cache,
 
         }
 
@@ -1281,16 +1825,99 @@ class AnalysisResultsSet(collections.Sequence):
 
     def __init__(self, results):
 
-        self._results = results
+        # Elements can also be functions returning the result (used when reading from file), which are called when
+        # the result is accessed for the first time
+
+        self._results = list(results)
+
+        self._summary_frame = None
+
+        # Files the results are read from (see load_analysis_results), and other sets these results come from
+
+        self._open_fits_file = None
+        self._open_hdf5_file = None
+        self._source_sets = []
+
+        self._is_closed = False
 
     def __getitem__(self, item):
 
-        return self._results[item]
+        if isinstance(item, slice):
+
+            return [self[i] for i in range(*item.indices(len(self)))]
+
+        result = self._results[item]
+
+        if callable(result):
+
+            if self._is_closed:
+
+                raise RuntimeError("Result %s has not been read from the file before the set was closed" % item)
+
+            result = result()
+
+            self._results[item] = result
+
+        return result
 
     def __len__(self):
 
         return len(self._results)
 
+    def close(self):
+        """
+        Close the file this set has been read from (see load_analysis_results), if any. The results which have
+        already been accessed remain available, while the others cannot be read anymore.
+
+        The set can also be used as a context manager (with load_analysis_results(filename) as results: ...), which
+        closes it at the end.
+
+        :return: none
+        """
+
+        if self._open_fits_file is not None:
+
+            self._open_fits_file.close()
+
+            self._open_fits_file = None
+
+        if self._open_hdf5_file is not None:
+
+            self._open_hdf5_file.close()
+
+            self._open_hdf5_file = None
+
+        for source_set in self._source_sets:
+
+            source_set.close()
+
+        self._is_closed = True
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.close()
+
+    def get_summary_frame(self):
+        """
+        Returns a summary of the parameters of all the results (with equal-tail errors), as a pandas DataFrame
+        indexed by the number of the result and the path of the parameter. For a set read from file this does not
+        need to build any of the results.
+
+        :return: a pandas DataFrame with columns value, negative_error, positive_error, error and unit
+        """
+
+        if self._summary_frame is None:
+
+            frames = [result.get_data_frame(error_type="equal tail") for result in self]
+
+            self._summary_frame = pd.concat(frames, keys=range(len(frames)), names=['result', 'parameter'])
+
+        return self._summary_frame
+
     def set_x(self, name, x, unit=None):
         """
         Associate the provided x with these results. The values in x will be written in the SEQUENCE extension when
@@ -1372,7 +1999,8 @@ class AnalysisResultsSet(collections.Sequence):
 
     def write_to(self, filename, overwrite=False):
         """
-        Write this set of results to a FITS file.
+        Write this set of results to a FITS file, or to a HDF5 file if the name ends in .h5, .hdf5 or .hdf (see
+        AnalysisResultsHDF5).
 
         :param filename: name for the output file
         :param overwrite: True or False
@@ -1387,6 +2015,18 @@ class AnalysisResultsSet(collections.Sequence):
 
             self.characterize_sequence("unspecified", frame_tuple)
 
+        if _is_hdf5_filename(filename):
+
+            with AnalysisResultsHDF5(filename, overwrite=overwrite) as hdf5_file:
+
+                for analysis_results in self:
+
+                    hdf5_file.append(analysis_results)
+
+                hdf5_file.set_sequence(self._sequence_name, self._sequence_tuple)
+
+            return
+
         fits = AnalysisResultsFITS(*self, sequence_tuple=self._sequence_tuple, sequence_name=self._sequence_name)
 
         fits.writeto(sanitize_filename(filename), overwrite=overwrite)
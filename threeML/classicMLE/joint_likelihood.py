@@ -384,6 +384,15 @@ class JointLikelihood(object):
                     'log=(True,False)' specify that the steps for the first parameter are to be taken logarithmically,
                     while they are linear for the second parameter. If you are generating the profile for only one
                     parameter, you can specify 'log=(True,)' or 'log=(False,)' (optional)
+        :param adaptive: if True, start from a coarse grid and recursively refine only the cells crossing the 1, 2
+                    and 3 sigma levels (or the levels given with delta_log_like_levels), warm-starting each profile
+                    fit from the nearest solved node. The nodes which are not profiled are interpolated. The
+                    adaptive mode always runs in the current process, even if parallel computation is active, so
+                    the number of steps is never reduced (optional, default: False)
+        :param delta_log_like_levels: differences in -log(likelihood) with respect to the minimum to be resolved in
+                    adaptive mode (optional)
+        :param n_initial_steps: number of steps per parameter for the initial coarse grid in adaptive mode (optional,
+                    default: 9)
         :return: a tuple containing an array corresponding to the steps for the first parameter, an array corresponding
                  to the steps for the second parameter (or None if stepping only in one direction), a matrix of size
                  param_1_steps x param_2_steps containing the value of the function at the corresponding points in the
@@ -451,7 +460,7 @@ class JointLikelihood(object):
 
         # Check whether we are parallelizing or not
 
-        if not threeML_config['parallel']['use-parallel']:
+        if not threeML_config['parallel']['use-parallel'] or options.get('adaptive', False):
 
             a, b, cc = self.minimizer.contours(param_1, param_1_minimum, param_1_maximum, param_1_n_steps,
                                                param_2, param_2_minimum, param_2_maximum, param_2_n_steps,
@@ -1,4 +1,7 @@
+import collections
+import functools
 import logging
+import os
 import numpy as np
 import warnings
 
@@ -9,12 +12,18 @@ from threeML.parallel.parallel_client import ParallelClient
 from threeML.config.config import threeML_config
 from threeML.data_list import DataList
 from threeML.io.progress_bar import progress_bar
-from threeML.analysis_results import AnalysisResultsSet
+from threeML.analysis_results import AnalysisResultsSet, AnalysisResultsHDF5, load_analysis_results, has_h5py, \
+    _append_to_hdf5_column
+from threeML.io.file_utils import sanitize_filename, if_directory_not_existing_then_make
 from threeML.minimizer.minimization import _Minimization, LocalMinimization, _minimizers
 
 from astromodels import Model
 import pandas as pd
 
+if has_h5py:
+
+    import h5py
+
 
 class JointLikelihoodSet(object):
 
@@ -198,7 +207,26 @@ class JointLikelihoodSet(object):
 
         return model_results, logl_results
 
-    def go(self, continue_on_failure=True, compute_covariance=False, verbose=False, **options_for_parallel_computation):
+    def go(self, continue_on_failure=True, compute_covariance=False, verbose=False, checkpoint=None,
+           **options_for_parallel_computation):
+        """
+        Run the analysis for all the iterations
+
+        :param continue_on_failure: if True, a failed fit does not stop the whole set
+        :param compute_covariance: whether to compute the covariance matrix of each fit
+        :param verbose: print information
+        :param checkpoint: (optional) a directory where the result of each iteration is stored as soon as it is
+        completed (see JointLikelihoodSetCheckpoint). If the directory already contains results (for example from a
+        run which crashed), only the missing iterations are computed. The results are then read lazily from the
+        directory, instead of being kept in memory
+        :param options_for_parallel_computation: options for the ParallelClient
+        :return: a data frame with the parameters and one with the likelihood values of all iterations
+        """
+
+        if checkpoint is not None:
+
+            return self._go_with_checkpoint(checkpoint, continue_on_failure, compute_covariance, verbose,
+                                            **options_for_parallel_computation)
 
         # Generate the data frame which will contain all results
 
@@ -255,6 +283,74 @@ class JointLikelihoodSet(object):
 
         return parameter_frames, like_frames
 
+    def _go_with_checkpoint(self, directory, continue_on_failure, compute_covariance, verbose,
+                            **options_for_parallel_computation):
+
+        if verbose:
+
+            log.setLevel(logging.INFO)
+
+        self._continue_on_failure = continue_on_failure
+
+        self._compute_covariance = compute_covariance
+
+        # Release the results of a previous run, which might keep the files of the checkpoint open
+
+        if self._all_results is not None:
+
+            for results_set in self._all_results:
+
+                results_set.close()
+
+            self._all_results = None
+
+        checkpoint = JointLikelihoodSetCheckpoint(directory, self._n_models, self._n_iterations)
+
+        try:
+
+            iterations = [i for i in range(self._n_iterations) if i not in checkpoint.completed_iterations]
+
+            if len(iterations) < self._n_iterations:
+
+                log.info("Resuming from %s: %i iterations out of %i already completed" % (directory,
+                                                                                         self._n_iterations -
+                                                                                         len(iterations),
+                                                                                         self._n_iterations))
+
+            if threeML_config['parallel']['use-parallel']:
+
+                # Parallel computation. Each result is stored as soon as it is available
+
+                client = ParallelClient(**options_for_parallel_computation)
+
+                for position, result in client.iterate_with_progress_bar(self.worker, iterations):
+
+                    checkpoint.append(iterations[position], result)
+
+            else:
+
+                # Serial computation
+
+                with progress_bar(len(iterations), title='Fitting the joint likelihood set') as p:
+
+                    for i in iterations:
+
+                        checkpoint.append(i, self.worker(i))
+
+                        p.increase()
+
+        finally:
+
+            checkpoint.close()
+
+        parameter_frames, like_frames, self._all_results = load_joint_likelihood_set_checkpoint(directory)
+
+        assert len(self._all_results[0]) == self._n_iterations, "Something went wrong, I have %s results " \
+                                                                "for %s intervals" % (len(self._all_results[0]),
+                                                                                      self._n_iterations)
+
+        return parameter_frames, like_frames
+
     @property
     def results(self):
         """
@@ -296,6 +392,338 @@ class JointLikelihoodSet(object):
             this_results.write_to(filenames[i], overwrite=overwrite)
 
 
+def _truncate_hdf5_columns(group, n_rows):
+
+    for name in group:
+
+        if group[name].shape[0] > n_rows:
+
+            group[name].resize(n_rows, axis=0)
+
+
+def _append_frame_to_hdf5(group, record, frame):
+    """
+    Append a data frame to a columnar table in a HDF5 group. The index of the frame is stored as columns, and each
+    row is tagged with the record it belongs to
+
+    :param group: the HDF5 group
+    :param record: the id of the record
+    :param frame: the data frame
+    :return: none
+    """
+
+    if frame.shape[0] == 0:
+
+        # Failed fit
+
+        return
+
+    n_index_levels = frame.index.nlevels
+
+    flat_frame = frame.reset_index()
+
+    if 'columns' not in group.attrs:
+
+        group.attrs['columns'] = np.array(map(str, flat_frame.columns))
+        group.attrs['n_index_levels'] = n_index_levels
+
+    _append_to_hdf5_column(group, 'record', [record] * flat_frame.shape[0], int)
+
+    for column in flat_frame.columns:
+
+        values = flat_frame[column].values
+
+        if values.dtype.kind in 'biuf':
+
+            _append_to_hdf5_column(group, str(column), values, float)
+
+        else:
+
+            _append_to_hdf5_column(group, str(column), map(str, values), str)
+
+
+def _read_frame_from_hdf5(group, iteration_of_record):
+    """
+    Read a table written by _append_frame_to_hdf5, keeping only the records in iteration_of_record
+
+    :param group: the HDF5 group
+    :param iteration_of_record: dictionary record -> iteration
+    :return: a data frame indexed by iteration and by the original index
+    """
+
+    if 'columns' not in group.attrs:
+
+        return pd.DataFrame()
+
+    columns = map(str, group.attrs['columns'])
+
+    n_index_levels = int(group.attrs['n_index_levels'])
+
+    records = group['record'][()]
+
+    selected = np.array([record in iteration_of_record for record in records], dtype=bool)
+
+    data = collections.OrderedDict()
+
+    data['iteration'] = np.array([iteration_of_record[record] for record in records[selected]], dtype=int)
+
+    for column in columns:
+
+        values = group[column][()]
+
+        if values.dtype.kind == 'O':
+
+            values = np.array(map(str, values), dtype=object)
+
+        data[column] = values[selected]
+
+    frame = pd.DataFrame(data)
+
+    # Sort by iteration (keeping the order of the rows within each iteration) and restore the index
+
+    frame = frame.iloc[np.argsort(frame['iteration'].values, kind='mergesort')]
+
+    frame = frame.set_index(['iteration'] + columns[:n_index_levels])
+
+    frame.index.names = [None] * (n_index_levels + 1)
+
+    return frame
+
+
+class JointLikelihoodSetCheckpoint(object):
+    """
+    Stores the results of a JointLikelihoodSet in a directory, one iteration at a time, so that nothing is lost if
+    the computation is interrupted and the results do not need to be kept in memory. See JointLikelihoodSet.go and
+    load_joint_likelihood_set_checkpoint.
+
+    The directory contains:
+
+    * frames.h5: the data frames with the parameters and the likelihood values of each iteration (as columnar
+      tables), and the list of the completed iterations
+    * results_model_<i>.h5: the analysis results for the i-th model (see AnalysisResultsHDF5)
+
+    An iteration is completed only when it has been added to the list of the completed iterations, which is written
+    last. Anything which was written for an iteration interrupted before that is ignored.
+
+    :param directory: the directory (created if it does not exist)
+    :param n_models: number of models for each iteration
+    :param n_iterations: number of iterations
+    """
+
+    def __init__(self, directory, n_models, n_iterations):
+
+        assert has_h5py, "You need to install h5py to use checkpoints"
+
+        directory = sanitize_filename(directory, abspath=True)
+
+        if_directory_not_existing_then_make(directory)
+
+        self._frames_file = h5py.File(os.path.join(directory, "frames.h5"), "a")
+
+        if 'n_models' in self._frames_file.attrs:
+
+            assert self._frames_file.attrs['n_models'] == n_models and \
+                   self._frames_file.attrs['n_iterations'] == n_iterations, \
+                "The checkpoint in %s belongs to a different set of analysis" % directory
+
+        else:
+
+            self._frames_file.attrs['n_models'] = n_models
+            self._frames_file.attrs['n_iterations'] = n_iterations
+            self._frames_file.attrs['n_records'] = 0
+
+            for group_name in ('parameters', 'likelihood', 'completed'):
+
+                self._frames_file.create_group(group_name)
+
+            self._frames_file.flush()
+
+        self._results_files = [AnalysisResultsHDF5(os.path.join(directory, "results_model_%i.h5" % i), append=True)
+                               for i in range(n_models)]
+
+        # Remove what was written for an iteration which was interrupted. The list of completed iterations is
+        # consistent up to the length of its iteration column, and the tables of the frames up to their shortest
+        # column (the rows after that belong to records which are not completed)
+
+        completed = self._frames_file['completed']
+
+        n_completed = completed['iteration'].shape[0] if 'iteration' in completed else 0
+
+        _truncate_hdf5_columns(completed, n_completed)
+
+        for group_name in ('parameters', 'likelihood'):
+
+            group = self._frames_file[group_name]
+
+            if 'columns' in group.attrs and \
+                    not all([name in group for name in ['record'] + map(str, group.attrs['columns'])]):
+
+                # The first frame was interrupted while being written: all its rows are orphans
+
+                for name in list(group):
+
+                    del group[name]
+
+                del group.attrs['columns']
+                del group.attrs['n_index_levels']
+
+            if len(group) > 0:
+
+                _truncate_hdf5_columns(group, min([group[name].shape[0] for name in group]))
+
+        self._completed_iterations = set(completed['iteration'][()]) if n_completed > 0 else set()
+
+    @property
+    def completed_iterations(self):
+
+        return set(self._completed_iterations)
+
+    def append(self, iteration, worker_result):
+        """
+        Store the result of an iteration
+
+        :param iteration: the iteration
+        :param worker_result: the output of JointLikelihoodSet.worker (parameters frame, likelihood frame, list of
+        analysis results)
+        :return: none
+        """
+
+        parameter_frame, like_frame, analysis_results = worker_result
+
+        f = self._frames_file
+
+        # Get a new id for this record before writing anything
+
+        record = int(f.attrs['n_records'])
+
+        f.attrs['n_records'] = record + 1
+
+        f.flush()
+
+        _append_frame_to_hdf5(f['parameters'], record, parameter_frame)
+        _append_frame_to_hdf5(f['likelihood'], record, like_frame)
+
+        result_ids = []
+
+        for results_file, this_results in zip(self._results_files, analysis_results):
+
+            if this_results is None:
+
+                # Failed fit
+
+                result_ids.append(-1)
+
+            else:
+
+                result_ids.append(results_file.n_results)
+
+                results_file.append(this_results)
+
+        # Now mark the iteration as completed
+
+        completed = f['completed']
+
+        _append_to_hdf5_column(completed, 'record', [record], int)
+
+        for i, result_id in enumerate(result_ids):
+
+            _append_to_hdf5_column(completed, 'result_model_%i' % i, [result_id], int)
+
+        # This is written last
+
+        _append_to_hdf5_column(completed, 'iteration', [iteration], int)
+
+        f.flush()
+
+        self._completed_iterations.add(iteration)
+
+    def close(self):
+
+        for results_file in self._results_files:
+
+            results_file.close()
+
+        self._frames_file.close()
+
+
+def load_joint_likelihood_set_checkpoint(directory):
+    """
+    Read the results stored by JointLikelihoodSet.go in a checkpoint directory. The analysis results are read lazily
+    (see load_analysis_results), so each set keeps its file open until its close() method is called
+
+    :param directory: the checkpoint directory
+    :return: (data frame with the parameters, data frame with the likelihood values, list of AnalysisResultsSet
+    with one set for each model), for the completed iterations in order of iteration
+    """
+
+    directory = sanitize_filename(directory, abspath=True)
+
+    with h5py.File(os.path.join(directory, "frames.h5"), "r") as f:
+
+        n_models = int(f.attrs['n_models'])
+
+        completed = f['completed']
+
+        if 'iteration' in completed:
+
+            # The columns with the result ids can be longer than the iteration column, if the last iteration was
+            # interrupted after writing them
+
+            iterations = completed['iteration'][()]
+
+            n_completed = len(iterations)
+
+            records = completed['record'][:n_completed]
+
+            result_ids = [completed['result_model_%i' % i][:n_completed] for i in range(n_models)]
+
+        else:
+
+            iterations = np.zeros(0, int)
+            records = np.zeros(0, int)
+            result_ids = [np.zeros(0, int) for _ in range(n_models)]
+
+        iteration_of_record = dict(zip(records, iterations))
+
+        parameter_frames = _read_frame_from_hdf5(f['parameters'], iteration_of_record)
+        like_frames = _read_frame_from_hdf5(f['likelihood'], iteration_of_record)
+
+    order = np.argsort(iterations)
+
+    all_results = []
+
+    for i in range(n_models):
+
+        results_filename = os.path.join(directory, "results_model_%i.h5" % i)
+
+        stored_results = None
+
+        if np.any(result_ids[i] >= 0):
+
+            stored_results = load_analysis_results(results_filename)
+
+            if not isinstance(stored_results, AnalysisResultsSet):
+
+                # Only one result in the file
+
+                stored_results = AnalysisResultsSet([stored_results])
+
+        this_model_results = [functools.partial(stored_results.__getitem__, int(result_id)) if result_id >= 0 else None
+                              for result_id in result_ids[i][order]]
+
+        this_model_set = AnalysisResultsSet(this_model_results)
+
+        if stored_results is not None:
+
+            # so that closing this set closes the file
+
+            this_model_set._source_sets.append(stored_results)
+
+        all_results.append(this_model_set)
+
+    return parameter_frames, like_frames, all_results
+
+
 class JointLikelihoodSetAnalyzer(object):
     """
     A class to help in offline re-analysis of the results obtained with the JointLikelihoodSet class
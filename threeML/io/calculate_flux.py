@@ -3,15 +3,246 @@ __author__ = 'grburgess'
 # from threeML.io.rich_display import display
 from threeML.utils.fitted_objects.fitted_point_sources import FittedPointSourceSpectralHandler
 from threeML.exceptions.custom_exceptions import custom_warnings
+from threeML.config.config import threeML_config
+from threeML.parallel.parallel_client import ParallelClient
+from threeML.io.file_utils import if_directory_not_existing_then_make
+from threeML.io.package_data import get_path_of_user_dir
+from astromodels.core.my_yaml import my_yaml
 
+import astropy.units as u
 import numpy as np
 import pandas as pd
 import collections
+import hashlib
+import os
+
+
+def _get_flux_cache_directory():
+    """
+    Returns the path of the directory containing the cache of the propagated fluxes (~/.threeML/.cache/fluxes)
+
+    :return: an absolute path
+    """
+
+    return os.path.join(get_path_of_user_dir(), '.cache', 'fluxes')
+
+
+def _get_analysis_hash(analysis):
+    """
+    Compute a hash which identifies an analysis result: the optimized model together with the covariance matrix (for
+    MLE results, whose samples are generated again every time) or the samples (for Bayesian results)
+
+    :param analysis: an analysis result
+    :return: the hex digest of the hash
+    """
+
+    analysis_hash = hashlib.sha1()
+
+    analysis_hash.update(analysis.analysis_type)
+
+    analysis_hash.update(my_yaml.dump(analysis.optimized_model.to_dict_with_types()))
+
+    if analysis.analysis_type == "MLE":
+
+        analysis_hash.update(np.ascontiguousarray(analysis.covariance_matrix, dtype=float).tostring())
+
+    else:
+
+        analysis_hash.update(np.ascontiguousarray(analysis.samples, dtype=float).tostring())
+
+    return analysis_hash.hexdigest()
+
+
+class _FittedPointSourceRequests(object):
+
+    def __init__(self, energy_range, energy_unit, flux_unit, confidence_level, equal_tailed, differential,
+                 use_cache=False):
+        """
+        Collects the fitted point sources needed by the flux and plotting functions, so that the (expensive) error
+        propagation can be done for all of them at once: in parallel if parallel computation is active, and reusing
+        the samples stored in the on-disk cache if use_cache is True
+
+        :param energy_range: the energies (or the energy interval for integral fluxes)
+        :param energy_unit: the energy unit
+        :param flux_unit: the flux unit
+        :param confidence_level: the confidence level for the errors
+        :param equal_tailed: whether to use equal-tailed error intervals or not
+        :param differential: whether to compute differential or integral fluxes
+        :param use_cache: whether to read/write the propagated samples from/to the on-disk cache
+        """
+
+        self._energy_range = energy_range
+        self._energy_unit = energy_unit
+        self._flux_unit = flux_unit
+        self._confidence_level = confidence_level
+        self._equal_tailed = equal_tailed
+        self._differential = differential
+        self._use_cache = use_cache
+
+        self._requests = []
+
+        self._handlers = None
+
+    def request(self, analysis, source, component=None):
+        """
+        Request a fitted point source. It will be built when the build method is called
+
+        :param analysis: the analysis result
+        :param source: the name of the point source
+        :param component: (optional) the name of the component
+        :return: an identifier to get the fitted point source with the get method
+        """
+
+        self._requests.append((analysis, source, component))
+
+        return len(self._requests) - 1
+
+    def get(self, request_id):
+        """
+        Returns the fitted point source corresponding to the identifier returned by the request method
+
+        :param request_id: the identifier
+        :return: a FittedPointSourceSpectralHandler instance
+        """
+
+        assert self._handlers is not None, "You need to call build() first"
+
+        return self._handlers[request_id]
+
+    def _get_handler(self, analysis, source, component, samples=None):
+
+        return FittedPointSourceSpectralHandler(analysis,
+                                                source,
+                                                self._energy_range,
+                                                self._energy_unit,
+                                                self._flux_unit,
+                                                self._confidence_level,
+                                                equal_tailed=self._equal_tailed,
+                                                component=component,
+                                                is_differential_flux=self._differential,
+                                                samples=samples)
+
+    def _get_cache_file(self, analysis_hash, source, component):
+
+        # The samples do not depend on the confidence level, so that is not part of the key
+
+        if isinstance(self._energy_range, u.Quantity):
+
+            energy_range = self._energy_range.to(u.keV, equivalencies=u.spectral()).value
+
+        else:
+
+            energy_range = (np.asarray(self._energy_range, dtype=float) *
+                            u.Unit(self._energy_unit)).to(u.keV, equivalencies=u.spectral()).value
+
+        key = hashlib.sha1()
+
+        key.update(analysis_hash)
+        key.update("%s %s %s %s" % (source, component, u.Unit(self._flux_unit).to_string(), self._differential))
+        key.update(np.ascontiguousarray(energy_range, dtype=float).tostring())
+
+        return os.path.join(_get_flux_cache_directory(), "%s.npy" % key.hexdigest())
+
+    def build(self):
+        """
+        Build all the requested fitted point sources
+
+        :return: none
+        """
+
+        n_requests = len(self._requests)
+
+        samples = [None] * n_requests
+
+        cache_files = [None] * n_requests
+
+        if self._use_cache:
+
+            analysis_hashes = {}
+
+            for i, (analysis, source, component) in enumerate(self._requests):
+
+                if id(analysis) not in analysis_hashes:
+
+                    analysis_hashes[id(analysis)] = _get_analysis_hash(analysis)
+
+                cache_files[i] = self._get_cache_file(analysis_hashes[id(analysis)], source, component)
+
+                if os.path.exists(cache_files[i]):
+
+                    try:
+
+                        samples[i] = np.load(cache_files[i])
+
+                    except Exception:
+
+                        custom_warnings.warn("Could not read the cached fluxes in %s. Computing them again."
+                                             % cache_files[i])
+
+                    else:
+
+                        # Do not write it again
+
+                        cache_files[i] = None
+
+        to_be_propagated = [i for i in range(n_requests) if samples[i] is None]
+
+        if threeML_config['parallel']['use-parallel'] and len(to_be_propagated) > 1:
+
+            # Propagate in the engines, and get back only the samples (cheaper to transfer than the handlers)
+
+            energy_range, energy_unit, flux_unit = self._energy_range, self._energy_unit, self._flux_unit
+            confidence_level, equal_tailed, differential = self._confidence_level, self._equal_tailed, \
+                                                           self._differential
+
+            def worker(this_request):
+
+                analysis, source, component = this_request
+
+                return FittedPointSourceSpectralHandler(analysis, source, energy_range, energy_unit, flux_unit,
+                                                        confidence_level, equal_tailed=equal_tailed,
+                                                        component=component,
+                                                        is_differential_flux=differential).raw_samples
+
+            client = ParallelClient()
+
+            results = client.execute_with_progress_bar(worker, [self._requests[i] for i in to_be_propagated])
+
+            for i, this_samples in zip(to_be_propagated, results):
+
+                samples[i] = this_samples
+
+        self._handlers = []
+
+        for i, (analysis, source, component) in enumerate(self._requests):
+
+            handler = self._get_handler(analysis, source, component, samples[i])
+
+            if cache_files[i] is not None:
+
+                self._write_to_cache(cache_files[i], handler.raw_samples)
+
+            self._handlers.append(handler)
+
+    @staticmethod
+    def _write_to_cache(cache_file, samples):
+
+        if_directory_not_existing_then_make(os.path.dirname(cache_file))
+
+        # Write to a temporary file first and then move it, so that other sessions never read a partial file
+
+        temporary_file = "%s.%i.tmp" % (cache_file, os.getpid())
+
+        with open(temporary_file, "wb") as f:
+
+            np.save(f, samples)
+
+        os.rename(temporary_file, cache_file)
 
 
 def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, flux_unit, use_components,
                                  components_to_use,
-                                 confidence_level, equal_tailed, differential, sources_to_use):
+                                 confidence_level, equal_tailed, differential, sources_to_use, use_cache=False):
     """
     helper function to pull out analysis details that are common to flux and plotting functions
 
@@ -26,9 +257,16 @@ def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, fl
     :param fraction_of_samples:
     :param differential:
     :param sources_to_use:
+    :param use_cache: whether to read/write the propagated fluxes from/to the on-disk cache
     :return:
     """
 
+    # The fitted point sources are first requested, then built all at once (in parallel if parallel computation is
+    # active) at the end
+
+    fitted_point_sources = _FittedPointSourceRequests(energy_range, energy_unit, flux_unit, confidence_level,
+                                                      equal_tailed, differential, use_cache)
+
     bayesian_analyses = collections.OrderedDict()
     mle_analyses  = collections.OrderedDict()
 
@@ -113,14 +351,8 @@ def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, fl
         # if we want to use this source
 
         if not use_components or ('total' in components_to_use) or (not mle_analyses[key]['component_names']):
-            mle_analyses[key]['fitted point source'] = FittedPointSourceSpectralHandler(mle_analyses[key]['analysis'],
-                                                                                        mle_analyses[key]['source'],
-                                                                                        energy_range,
-                                                                                        energy_unit,
-                                                                                        flux_unit,
-                                                                                        confidence_level,
-                                                                                        equal_tailed=equal_tailed,
-                                                                                        is_differential_flux=differential)
+            mle_analyses[key]['fitted point source'] = fitted_point_sources.request(mle_analyses[key]['analysis'],
+                                                                                    mle_analyses[key]['source'])
 
             num_sources_to_use += 1
 
@@ -141,15 +373,9 @@ def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, fl
                 if not components_to_use:
 
 
-                    component_dict[component] = FittedPointSourceSpectralHandler(mle_analyses[key]['analysis'],
-                                                                                 mle_analyses[key]['source'],
-                                                                                 energy_range,
-                                                                                 energy_unit,
-                                                                                 flux_unit,
-                                                                                 confidence_level,
-                                                                                 equal_tailed,
-                                                                                 component=component,
-                                                                                 is_differential_flux=differential)
+                    component_dict[component] = fitted_point_sources.request(mle_analyses[key]['analysis'],
+                                                                             mle_analyses[key]['source'],
+                                                                             component)
 
                     num_components_to_use += 1
 
@@ -158,15 +384,9 @@ def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, fl
                     # otherwise pick off only the ones of interest
 
                     if component in components_to_use:
-                        component_dict[component] = FittedPointSourceSpectralHandler(mle_analyses[key]['analysis'],
-                                                                                     mle_analyses[key]['source'],
-                                                                                     energy_range,
-                                                                                     energy_unit,
-                                                                                     flux_unit,
-                                                                                     confidence_level,
-                                                                                     equal_tailed,
-                                                                                     component=component,
-                                                                                     is_differential_flux=differential)
+                        component_dict[component] = fitted_point_sources.request(mle_analyses[key]['analysis'],
+                                                                                 mle_analyses[key]['source'],
+                                                                                 component)
 
                         num_components_to_use += 1
 
@@ -194,15 +414,8 @@ def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, fl
         # if we have a source to use
 
         if not use_components or ('total' in components_to_use) or (not bayesian_analyses[key]['component_names']):
-            bayesian_analyses[key]['fitted point source'] = FittedPointSourceSpectralHandler(
-                bayesian_analyses[key]['analysis'],
-                bayesian_analyses[key]['source'],
-                energy_range,
-                energy_unit,
-                flux_unit,
-                confidence_level,
-                equal_tailed,
-                is_differential_flux=differential)
+            bayesian_analyses[key]['fitted point source'] = fitted_point_sources.request(bayesian_analyses[key]['analysis'],
+                                                                                         bayesian_analyses[key]['source'])
 
             num_sources_to_use += 1
 
@@ -220,30 +433,18 @@ def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, fl
 
 
                 if not components_to_use:
-                    component_dict[component] = FittedPointSourceSpectralHandler(bayesian_analyses[key]['analysis'],
-                                                                                 bayesian_analyses[key]['source'],
-                                                                                 energy_range,
-                                                                                 energy_unit,
-                                                                                 flux_unit,
-                                                                                 confidence_level,
-                                                                                 equal_tailed,
-                                                                                 component=component,
-                                                                                 is_differential_flux=differential)
+                    component_dict[component] = fitted_point_sources.request(bayesian_analyses[key]['analysis'],
+                                                                             bayesian_analyses[key]['source'],
+                                                                             component)
 
                     num_components_to_use += 1
 
                 # or just some of them
 
                 if component in components_to_use:
-                    component_dict[component] = FittedPointSourceSpectralHandler(bayesian_analyses[key]['analysis'],
-                                                                                 bayesian_analyses[key]['source'],
-                                                                                 energy_range,
-                                                                                 energy_unit,
-                                                                                 flux_unit,
-                                                                                 confidence_level,
-                                                                                 equal_tailed,
-                                                                                 component=component,
-                                                                                 is_differential_flux=differential)
+                    component_dict[component] = fitted_point_sources.request(bayesian_analyses[key]['analysis'],
+                                                                             bayesian_analyses[key]['source'],
+                                                                             component)
 
                     num_components_to_use += 1
 
@@ -262,6 +463,22 @@ def _setup_analysis_dictionaries(analysis_results, energy_range, energy_unit, fl
         #
         #     num_sources_to_use += 1
 
+    # now build all the requested fitted point sources and put them in place of the requests
+
+    fitted_point_sources.build()
+
+    for analyses in (mle_analyses, bayesian_analyses):
+
+        for key in analyses.keys():
+
+            if 'fitted point source' in analyses[key]:
+
+                analyses[key]['fitted point source'] = fitted_point_sources.get(analyses[key]['fitted point source'])
+
+            for component in analyses[key].get('components', {}).keys():
+
+                analyses[key]['components'][component] = fitted_point_sources.get(analyses[key]['components'][component])
+
     # we may have the same source in a bayesian and mle analysis.
     # we want to plot them, but make sure to label them differently.
     # so let's keep track of them
@@ -501,6 +718,11 @@ def _calculate_point_source_flux(ene_min, ene_max, *analyses, **kwargs):
     :param use_components: (optional) True or False to plot the spectral components
     :param components_to_use: (optional) list of string names of the components to plot: including 'total'
     will also plot the total spectrum
+    :param use_cache: (optional) if True, the propagated fluxes are saved in a cache on disk (~/.threeML/.cache/fluxes)
+    and reused the next time the same flux is requested for the same analysis results
+
+    If parallel computation is active, the fluxes for the different analyses, sources and components are computed in
+    parallel
 
     :return: mle_dataframe, bayes_dataframe
     """
@@ -517,6 +739,7 @@ def _calculate_point_source_flux(ene_min, ene_max, *analyses, **kwargs):
         'components_to_use': [],
         'sources_to_use': [],
         'sum_sources': False,
+        'use_cache': False,
 
     }
 
@@ -538,7 +761,8 @@ def _calculate_point_source_flux(ene_min, ene_max, *analyses, **kwargs):
                                                                          _defaults['confidence_level'],
                                                                          _defaults['equal_tailed'],
                                                                          differential=False,
-                                                                         sources_to_use=_defaults['sources_to_use'])
+                                                                         sources_to_use=_defaults['sources_to_use'],
+                                                                         use_cache=_defaults['use_cache'])
 
     out = []
 
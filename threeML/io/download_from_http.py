@@ -1,11 +1,20 @@
 import requests
 import re
 import os
+import base64
+import gzip
+import hashlib
+import shutil
+from multiprocessing.pool import ThreadPool
 
 from threeML.io.progress_bar import progress_bar, ProgressBarBase
 from threeML.io.file_utils import sanitize_filename, path_exists_and_is_directory, file_existing_and_readable
 
 
+# Chunk size shouldn't be too small otherwise we are causing a bottleneck in the download speed
+_chunk_size = 1024 * 1024
+
+
 class RemoteDirectoryNotFound(IOError):
     pass
 
@@ -15,14 +24,94 @@ class HTTPError(IOError):
     pass
 
 
+def _get_etag_file(path):
+    """
+    Returns the path of the (hidden) file which keeps the ETag of a downloaded file, i.e., the identifier of the
+    version of the file on the server
+
+    :param path: path of the downloaded file
+    :return: path of the ETag file
+    """
+
+    directory, filename = os.path.split(path)
+
+    return os.path.join(directory, ".%s.etag" % filename)
+
+
+def _read_etag(path):
+
+    etag_file = _get_etag_file(path)
+
+    if file_existing_and_readable(etag_file):
+
+        with open(etag_file) as f:
+
+            return f.read().strip()
+
+    return None
+
+
+def _write_etag(path, etag):
+
+    if etag is not None:
+
+        with open(_get_etag_file(path), "w") as f:
+
+            f.write(etag)
+
+
+def _remove_etag(path):
+
+    etag_file = _get_etag_file(path)
+
+    if os.path.exists(etag_file):
+
+        os.remove(etag_file)
+
+
+def remove_downloaded_file(path):
+    """
+    Remove a file downloaded with ApacheDirectory, together with the ETag kept for it
+
+    :param path: path of the downloaded file
+    :return: none
+    """
+
+    os.remove(path)
+
+    _remove_etag(path)
+
+
 class ApacheDirectory(object):
     """
     Allows to interact with a directory listing like the one returned by an Apache server
     """
 
-    def __init__(self, url):
+    def __init__(self, url, max_transfers=4):
+        """
+        :param url: the URL of the directory
+        :param max_transfers: the maximum number of files downloaded at the same time by download_files and
+        download_all_files
+        """
+
+        self._max_transfers = int(max_transfers)
+
+        # All requests go through the same session, so that the connections to the server are reused
 
-        self._request_result = requests.get(url)
+        self._session = requests.Session()
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(self._max_transfers, 1))
+
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+        # Ask for the files as they are. The size checks and the byte ranges used to resume downloads refer to the
+        # content as it is sent, so it must not be decoded (we also read it with decode_content=False below, in case
+        # the server applies a content encoding anyway)
+
+        self._session.headers['Accept-Encoding'] = 'identity'
+
+        self._request_result = self._session.get(url)
 
         # Make sure the request was ok
         if not self._request_result.ok:
@@ -112,6 +201,20 @@ class ApacheDirectory(object):
         return self._directories
 
     def download(self, remote_filename, destination_path, new_filename=None, progress=True, compress=False):
+        """
+        Download a file from the directory. The file is skipped if it has already been downloaded and has not changed
+        on the server since then (same ETag or, for files downloaded by older versions, same size). The data are
+        first written to a .part file, so that an interrupted download is resumed from where it stopped (with an
+        HTTP Range request, if the file on the server did not change in the meantime). The size of the downloaded
+        file, and its MD5 checksum if the server provides one, are checked before the file is moved to its final name.
+
+        :param remote_filename: name of the file in the directory
+        :param destination_path: the path for the destination directory in the local file system
+        :param new_filename: (optional) name of the local file (default: same as the remote file)
+        :param progress: (True or False) whether to display progress or not
+        :param compress: (True or False) whether to compress the local file with gzip (a .gz is added to its name)
+        :return: the path of the local file
+        """
 
         assert remote_filename in self.files, "File %s is not contained in this directory (%s)" % (remote_filename,
                                                                                                    self._request_result.url)
@@ -131,89 +234,257 @@ class ApacheDirectory(object):
         remote_path = self._request_result.url + remote_filename
         local_path = os.path.join(destination_path, new_filename)
 
+        if compress:
+            # Add a .gz at the end of the file path
+
+            local_path += '.gz'
+
+        # the (uncompressed) data are downloaded here first
+
+        partial_path = "%s.part" % local_path
+
+        # If there is a partial download of the same version of the file, ask only for the missing part. With
+        # If-Range, the server sends the whole file if its version changed
+
+        headers = {}
+
+        resume_from = 0
+
+        partial_etag = _read_etag(partial_path)
+
+        if file_existing_and_readable(partial_path) and partial_etag is not None:
+
+            resume_from = os.path.getsize(partial_path)
+
+            headers['Range'] = 'bytes=%i-' % resume_from
+            headers['If-Range'] = partial_etag
+
         # Ask the server for the file, but do not download it just yet
         # (stream=True will get the HTTP header but nothing else)
         # Use stream=True for two reasons:
         # * so that the file is not downloaded all in memory before being written to the disk
         # * so that we can report progress is requested
 
-        this_request = requests.get(remote_path, stream=True)
+        this_request = self._session.get(remote_path, stream=True, headers=headers)
 
-        # Figure out the size of the file
+        try:
 
-        file_size = int(this_request.headers['Content-Length'])
+            if this_request.status_code == 416:
 
-        # Now check if we really need to download this file
+                # the partial file is not consistent with the file on the server. Start from scratch
 
-        if compress:
-            # Add a .gz at the end of the file path
+                this_request.close()
 
-            local_path += '.gz'
+                remove_downloaded_file(partial_path)
 
-        if file_existing_and_readable(local_path):
+                return self.download(remote_filename, destination_path, new_filename, progress, compress)
 
-            local_size = os.path.getsize(local_path)
+            if not this_request.ok:
 
-            if local_size == file_size or compress:
-                # if the compressed file already exists
-                # it will have a smaller size
+                raise HTTPError("HTTP request for %s failed with reason: %s" % (remote_path, this_request.reason))
 
-                # No need to download it again
-                return local_path
+            etag = this_request.headers.get('ETag')
 
-        # Chunk size shouldn't bee too small otherwise we are causing a bottleneck in the download speed
-        chunk_size = 1024 * 10
+            is_resuming = this_request.status_code == 206
 
-        # If the user wants to compress the file, use gzip, otherwise the normal opener
-        if compress:
+            # Figure out the size of the file
 
-            import gzip
+            file_size = int(this_request.headers['Content-Length'])
 
-            opener = gzip.open
+            if is_resuming:
 
+                file_size += resume_from
 
+            else:
 
+                resume_from = 0
 
-        else:
+                # Now check if we really need to download this file
+
+                if file_existing_and_readable(local_path):
+
+                    local_etag = _read_etag(local_path)
+
+                    if local_etag is not None and etag is not None:
+
+                        is_up_to_date = local_etag == etag
+
+                    else:
+
+                        # if the compressed file already exists
+                        # it will have a smaller size
+
+                        is_up_to_date = compress or os.path.getsize(local_path) == file_size
 
-            opener = open
+                    if is_up_to_date:
 
-        if progress:
+                        # No need to download it again
+                        return local_path
 
-            # Set a title for the progress bar
-            bar_title = "Downloading %s" % new_filename
+            # keep the version of the partial file, so that it can be resumed
 
-            with progress_bar(file_size, scale=1024 * 1024, units='Mb',
-                              title=bar_title) as bar:  # type: ProgressBarBase
+            _write_etag(partial_path, etag)
 
-                with opener(local_path, 'wb') as f:
+            with open(partial_path, 'ab' if is_resuming else 'wb') as f:
 
-                    for chunk in this_request.iter_content(chunk_size=chunk_size):
+                if progress:
+
+                    # Set a title for the progress bar
+                    bar_title = "Downloading %s" % new_filename
+
+                    with progress_bar(file_size, scale=1024 * 1024, units='Mb',
+                                      title=bar_title) as bar:  # type: ProgressBarBase
+
+                        bar.increase(resume_from)
+
+                        for chunk in this_request.raw.stream(_chunk_size, decode_content=False):
+
+                            if chunk:  # filter out keep-alive new chunks
+
+                                f.write(chunk)
+                                bar.increase(len(chunk))
+
+                else:
+
+                    for chunk in this_request.raw.stream(_chunk_size, decode_content=False):
 
                         if chunk:  # filter out keep-alive new chunks
 
                             f.write(chunk)
-                            bar.increase(len(chunk))
+
+        finally:
 
             this_request.close()
 
+        # Validate the download
+
+        downloaded_size = os.path.getsize(partial_path)
+
+        if downloaded_size != file_size:
+
+            raise HTTPError("Download of %s is incomplete (%i bytes out of %i). Download it again to resume it."
+                            % (remote_path, downloaded_size, file_size))
+
+        if 'Content-MD5' in this_request.headers and not is_resuming:
+
+            md5 = hashlib.md5()
+
+            with open(partial_path, 'rb') as f:
+
+                for chunk in iter(lambda: f.read(_chunk_size), b''):
+
+                    md5.update(chunk)
+
+            if base64.b64encode(md5.digest()) != this_request.headers['Content-MD5']:
+
+                remove_downloaded_file(partial_path)
+
+                raise HTTPError("The checksum of %s does not match. Download it again." % remote_path)
+
+        # Move the file to its final name, compressing it if requested
+
+        if compress:
+
+            with open(partial_path, 'rb') as f_in:
+
+                with gzip.open(local_path, 'wb') as f_out:
+
+                    shutil.copyfileobj(f_in, f_out, _chunk_size)
+
+            os.remove(partial_path)
+
         else:
 
-            with opener(local_path, 'wb') as f:
+            if os.path.exists(local_path):
 
-                for chunk in this_request.iter_content(chunk_size=chunk_size):
+                os.remove(local_path)
 
-                    if chunk:  # filter out keep-alive new chunks
+            os.rename(partial_path, local_path)
 
-                        f.write(chunk)
+        _remove_etag(partial_path)
 
-            this_request.close()
+        if etag is not None:
+
+            _write_etag(local_path, etag)
+
+        else:
+
+            _remove_etag(local_path)
 
         return local_path
 
+    def download_files(self, remote_filenames, destination_path, progress=True, compress=False):
+        """
+        Download several files of the directory, up to max_transfers at the same time (see download)
+
+        :param remote_filenames: list of the names of the files in the directory
+        :param destination_path: the path for the destination directory in the local file system
+        :param progress: (True or False) whether to display progress or not
+        :param compress: (True or False) whether to compress the local files with gzip, or a list with one flag for each
+        file
+        :return: list of the downloaded files as absolute paths in the local file system, in the same order
+        """
+
+        remote_filenames = list(remote_filenames)
+
+        n_files = len(remote_filenames)
+
+        if isinstance(compress, (list, tuple)):
+
+            assert len(compress) == n_files, "You need to provide one compress flag for each file"
+
+            compress_flags = list(compress)
+
+        else:
+
+            compress_flags = [compress] * n_files
+
+        if self._max_transfers <= 1 or n_files <= 1:
+
+            # Show the progress of each file
+
+            return [self.download(remote_filename, destination_path, progress=progress, compress=this_compress)
+                    for remote_filename, this_compress in zip(remote_filenames, compress_flags)]
+
+        def worker(i):
+
+            return i, self.download(remote_filenames[i], destination_path, progress=False,
+                                    compress=compress_flags[i])
+
+        local_files = [None] * n_files
+
+        pool = ThreadPool(min(self._max_transfers, n_files))
+
+        try:
+
+            results = pool.imap_unordered(worker, range(n_files))
+
+            if progress:
+
+                with progress_bar(n_files, title="Downloading %i files" % n_files) as bar:
+
+                    for i, local_file in results:
+
+                        local_files[i] = local_file
+
+                        bar.increase()
+
+            else:
+
+                for i, local_file in results:
+
+                    local_files[i] = local_file
+
+        finally:
+
+            pool.close()
+            pool.join()
+
+        return local_files
+
     def download_all_files(self, destination_path, progress=True, pattern=None):
         """
-        Download all files in the current directory
+        Download all files in the current directory, up to max_transfers at the same time
 
         :param destination_path: the path for the destination directory in the local file system
         :param progress: (True or False) whether to display progress or not
@@ -222,7 +493,7 @@ class ApacheDirectory(object):
         :return: list of the downloaded files as absolute paths in the local file system
         """
 
-        local_files = []
+        files_to_download = []
 
         for file in self.files:
 
@@ -232,9 +503,6 @@ class ApacheDirectory(object):
 
                     continue
 
-            this_local_file = self.download(file, destination_path, progress=progress)
-
-            local_files.append(this_local_file)
-
-        return local_files
+            files_to_download.append(file)
 
+        return self.download_files(files_to_download, destination_path, progress=progress)
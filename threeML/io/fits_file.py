@@ -256,3 +256,45 @@ class FITSExtension(object):
         header_tuple = fits_extension.header.items()
 
         return cls(data_tuple,header_tuple)
+
+
+def get_rows_in_time_window(events, start, stop, time_column='TIME'):
+    """
+    Find the rows of a table of events sorted in time (for example the EVENTS extension of a TTE or FT1 file) with
+    start <= time <= stop. The rows are found with a binary search which reads only a few elements of the time column,
+    so that when the file is opened with memmap=True only the rows in the window are read from disk once the table is
+    sliced.
+
+    :param events: the data of the table (a FITS_rec)
+    :param start: start of the window
+    :param stop: stop of the window
+    :param time_column: name of the column with the (sorted) times
+    :return: a slice selecting the rows in the window
+    """
+
+    times = events.field(time_column)
+
+    # NOTE: np.searchsorted would convert the whole column to the native byte order, i.e., read it all
+
+    def bisect(value, right):
+
+        low, high = 0, len(times)
+
+        while low < high:
+
+            middle = (low + high) // 2
+
+            if times[middle] < value or (right and times[middle] == value):
+
+                low = middle + 1
+
+            else:
+
+                high = middle
+
+        return low
+
+    first_row = bisect(start, right=False)
+    last_row = max(bisect(stop, right=True), first_row)
+
+    return slice(first_row, last_row)
@@ -36,6 +36,7 @@ def plot_point_source_spectra(*analysis_results, **kwargs):
     :param subplot: subplot to use
     :param xscale: 'log' or 'linear'
     :param yscale: 'log' or 'linear'
+    :param use_cache: (optional) if True, read/write the propagated fluxes from/to the on-disk cache
     :return:
     """
 
@@ -66,7 +67,8 @@ def plot_point_source_spectra(*analysis_results, **kwargs):
                  'legend_kwargs': threeML_config['model plot']['point source plot']['legend style'],
                  'subplot': None,
                  'xscale': 'log',
-                 'yscale': 'log'
+                 'yscale': 'log',
+                 'use_cache': False
 
                  }
 
@@ -108,7 +110,8 @@ def plot_point_source_spectra(*analysis_results, **kwargs):
         _defaults['confidence_level'],
         _defaults['equal_tailed'],
         differential=True,
-        sources_to_use=_defaults['sources_to_use'])
+        sources_to_use=_defaults['sources_to_use'],
+        use_cache=_defaults['use_cache'])
 
     # we are now ready to plot.
     # all calculations have been made.
@@ -8,16 +8,15 @@ def step_plot(xbins, y, ax, fill=False, fill_min=0, **kwargs):
     y are the values in the bins.
     '''
 
+    xbins = np.asarray(xbins, dtype=float).reshape(-1, 2)
+    y = np.asarray(y, dtype=float)
+
     if fill:
 
-        x = []
-        newy = []
+        # each bin contributes its start and its stop, both at the value of the bin
 
-        for t, v in zip(xbins, y):
-            x.append(t[0])
-            newy.append(v)
-            x.append(t[1])
-            newy.append(v)
+        x = xbins.flatten()
+        newy = np.repeat(y, 2)
 
         ax.fill_between(x, newy, fill_min, **kwargs)
 
@@ -25,38 +24,29 @@ def step_plot(xbins, y, ax, fill=False, fill_min=0, **kwargs):
 
         # This supports a mask, so the line will not be drawn for missing bins
 
-        new_x = []
-        new_y = []
-
-        for (x1, x2), y in zip(xbins, y):
-
-            if len(new_x) == 0:
-
-                # First iteration
-
-                new_x.append(x1)
-                new_x.append(x2)
-                new_y.append(y)
+        # A bin which is not contiguous to the previous one starts after a "missing bin"
 
-            else:
+        gap = np.zeros(len(y), dtype=bool)
+        gap[1:] = xbins[1:, 0] != xbins[:-1, 1]
 
-                if x1 == new_x[-1]:
+        # the stop of each bin is always a point of the line, the start only for the first bin and after a gap.
+        # Every value is the one of the step beginning at the corresponding point
 
-                    # This bin is contiguous to the previous one
+        include_start = gap.copy()
+        include_start[0] = True
 
-                    new_x.append(x2)
-                    new_y.append(y)
+        stop_positions = np.cumsum(1 + include_start) - 1
+        start_positions = stop_positions[include_start] - 1
 
-                else:
+        new_x = np.zeros(stop_positions[-1] + 1)
+        new_y = np.zeros(stop_positions[-1] + 1)
 
-                    # This bin is not contiguous to the previous one
-                    # Add a "missing bin"
-                    new_x.append(x1)
-                    new_y.append(np.nan)
-                    new_x.append(x2)
-                    new_y.append(y)
+        new_x[stop_positions] = xbins[:, 1]
+        new_x[start_positions] = xbins[include_start, 0]
 
-        new_y.append(new_y[-1])
+        new_y[start_positions] = y[include_start]
+        new_y[stop_positions[:-1]] = np.where(gap[1:], np.nan, y[1:])
+        new_y[stop_positions[-1]] = y[-1]
 
         new_y = np.ma.masked_where(~np.isfinite(new_y), new_y)
 
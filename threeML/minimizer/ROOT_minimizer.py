@@ -106,6 +106,14 @@ class ROOTMinimizer(LocalMinimizer):
                 # No limits
                 self.minimizer.SetVariable(i, par_name, cur_value, cur_delta)
 
+    def _set_starting_point(self, internal_values):
+
+        super(ROOTMinimizer, self)._set_starting_point(internal_values)
+
+        for i, (cur_value, _, _, _) in enumerate(self._internal_parameters.values()):
+
+            self.minimizer.SetVariableValue(i, cur_value)
+
     def _minimize(self, compute_covar=True):
 
         # Minimize with MIGRAD
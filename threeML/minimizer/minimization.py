@@ -1,8 +1,10 @@
 import collections
+import itertools
 import math
 import numpy as np
 import pandas as pd
 import scipy.optimize
+import scipy.stats
 
 from threeML.io.progress_bar import progress_bar
 from threeML.exceptions.custom_exceptions import custom_warnings
@@ -64,6 +66,23 @@ def get_minimizer(minimizer_type):
         raise MinimizerNotAvailable("Minimizer %s is not available on your system" % minimizer_type)
 
 
+def get_delta_log_like_levels(n_dimensions, sigmas=(1, 2, 3)):
+    """
+    Return the differences in -log(likelihood) with respect to the minimum corresponding to the given confidence
+    levels (expressed in sigmas), for a profile (n_dimensions=1) or a contour (n_dimensions=2)
+
+    :param n_dimensions: number of parameters being stepped (1 or 2)
+    :param sigmas: confidence levels in units of sigma (default: 1, 2 and 3 sigma)
+    :return: an array of delta -log(likelihood)
+    """
+
+    # Two-sided probabilities
+
+    probabilities = 1 - scipy.stats.norm.sf(np.array(sigmas, dtype=float)) * 2
+
+    return scipy.stats.chi2.ppf(probabilities, n_dimensions) / 2.0
+
+
 class FunctionWrapper(object):
 
     def __init__(self, function, all_parameters, fixed_parameters):
@@ -90,6 +109,20 @@ class FunctionWrapper(object):
 
         self._all_values = np.zeros(len(self._all_parameters))
 
+        self._n_calls = 0
+
+    @property
+    def n_calls(self):
+        """
+        Number of times the function has been evaluated since the last call to reset_n_calls()
+        """
+
+        return self._n_calls
+
+    def reset_n_calls(self):
+
+        self._n_calls = 0
+
     def set_fixed_values(self, new_fixed_values):
 
         # Note that this will receive the fixed values in internal reference (after the transformations, if any)
@@ -106,6 +139,8 @@ class FunctionWrapper(object):
         self._all_values[self._indexes_of_fixed_par] = self._fixed_parameters_values
         self._all_values[~self._indexes_of_fixed_par] = trial_values
 
+        self._n_calls += 1
+
         return self._function(*self._all_values)
 
 
@@ -139,6 +174,11 @@ class ProfileLikelihood(object):
 
         self._n_free_parameters = len(free_parameters)
 
+        # Keep the current values of the free parameters (usually the best fit), which are always used as one of the
+        # candidate starting points when profiling
+
+        self._best_fit_free_values = [parameter._get_internal_value() for parameter in free_parameters.values()]
+
         if self._n_free_parameters > 0:
 
             self._wrapper = FunctionWrapper(self._function,
@@ -162,6 +202,8 @@ class ProfileLikelihood(object):
             self._wrapper = None
             self._optimizer = None
 
+        self._n_iterations = None
+
     def _transform_steps(self, parameter_name, steps):
         """
         If the parameter has a transformation, use it for the steps and return the transformed steps
@@ -181,125 +223,444 @@ class ProfileLikelihood(object):
 
             return steps
 
+    def _prepare_steps(self, steps1, steps2=None):
+        """
+        Transform the steps in the internal reference and, if the user is giving flipped steps (i.e. param_1 is after
+        param_2 in the parameters dictionary), swap them so that they match the order of the fixed values in the
+        function wrapper
+
+        :return: (steps1, steps2, swapped)
+        """
+
+        steps1 = self._transform_steps(self._fixed_parameters[0], steps1)
+
+        if steps2 is None:
+
+            return steps1, None, False
+
+        param_1_name = self._fixed_parameters[0]
+        param_1_idx = self._all_parameters.keys().index(param_1_name)
+
+        param_2_name = self._fixed_parameters[1]
+        param_2_idx = self._all_parameters.keys().index(param_2_name)
+
+        steps2 = self._transform_steps(param_2_name, steps2)
+
+        if param_1_idx > param_2_idx:
+
+            # Switch steps
+
+            return steps2, steps1, True
+
+        else:
+
+            return steps1, steps2, False
+
     def step(self, steps1, steps2=None):
 
         if steps2 is not None:
 
             assert len(self._fixed_parameters) == 2, "Cannot step in 2d if you fix only one parameter"
 
-            # Find out if the user is giving flipped steps (i.e. param_1 is after param_2 in the
-            # parameters dictionary)
+            steps1, steps2, swapped = self._prepare_steps(steps1, steps2)
 
-            param_1_name = self._fixed_parameters[0]
-            param_1_idx = self._all_parameters.keys().index(param_1_name)
+            results = self._step2d(steps1, steps2)
 
-            param_2_name = self._fixed_parameters[1]
-            param_2_idx = self._all_parameters.keys().index(param_2_name)
+            if swapped:
 
-            # Fix steps if needed
-            steps1 = self._transform_steps(param_1_name, steps1)
+                results = results.T
 
-            if steps2 is not None:
+                self._n_iterations = self._n_iterations.T
 
-                steps2 = self._transform_steps(param_2_name, steps2)
+            return results
 
-            if param_1_idx > param_2_idx:
+        else:
 
-                # Switch steps
+            assert len(self._fixed_parameters) == 1, "You cannot step in 1d if you fix 2 parameters"
 
-                swap = steps1
-                steps1 = steps2
-                steps2 = swap
+            steps1, _, _ = self._prepare_steps(steps1)
 
-                results = self._step2d(steps1, steps2).T
+            return self._step1d(steps1)
 
-            else:
+    def step_adaptive(self, steps1, steps2=None, reference=None, delta_log_like_levels=(0.5,), n_initial_steps=9):
+        """
+        Profile the likelihood on the same grid used by step(), but without profiling every node. The grid is
+        first sampled on a coarse sub-grid of about n_initial_steps nodes per axis, then only the cells whose corners
+        straddle one of the requested levels (or which contain the best fit, or where some of the fits failed) are
+        recursively bisected, down to the resolution of the full grid. Each profile fit starts from the solution of
+        the nearest node which has already been profiled. The nodes which are never profiled are filled with a
+        bilinear interpolation between the corners of the cell containing them.
+
+        :param steps1: steps for the first fixed parameter
+        :param steps2: steps for the second fixed parameter (or None for a 1d profile)
+        :param reference: value of the -log(likelihood) at the minimum. If None, the minimum of the coarse grid is used
+        :param delta_log_like_levels: difference in -log(likelihood) with respect to the reference of the levels to be
+        resolved at full resolution
+        :param n_initial_steps: number of nodes per axis in the initial coarse grid
+        :return: a matrix len(steps1) x len(steps2) (or an array len(steps1) for a 1d profile) of -log(likelihood)
+        """
 
-                results = self._step2d(steps1, steps2)
+        if steps2 is not None:
 
-            return results
+            assert len(self._fixed_parameters) == 2, "Cannot step in 2d if you fix only one parameter"
 
         else:
 
             assert len(self._fixed_parameters) == 1, "You cannot step in 1d if you fix 2 parameters"
 
-            return self._step1d(steps1)
+        # Get the current values (i.e., the best fit) of the fixed parameters, in the same order as the
+        # parameters dictionary (which is the order of the steps after _prepare_steps)
 
-    def __call__(self, values):
+        best_fit_point = [parameter._get_internal_value() for name, parameter in self._all_parameters.items()
+                          if name in self._fixed_parameters]
 
-        self._wrapper.set_fixed_values(values)
+        steps1, steps2, swapped = self._prepare_steps(steps1, steps2)
 
-        _, this_log_like = self._optimizer.minimize(compute_covar=False)
+        steps1 = np.array(steps1, dtype=float)
 
-        return this_log_like
+        if steps2 is not None:
 
-    def _step1d(self, steps1):
+            steps2 = np.array(steps2, dtype=float)
 
-        log_likes = np.zeros_like(steps1)
+            n2 = steps2.shape[0]
 
-        with progress_bar(len(steps1), title='Profiling likelihood') as p:
+        else:
 
-            for i, step in enumerate(steps1):
+            n2 = 1
 
-                if self._n_free_parameters > 0:
+        n1 = steps1.shape[0]
 
-                    # Profile out the free parameters
+        log_likes = np.zeros((n1, n2)) * np.nan
+        profiled = np.zeros((n1, n2), bool)
+        n_iterations = np.zeros((n1, n2), int)
 
-                    self._wrapper.set_fixed_values(step)
+        # Map (i, j) -> internal values of the free parameters at the profile minimum
 
-                    _, this_log_like = self._optimizer.minimize(compute_covar=False)
+        solutions = collections.OrderedDict()
+
+        with progress_bar(n1 * n2, title='Profiling likelihood (adaptive)') as p:
+
+            def get_log_like(i, j):
+
+                if not profiled[i, j]:
+
+                    if steps2 is None:
+
+                        values = [steps1[i]]
+
+                    else:
+
+                        values = [steps1[i], steps2[j]]
+
+                    this_log_like, this_solution, n_iterations[i, j] = \
+                        self._profile(values, self._get_starting_points(self._get_nearest_solution(solutions, i, j)))
+
+                    log_likes[i, j] = this_log_like
+                    profiled[i, j] = True
+
+                    if this_solution is not None:
+
+                        solutions[(i, j)] = this_solution
+
+                    p.increase()
+
+                return log_likes[i, j]
+
+            cells = collections.deque()
+
+            for i0, i1 in self._get_coarse_intervals(n1, n_initial_steps):
+
+                for j0, j1 in self._get_coarse_intervals(n2, n_initial_steps):
+
+                    cells.append((i0, i1, j0, j1))
+
+            # Sample the coarse grid first, so that we can establish the reference if needed
+
+            for i0, i1, j0, j1 in cells:
+
+                for i, j in itertools.product((i0, i1), (j0, j1)):
+
+                    get_log_like(i, j)
+
+            if reference is None:
+
+                reference = np.nanmin(log_likes)
+
+            levels = reference + np.array(delta_log_like_levels, dtype=float)
+
+            leaves = []
+
+            while len(cells) > 0:
+
+                i0, i1, j0, j1 = cells.popleft()
+
+                corners = np.array([get_log_like(i, j) for i, j in itertools.product((i0, i1), (j0, j1))])
+
+                if (i1 - i0 > 1 or j1 - j0 > 1) and \
+                        self._needs_refinement(corners, levels,
+                                               self._cell_contains(best_fit_point, steps1, steps2, i0, i1, j0, j1)):
+
+                    # Bisect the cell along each axis which has not reached full resolution yet
+
+                    for sub_i0, sub_i1 in self._bisect(i0, i1):
+
+                        for sub_j0, sub_j1 in self._bisect(j0, j1):
+
+                            cells.append((sub_i0, sub_i1, sub_j0, sub_j1))
 
                 else:
 
-                    # No free parameters, just compute the likelihood
+                    leaves.append((i0, i1, j0, j1))
 
-                    this_log_like = self._function(step)
+            # Fill the nodes which have not been profiled with a bilinear interpolation
 
-                log_likes[i] = this_log_like
+            for i0, i1, j0, j1 in leaves:
 
-                p.increase()
+                u = np.linspace(0, 1, i1 - i0 + 1)[:, np.newaxis]
+                v = np.linspace(0, 1, j1 - j0 + 1)[np.newaxis, :]
+
+                interpolated = (1 - u) * (1 - v) * log_likes[i0, j0] + (1 - u) * v * log_likes[i0, j1] + \
+                               u * (1 - v) * log_likes[i1, j0] + u * v * log_likes[i1, j1]
+
+                this_block = log_likes[i0:i1 + 1, j0:j1 + 1]
+                to_fill = ~profiled[i0:i1 + 1, j0:j1 + 1]
+
+                this_block[to_fill] = interpolated[to_fill]
+
+            p.increase(n1 * n2 - np.sum(profiled))
+
+        if steps2 is None:
+
+            log_likes = log_likes[:, 0]
+            n_iterations = n_iterations[:, 0]
+
+        elif swapped:
+
+            log_likes = log_likes.T
+            n_iterations = n_iterations.T
+
+        self._n_iterations = n_iterations
 
         return log_likes
 
-    def _step2d(self, steps1, steps2):
+    def _profile(self, values, starting_points=()):
+        """
+        Profile out the free parameters with the fixed parameters set to the given values (in internal reference)
+
+        :param values: values for the fixed parameters
+        :param starting_points: list of candidate starting points (internal values of the free parameters). The fit
+        starts from the candidate with the lowest value of the function, or from the current values if the list is
+        empty
+        :return: (-log(likelihood), internal values of the free parameters at the minimum, number of evaluations of
+        the function). If the fit fails the first is nan and the second is None
+        """
 
-        log_likes = np.zeros((len(steps1), len(steps2)))
+        if self._n_free_parameters == 0:
 
-        with progress_bar(len(steps1) * len(steps2), title='Profiling likelihood') as p:
+            # No free parameters, just compute the likelihood
 
-            for i, step1 in enumerate(steps1):
+            return self._function(*values), None, 1
 
-                for j,step2 in enumerate(steps2):
+        self._wrapper.set_fixed_values(values)
 
-                    if self._n_free_parameters > 0:
+        self._wrapper.reset_n_calls()
 
-                        # Profile out the free parameters
+        if len(starting_points) > 0:
 
-                        self._wrapper.set_fixed_values([step1, step2])
+            # Choosing the best candidate costs one evaluation per candidate, and prevents a warm start from dragging
+            # all the following fits into a worse local minimum found at a previous node
 
-                        try:
+            trial_values = np.array([self._wrapper(*point) for point in starting_points], dtype=float)
 
-                            _, this_log_like = self._optimizer.minimize(compute_covar=False)
+            trial_values[~np.isfinite(trial_values)] = np.inf
 
-                        except FitFailed:
+            self._optimizer._set_starting_point(starting_points[int(trial_values.argmin())])
 
-                            # If the user is stepping too far it might be that the fit fails. It is usually not a
-                            # problem
+        try:
 
-                            this_log_like = np.nan
+            _, this_log_like = self._optimizer.minimize(compute_covar=False)
 
-                    else:
+        except FitFailed:
 
-                        # No free parameters, just compute the likelihood
+            # If the user is stepping too far it might be that the fit fails. It is usually not a
+            # problem
 
-                        this_log_like = self._function(step1, step2)
+            return np.nan, None, self._wrapper.n_calls
 
-                    log_likes[i,j] = this_log_like
+        solution = [parameter._get_internal_value() for parameter in self._optimizer.parameters.values()]
 
-                    p.increase()
+        return this_log_like, solution, self._wrapper.n_calls
+
+    def _get_starting_points(self, warm_start):
+        """
+        Return the candidate starting points for a profile fit: the given warm start (if any) and the best fit
+
+        :param warm_start: internal values of the free parameters at a neighboring node, or None
+        :return: list of candidate starting points
+        """
+
+        if warm_start is None:
+
+            return [self._best_fit_free_values]
+
+        else:
+
+            return [warm_start, self._best_fit_free_values]
+
+    @staticmethod
+    def _get_nearest_solution(solutions, i, j):
+
+        if len(solutions) == 0:
+
+            return None
+
+        nodes = np.array(solutions.keys())
+
+        distances = (nodes[:, 0] - i) ** 2 + (nodes[:, 1] - j) ** 2
+
+        return solutions.values()[distances.argmin()]
+
+    @staticmethod
+    def _get_coarse_intervals(n_steps, n_initial_steps):
+
+        if n_steps == 1:
+
+            return [(0, 0)]
+
+        nodes = np.unique(np.round(np.linspace(0, n_steps - 1, max(min(n_initial_steps, n_steps), 2))).astype(int))
+
+        return zip(nodes[:-1], nodes[1:])
+
+    @staticmethod
+    def _bisect(start, stop):
+
+        if stop - start > 1:
+
+            middle = (start + stop) // 2
+
+            return [(start, middle), (middle, stop)]
+
+        else:
+
+            return [(start, stop)]
+
+    @staticmethod
+    def _cell_contains(point, steps1, steps2, i0, i1, j0, j1):
+
+        if not min(steps1[i0], steps1[i1]) <= point[0] <= max(steps1[i0], steps1[i1]):
+
+            return False
+
+        if steps2 is not None and not min(steps2[j0], steps2[j1]) <= point[1] <= max(steps2[j0], steps2[j1]):
+
+            return False
+
+        return True
+
+    @staticmethod
+    def _needs_refinement(corners, levels, contains_best_fit):
+
+        finite = np.isfinite(corners)
+
+        if not np.any(finite):
+
+            # All fits failed, there is no point in insisting
+
+            return False
+
+        if not np.all(finite) or contains_best_fit:
+
+            return True
+
+        return bool(np.any((levels > corners.min()) & (levels < corners.max())))
+
+    def __call__(self, values):
+
+        self._wrapper.set_fixed_values(values)
+
+        _, this_log_like = self._optimizer.minimize(compute_covar=False)
+
+        return this_log_like
+
+    @property
+    def n_iterations(self):
+        """
+        Number of evaluations of the function needed to profile each node in the last call to step() or
+        step_adaptive(), with the same shape as the returned -log(likelihood) (0 for nodes which were not profiled)
+        """
+
+        return self._n_iterations
+
+    def _step1d(self, steps1):
+
+        log_likes, self._n_iterations = self._step_along_path(zip(range(len(steps1)), [0] * len(steps1)),
+                                                              (len(steps1), 1),
+                                                              lambda i, j: [steps1[i]])
+
+        return log_likes[:, 0]
+
+    def _step2d(self, steps1, steps2):
+
+        log_likes, self._n_iterations = self._step_along_path(self._get_serpentine_path(len(steps1), len(steps2)),
+                                                              (len(steps1), len(steps2)),
+                                                              lambda i, j: [steps1[i], steps2[j]])
 
         return log_likes
 
+    @staticmethod
+    def _get_serpentine_path(n1, n2):
+        """
+        Return the nodes of a n1 x n2 grid in serpentine order, i.e., going forward along the second axis on even rows
+        and backward on odd rows, so that consecutive nodes are always neighbors
+
+        :return: list of (i, j) tuples
+        """
+
+        path = []
+
+        for i in range(n1):
+
+            if i % 2 == 0:
+
+                path.extend([(i, j) for j in range(n2)])
+
+            else:
+
+                path.extend([(i, j) for j in range(n2 - 1, -1, -1)])
+
+        return path
+
+    def _step_along_path(self, path, shape, get_values):
+        """
+        Profile the likelihood at the nodes of the grid in the order given by path, starting each fit from the
+        solution found at the previous node (or at the last node where the fit converged)
+
+        :param path: list of (i, j) indexes
+        :param shape: shape of the grid
+        :param get_values: a function returning the values of the fixed parameters for node (i, j)
+        :return: (matrix of -log(likelihood), matrix with the number of evaluations of the function for each node)
+        """
+
+        log_likes = np.zeros(shape)
+        n_iterations = np.zeros(shape, int)
+
+        starting_point = None
+
+        with progress_bar(len(path), title='Profiling likelihood') as p:
+
+            for i, j in path:
+
+                log_likes[i, j], solution, n_iterations[i, j] = self._profile(get_values(i, j),
+                                                                              self._get_starting_points(starting_point))
+
+                if solution is not None:
+
+                    starting_point = solution
+
+                p.increase()
+
+        return log_likes, n_iterations
+
 
 # This classes are used directly by the user to have better control on the minimizers.
 # They are actually factories
@@ -420,6 +781,8 @@ class Minimizer(object):
         self._algorithm_name = None
         self._m_log_like_minimum = None
 
+        self._contours_n_iterations = None
+
         self._optimizer_type = str(type)
 
     def _update_internal_parameter_dictionary(self):
@@ -702,6 +1065,14 @@ class Minimizer(object):
 
         return self._correlation_matrix
 
+    @property
+    def contours_n_iterations(self):
+        """
+        Number of evaluations of the function spent at each node of the grid in the last call to contours()
+        """
+
+        return self._contours_n_iterations
+
     def restore_best_fit(self):
         """
         Reset all the parameters to their best fit value (from the last run fit)
@@ -718,6 +1089,23 @@ class Minimizer(object):
         # Regenerate the internal parameter dictionary with the new values
         self._internal_parameters = self._update_internal_parameter_dictionary()
 
+    def _set_starting_point(self, internal_values):
+        """
+        Set the point (in internal reference) from which the next call to minimize() will start. Override this if
+        the minimizer stores the initial values of the parameters somewhere else than in the internal parameter
+        dictionary.
+
+        :param internal_values: values for the free parameters, in the same order as self.parameters
+        :return: none
+        """
+
+        for parameter, value in zip(self.parameters.values(), internal_values):
+
+            parameter._set_internal_value(value)
+
+        # Regenerate the internal parameter dictionary with the new values
+        self._internal_parameters = self._update_internal_parameter_dictionary()
+
     def _compute_covariance_matrix(self, best_fit_values):
         """
         This function compute the approximate covariance matrix as the inverse of the Hessian matrix,
@@ -1062,6 +1450,13 @@ class Minimizer(object):
             are linear for the second parameter. If you are generating the profile for only one parameter, you can specify
              'log=(True,)' or 'log=(False,)' (optional)
             :param: parallel: whether to use or not parallel computation (default:False)
+            :param adaptive: if True, instead of profiling the likelihood at every node of the grid start from a coarse
+            grid and refine only the regions crossing the levels given in delta_log_like_levels, warm-starting each fit
+            from the nearest solved node. The other nodes are filled by interpolation (optional, default: False)
+            :param delta_log_like_levels: differences in -log(likelihood) with respect to the minimum which must be
+            resolved at full resolution in adaptive mode (optional, default: 1, 2 and 3 sigma levels)
+            :param n_initial_steps: number of steps per parameter for the initial coarse grid in adaptive mode
+            (optional, default: 9)
             :return: a : an array corresponding to the steps for the first parameter
                      b : an array corresponding to the steps for the second parameter (or None if stepping only in one
                      direction)
@@ -1145,7 +1540,18 @@ class Minimizer(object):
 
             pr = ProfileLikelihood(self, fixed_parameters)
 
-            if n_dimensions == 1:
+            if options.get('adaptive', False):
+
+                delta_log_like_levels = options.get('delta_log_like_levels',
+                                                    get_delta_log_like_levels(n_dimensions))
+
+                results = pr.step_adaptive(param_1_steps,
+                                           param_2_steps if n_dimensions == 2 else None,
+                                           reference=self._m_log_like_minimum,
+                                           delta_log_like_levels=delta_log_like_levels,
+                                           n_initial_steps=options.get('n_initial_steps', 9))
+
+            elif n_dimensions == 1:
 
                 results = pr.step(param_1_steps)
 
@@ -1153,6 +1559,9 @@ class Minimizer(object):
 
                 results = pr.step(param_1_steps, param_2_steps)
 
+            self._contours_n_iterations = np.array(pr.n_iterations).reshape((param_1_steps.shape[0],
+                                                                             param_2_steps.shape[0]))
+
             # Return results
 
             return param_1_steps, param_2_steps, np.array(results).reshape((param_1_steps.shape[0],
@@ -169,6 +169,19 @@ class MinuitMinimizer(LocalMinimizer):
 
             self.minuit.values[minuit_name] = par._get_internal_value()
 
+    def _set_starting_point(self, internal_values):
+
+        super(MinuitMinimizer, self)._set_starting_point(internal_values)
+
+        # MIGRAD (with resume=False) always starts from the values used when the Minuit instance was created, so
+        # we need a new instance. Keep the tolerance that was set by the user (if any)
+
+        tolerance = self.minuit.tol
+
+        self._setup(None)
+
+        self.minuit.tol = tolerance
+
     def _is_fit_ok(self):
         """
         iMinuit provides the method migrad_ok(). However, that method also checks for a valid Hessian matrix, which
@@ -1,5 +1,7 @@
 import numpy as np
 import os
+import itertools
+import multiprocessing
 from threeML.minimizer.minimization import GlobalMinimizer
 from threeML.io.progress_bar import progress_bar
 from threeML.parallel.parallel_client import is_parallel_computation_active
@@ -49,9 +51,55 @@ class PAGMOWrapper(object):
         return "JointLikelihood"
 
 
+# The objective function and the algorithm used by the worker processes of the local archipelago. They are set before
+# the workers are started, so that the workers inherit them (on fork) instead of receiving them through pickle, which
+# does not work for most likelihood functions
+
+_island_context = {}
+
+
+def _evolve_island(task):
+    """
+    Evolve the population of an island for one evolution cycle. The population is exchanged as arrays of decision
+    vectors and fitness values, so that the problem is never pickled
+
+    :param task: tuple (island id, decision vectors, fitness values, seed). If the decision vectors are None, a new
+    random population is created
+    :return: tuple (island id, decision vectors, fitness values) of the evolved population
+    """
+
+    island_id, xs, fs, seed = task
+
+    wrapper = _island_context['wrapper']
+    algorithm = _island_context['algorithm']
+
+    if xs is None:
+
+        pop = pg.population(prob=wrapper, size=_island_context['population_size'], seed=seed)
+
+    else:
+
+        pop = pg.population(prob=wrapper, seed=seed)
+
+        for x, f in zip(xs, fs):
+
+            pop.push_back(x, f)
+
+    # Make the evolution reproducible, independently of the process which executes it
+
+    if algorithm.has_set_seed():
+
+        algorithm.set_seed(seed)
+
+    pop = algorithm.evolve(pop)
+
+    return island_id, pop.get_x(), pop.get_f()
+
+
 class PAGMOMinimizer(GlobalMinimizer):
 
-    valid_setup_keys = ('islands', 'population_size', 'evolution_cycles', 'second_minimization', 'algorithm')
+    valid_setup_keys = ('islands', 'population_size', 'evolution_cycles', 'second_minimization', 'algorithm',
+                        'processes')
 
     def __init__(self, function, parameters, verbosity=10, setup_dict=None):
 
@@ -63,7 +111,8 @@ class PAGMOMinimizer(GlobalMinimizer):
 
             default_setup = {'islands': 8,
                              'population_size': self._Npar * 20,
-                             'evolution_cycles': 1}
+                             'evolution_cycles': 1,
+                             'processes': multiprocessing.cpu_count()}
 
             self._setup_dict = default_setup
 
@@ -96,7 +145,13 @@ class PAGMOMinimizer(GlobalMinimizer):
         print("------------")
         print("- Number of islands:            %i" % islands)
         print("- Population size per island:   %i" % pop_size)
-        print("- Evolutions cycles per island: %i\n" % evolution_cycles)
+        print("- Evolutions cycles per island: %i" % evolution_cycles)
+
+        if not is_parallel_computation_active():
+
+            print("- Local processes:              %i" % self._get_number_of_processes(islands))
+
+        print("")
 
         Npar = len(self._internal_parameters)
 
@@ -147,29 +202,9 @@ class PAGMOMinimizer(GlobalMinimizer):
 
         else:
 
-            # do not use ipyparallel. Evolve populations on islands serially
-
-            wrapper = PAGMOWrapper(function=self.function, parameters=self._internal_parameters, dim=Npar)
-
-            xOpts = []
-            fOpts = np.zeros(islands)
-
-            with progress_bar(iterations=islands, title="pygmo minimization") as p:
-
-                for island_id in range(islands):
-
-                    pop = pg.population(prob=wrapper, size=pop_size)
-
-                    for i in range(evolution_cycles):
-
-                        pop = self._setup_dict['algorithm'].evolve(pop)
-
-                    # Gather results
-
-                    xOpts.append(pop.champion_x)
-                    fOpts[island_id] = pop.champion_f[0]
+            # do not use ipyparallel. Evolve the islands in a pool of local processes
 
-                    p.increase()
+            fOpts, xOpts = self._evolve_local_archipelago(islands, pop_size, evolution_cycles)
 
         # Find best and worst islands
 
@@ -192,3 +227,127 @@ class PAGMOMinimizer(GlobalMinimizer):
         best_fit_values = np.array(xOpt)
 
         return best_fit_values, fOpt
+
+    def _get_number_of_processes(self, islands):
+
+        processes = self._setup_dict.get('processes', multiprocessing.cpu_count())
+
+        return max(1, min(int(processes), islands))
+
+    def _evolve_local_archipelago(self, islands, pop_size, evolution_cycles):
+        """
+        Evolve the islands using a pool of local processes (no ipcluster needed). After each evolution cycle the
+        islands exchange solutions along a ring: the champion of each island replaces the worst individual of the next
+        island, if it is better
+
+        :param islands: number of islands
+        :param pop_size: number of individuals per island
+        :param evolution_cycles: number of evolution cycles
+        :return: (champion fitness of each island, champion decision vector of each island)
+        """
+
+        Npar = len(self._internal_parameters)
+
+        _island_context['wrapper'] = PAGMOWrapper(function=self.function, parameters=self._internal_parameters,
+                                                  dim=Npar)
+        _island_context['algorithm'] = self._setup_dict['algorithm']
+        _island_context['population_size'] = pop_size
+
+        processes = self._get_number_of_processes(islands)
+
+        # Seeds for each island and cycle, so that the result does not depend on the number of processes
+
+        seeds = np.random.randint(0, 2 ** 31 - 1, size=(evolution_cycles, islands))
+
+        populations = [(None, None)] * islands
+
+        # Minimum of each island after each cycle
+
+        history = np.zeros((evolution_cycles, islands))
+
+        pool = multiprocessing.Pool(processes) if processes > 1 else None
+
+        try:
+
+            mapper = pool.imap_unordered if pool is not None else itertools.imap
+
+            with progress_bar(iterations=islands * evolution_cycles, title="pygmo minimization") as p:
+
+                for cycle in range(evolution_cycles):
+
+                    tasks = [(island_id, populations[island_id][0], populations[island_id][1], seeds[cycle, island_id])
+                             for island_id in range(islands)]
+
+                    for island_id, xs, fs in mapper(_evolve_island, tasks):
+
+                        populations[island_id] = (xs, fs)
+
+                        history[cycle, island_id] = fs[:, 0].min()
+
+                        p.increase()
+
+                    if cycle < evolution_cycles - 1 and islands > 1:
+
+                        populations = self._migrate(populations)
+
+        finally:
+
+            if pool is not None:
+
+                pool.close()
+                pool.join()
+
+            _island_context.clear()
+
+        # Per-island summary
+
+        if evolution_cycles > 1:
+
+            print("\nMinimum of each island after each evolution cycle:")
+
+            for cycle in range(evolution_cycles):
+
+                print("Cycle %i: %s" % (cycle + 1, " ".join(["%.3f" % f for f in history[cycle]])))
+
+        fOpts = np.zeros(islands)
+        xOpts = []
+
+        for island_id, (xs, fs) in enumerate(populations):
+
+            best = fs[:, 0].argmin()
+
+            fOpts[island_id] = fs[best, 0]
+            xOpts.append(xs[best])
+
+        return fOpts, xOpts
+
+    @staticmethod
+    def _migrate(populations):
+        """
+        Ring migration: the champion of each island replaces the worst individual of the next island, if it is better
+
+        :param populations: list of (decision vectors, fitness values) for each island
+        :return: the new list of populations
+        """
+
+        champions = [(xs[fs[:, 0].argmin()], fs[:, 0].min()) for xs, fs in populations]
+
+        new_populations = []
+
+        for island_id, (xs, fs) in enumerate(populations):
+
+            migrant_x, migrant_f = champions[island_id - 1]
+
+            worst = fs[:, 0].argmax()
+
+            if migrant_f < fs[worst, 0]:
+
+                xs = xs.copy()
+                fs = fs.copy()
+
+                xs[worst] = migrant_x
+                fs[worst, 0] = migrant_f
+
+            new_populations.append((xs, fs))
+
+        return new_populations
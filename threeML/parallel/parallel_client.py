@@ -243,7 +243,16 @@ if has_parallel:
 
             return self._current_amr
 
-        def execute_with_progress_bar(self, worker, items, chunk_size=None):
+        def iterate_with_progress_bar(self, worker, items, chunk_size=None):
+            """
+            Apply the worker to the items on the engines, yielding the results as soon as they are available (so the
+            caller does not need to keep all of them in memory)
+
+            :param worker: the function to be applied
+            :param items: the items to apply the function to
+            :param chunk_size: see _interactive_map
+            :return: a generator of (position of the item in items, result), in order of completion
+            """
 
             # Let's make a wrapper which will allow us to recover the order
             def wrapper(x):
@@ -260,14 +269,16 @@ if has_parallel:
 
                 amr = self._interactive_map(wrapper, items_wrapped, ordered=False, chunk_size=chunk_size)
 
-                results = []
+                for res in amr:
 
-                for i, res in enumerate(amr):
-
-                    results.append(res)
+                    yield res
 
                     p.increase()
 
+        def execute_with_progress_bar(self, worker, items, chunk_size=None):
+
+            results = list(self.iterate_with_progress_bar(worker, items, chunk_size=chunk_size))
+
             # Reorder the list according to the id
             return map(lambda x:x[1], sorted(results, key=lambda x:x[0]))
 
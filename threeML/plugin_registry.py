@@ -0,0 +1,147 @@
+import importlib
+import traceback
+from collections import OrderedDict
+
+from threeML.exceptions import custom_exceptions
+from threeML.exceptions.custom_exceptions import custom_warnings
+from threeML.utils.import_profiler import import_profiler
+
+# This is the static manifest of the plugins distributed with threeML: plugin class -> (module, instrument). Plugins
+# are not imported when threeML is imported, but only the first time they are used (many of them depend on heavy
+# instrument software). When adding a plugin, add it here
+
+_plugin_manifest = OrderedDict([('DispersionSpectrumLike', ('threeML.plugins.DispersionSpectrumLike',
+                                                            "General binned spectral data with energy dispersion")),
+                                ('FermiLATLike', ('threeML.plugins.FermiLATLike', "Fermi LAT (standard classes)")),
+                                ('FermipyLike', ('threeML.plugins.FermipyLike', "Fermi LAT (with fermipy)")),
+                                ('HAWCLike', ('threeML.plugins.HAWCLike', "HAWC")),
+                                ('OGIPLike', ('threeML.plugins.OGIPLike', "All OGIP-compliant instruments")),
+                                ('PhotometryLike', ('threeML.plugins.PhotometryLike', "Generic photometric data")),
+                                ('POLARLike', ('threeML.plugins.POLARLike', "POLAR spectroscopy")),
+                                ('SpectrumLike', ('threeML.plugins.SpectrumLike', "General binned spectral data")),
+                                ('SwiftXRTLike', ('threeML.plugins.SwiftXRTLike', "Swift XRT")),
+                                ('XYLike', ('threeML.plugins.XYLike', "n.a."))])
+
+# These are filled as plugins get imported (instrument -> plugin class name, plugin class name -> traceback)
+
+_working_plugins = {}
+_not_working_plugins = {}
+
+_plugin_classes = {}
+
+
+def get_plugin_names():
+    """
+    :return: the names of the plugin classes in the manifest (whether they can be imported or not)
+    """
+
+    return _plugin_manifest.keys()
+
+
+def get_plugin_class(plugin):
+    """
+    Import (if not done before) and return the class of a plugin
+
+    :param plugin: the name of the plugin class
+    :return: the plugin class, or None if the plugin cannot be imported (in which case a warning is issued)
+    """
+
+    if plugin not in _plugin_manifest:
+
+        raise RuntimeError("Plugin %s is not known" % plugin)
+
+    if plugin in _plugin_classes:
+
+        return _plugin_classes[plugin]
+
+    if plugin in _not_working_plugins:
+
+        return None
+
+    module_name, instrument = _plugin_manifest[plugin]
+
+    try:
+
+        with import_profiler:
+
+            module = importlib.import_module(module_name)
+
+        plugin_class = getattr(module, plugin)
+
+    except:
+
+        custom_warnings.warn("Could not import plugin %s. Do you have the relative instrument software installed "
+                             "and configured?" % plugin,
+                             custom_exceptions.CannotImportPlugin)
+
+        _not_working_plugins[plugin] = traceback.format_exc()
+
+        return None
+
+    _plugin_classes[plugin] = plugin_class
+    _working_plugins[instrument] = plugin
+
+    return plugin_class
+
+
+def get_available_plugins():
+    """
+    Print a list of available plugins. Note that this imports all plugins
+
+    :return:
+    """
+
+    for plugin in _plugin_manifest:
+
+        get_plugin_class(plugin)
+
+    print("Available plugins:\n")
+
+    for instrument, class_name in _working_plugins.items():
+
+        print("%s for %s" % (class_name, instrument))
+
+
+def _display_plugin_traceback(plugin):
+
+    print("#############################################################")
+    print("\nCouldn't import plugin %s" % plugin)
+    print("\nTraceback:\n")
+    print(_not_working_plugins[plugin])
+    print("#############################################################")
+
+
+def is_plugin_available(plugin):
+    """
+    Test whether the plugin for the provided instrument is available
+
+    :param plugin: the name of the plugin class
+    :return: True or False
+    """
+
+    plugin_class = get_plugin_class(plugin)
+
+    if plugin_class is None:
+
+        _display_plugin_traceback(plugin)
+
+        return False
+
+    # FIXME
+    if plugin == "FermipyLike":
+
+        try:
+
+            _ = plugin_class.__new__(plugin_class, test=True)
+
+        except:
+
+            # Do not register it
+
+            _not_working_plugins[plugin] = traceback.format_exc()
+
+            _display_plugin_traceback(plugin)
+
+            return False
+
+    return True
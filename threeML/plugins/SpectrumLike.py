@@ -23,6 +23,7 @@ from threeML.utils.binner import Rebinner
 from threeML.utils.spectrum.binned_spectrum import BinnedSpectrum, ChannelSet
 
 from threeML.utils.string_utils import dash_separated_string_to_tuple
+from threeML.utils.source_stack import PointSourceStack
 from threeML.utils.spectrum.pha_spectrum import PHASpectrum
 
 from threeML.utils.statistics.stats_tools import Significance
@@ -761,6 +762,12 @@ class SpectrumLike(PluginPrototype):
 
         self._source_name = source_name
 
+        # The sources are resolved when the model is set, so we need to set it again
+
+        if self._like_model is not None:
+
+            self.set_model(self._like_model)
+
 
     @property
     def likelihood_model(self):
@@ -1501,38 +1508,14 @@ class SpectrumLike(PluginPrototype):
 
     def _get_diff_flux_and_integral(self, likelihood_model):
 
-        if self._source_name is None:
-
-            n_point_sources = likelihood_model.get_number_of_point_sources()
-
-            # Make a function which will stack all point sources (OGIP do not support spatial dimension)
-
-            def differential_flux(energies):
-                fluxes = likelihood_model.get_point_source_fluxes(0, energies, tag=self._tag)
-
-                # If we have only one point source, this will never be executed
-                for i in range(1, n_point_sources):
-                    fluxes += likelihood_model.get_point_source_fluxes(i, energies, tag=self._tag)
-
-                return fluxes
-
-
-        else:
-
-            # This SpectrumLike dataset refers to a specific source
-
-            # Note that we checked that self._source_name is in the model when the model was set
-
-            try:
-
-                def differential_flux(energies):
+        # Resolve the sources once (OGIP do not support spatial dimension, so we stack all point sources, or use
+        # only the source this dataset has been assigned to)
 
-                    return likelihood_model.sources[self._source_name](energies, tag=self._tag)
+        source_stack = PointSourceStack(likelihood_model, self._source_name)
 
-            except KeyError:
+        def differential_flux(energies):
 
-                raise KeyError("This XYLike plugin has been assigned to source %s, "
-                               "which does not exist in the current model" % self._source_name)
+            return source_stack(energies, tag=self._tag)
 
         # The following integrates the diffFlux function using Simpson's rule
         # This assume that the intervals e1,e2 are all small, which is guaranteed
@@ -11,6 +11,7 @@ from threeML.data_list import DataList
 from threeML.plugin_prototype import PluginPrototype
 from threeML.utils.statistics.likelihood_functions import half_chi2
 from threeML.utils.statistics.likelihood_functions import poisson_log_likelihood_ideal_bkg
+from threeML.utils.source_stack import PointSourceStack
 from threeML.exceptions.custom_exceptions import custom_warnings
 __instrument_name = "n.a."
 
@@ -76,6 +77,7 @@ class XYLike(PluginPrototype):
         self._joint_like_obj = None
 
         self._likelihood_model = None
+        self._source_stack = None
         # currently not used by XYLike, but needed for subclasses
 
         self._mask = np.ones(self._x.shape, dtype=bool)
@@ -241,6 +243,10 @@ class XYLike(PluginPrototype):
 
         self._source_name = source_name
 
+        if self._likelihood_model is not None:
+
+            self._source_stack = PointSourceStack(self._likelihood_model, self._source_name)
+
     @property
     def x(self):
 
@@ -285,39 +291,20 @@ class XYLike(PluginPrototype):
                                                 "This XYLike plugin refers to the source %s, " \
                                                 "but that source is not in the likelihood model" % (self._source_name)
 
-        self._likelihood_model = likelihood_model_instance
-
-    def _get_total_expectation(self):
-
-        if self._source_name is None:
-
-            n_point_sources = self._likelihood_model.get_number_of_point_sources()
-
-            assert n_point_sources > 0, "You need to have at least one point source defined"
-            assert self._likelihood_model.get_number_of_extended_sources() == 0, "XYLike does not support extended sources"
-
-            # Make a function which will stack all point sources (XYLike do not support spatial dimension)
-
-            expectation = np.sum(map(lambda source: source(self._x, tag=self._tag),
-                                     self._likelihood_model.point_sources.values()),
-                                 axis=0)
-
         else:
 
-            # This XYLike dataset refers to a specific source
+            assert likelihood_model_instance.get_number_of_extended_sources() == 0, "XYLike does not support " \
+                                                                                    "extended sources"
 
-            # Note that we checked that self._source_name is in the model when the model was set
-
-            try:
+        self._likelihood_model = likelihood_model_instance
 
-                expectation = self._likelihood_model.sources[self._source_name](self._x)
+        # Resolve the sources once here instead of at each evaluation of the likelihood
 
-            except KeyError:
+        self._source_stack = PointSourceStack(self._likelihood_model, self._source_name)
 
-                raise KeyError("This XYLike plugin has been assigned to source %s, "
-                               "which does not exist in the current model" % self._source_name)
+    def _get_total_expectation(self):
 
-        return expectation
+        return self._source_stack(self._x, tag=self._tag)
 
     def get_log_like(self):
         """
@@ -5,6 +5,7 @@ import numpy as np
 import scipy.integrate
 import scipy.interpolate
 import scipy.optimize
+import scipy.sparse
 
 import matplotlib.pyplot as plt
 
@@ -34,6 +35,11 @@ class IntervalContainer(object):
 
         self._n_integration_points = int(n_integration_points)
 
+        # Keep the likelihood curve, used by CastroLike to build a table with the curves of all intervals
+
+        self._log_parameter_values = np.log10(parameter_values)
+        self._likelihood_values = likelihood_values
+
         # Build interpolation of the likelihood curve
         self._minus_likelihood_interp = scipy.interpolate.InterpolatedUnivariateSpline(np.log10(parameter_values),
                                                                                        -likelihood_values,
@@ -73,6 +79,14 @@ class IntervalContainer(object):
     def n_integration_points(self):
         return self._n_integration_points
 
+    @property
+    def log_parameter_values(self):
+        return self._log_parameter_values
+
+    @property
+    def likelihood_values(self):
+        return self._likelihood_values
+
     def __call__(self, parameter_value):
 
         return -self._minus_likelihood_interp(np.log10(parameter_value))
@@ -119,6 +133,90 @@ class IntervalContainer(object):
         return low_bound_cl, self._minimum[0], hi_bound_cl
 
 
+def _get_simpson_weights(x):
+    """
+    Returns the weights w such that np.sum(w * y) is the integral of y(x) with the composite Simpson's rule for
+    unequally spaced points (the same used by scipy.integrate.simps when the number of points is odd)
+
+    :param x: the points (must be an odd number)
+    :return: the weights
+    """
+
+    assert x.shape[0] % 2 == 1, "Simpson's rule needs an odd number of points"
+
+    h = np.diff(x)
+
+    h0 = h[0::2]
+    h1 = h[1::2]
+
+    h_sum = h0 + h1
+
+    weights = np.zeros_like(x, dtype=float)
+
+    weights[0:-1:2] += h_sum / 6.0 * (2.0 - h1 / h0)
+    weights[1::2] += h_sum / 6.0 * h_sum ** 2 / (h0 * h1)
+    weights[2::2] += h_sum / 6.0 * (2.0 - h0 / h1)
+
+    return weights
+
+
+class LikelihoodProfileTable(object):
+
+    def __init__(self, interval_containers):
+        """
+        A table with the likelihood profiles of many intervals, to evaluate them all at once with the same linear
+        interpolation (and extrapolation) in log10 of the parameter that each IntervalContainer uses
+
+        :param interval_containers: list of IntervalContainer instances
+        """
+
+        n_intervals = len(interval_containers)
+
+        n_values = np.array(map(lambda x: x.log_parameter_values.shape[0], interval_containers))
+
+        max_n_values = n_values.max()
+
+        # The profiles have different lengths, so we pad the table. The padding knots are at infinity, so that they
+        # are never selected
+
+        self._knots = np.zeros((n_intervals, max_n_values)) + np.inf
+        self._values = np.zeros((n_intervals, max_n_values))
+
+        for i, interval_container in enumerate(interval_containers):
+
+            self._knots[i, :n_values[i]] = interval_container.log_parameter_values
+            self._values[i, :n_values[i]] = interval_container.likelihood_values
+
+        # Slopes of the segments (the padding ones are never used)
+
+        with np.errstate(invalid='ignore'):
+
+            self._slopes = np.diff(self._values, axis=1) / np.diff(self._knots, axis=1)
+
+        self._last_segment = n_values - 2
+
+        self._rows = np.arange(n_intervals)
+
+    def __call__(self, parameter_values):
+        """
+        Evaluate the likelihood of each interval
+
+        :param parameter_values: the value of the parameter for each interval
+        :return: the log likelihood of each interval
+        """
+
+        log_parameter_values = np.log10(parameter_values)
+
+        # Find the segment containing each value (the first or the last one if the value is outside the table)
+
+        segments = np.sum(self._knots <= log_parameter_values[:, None], axis=1) - 1
+
+        segments = np.clip(segments, 0, self._last_segment)
+
+        return (self._values[self._rows, segments] +
+                (log_parameter_values - self._knots[self._rows, segments]) * self._slopes[self._rows, segments])
+
+
 class CastroLike(PluginPrototype):
 
     def __init__(self, name, interval_containers):
@@ -158,6 +256,18 @@ class CastroLike(PluginPrototype):
 
         assert all_xx.shape[0] == total_n, "One or more containers are overlapping. This is not supported."
 
+        # Precompute the integration of the model over all the intervals (divided by their length) as a sparse
+        # matrix with the Simpson's weights, and the table with all the likelihood profiles, so that get_log_like
+        # does not need to loop over the intervals
+
+        weights = np.concatenate([_get_simpson_weights(xx) / (container.stop - container.start)
+                                  for xx, container in zip(xxs, self._active_containers)])
+
+        self._integration_matrix = scipy.sparse.csr_matrix((weights, np.arange(total_n), np.append(0, splits)),
+                                                           shape=(len(self._active_containers), total_n))
+
+        self._likelihood_table = LikelihoodProfileTable(self._active_containers)
+
         return all_xx, np.split(all_xx, splits), splits
 
     def set_active_measurements(self, tmin, tmax):
@@ -200,31 +310,15 @@ class CastroLike(PluginPrototype):
         parameters
         """
 
-        log_l = 0.0
-
         # Evaluate once for all
-        all_yy = np.split(self._likelihood_model.get_total_flux(self._all_xx), self._splits)
-
-        for i, interval_container in enumerate(self._active_containers):
-
-            # Get integral of model between start and stop for this interval
-            # xx = np.logspace(np.log10(interval_container.start),
-            #                  np.log10(interval_container.stop),
-            #                  interval_container.n_integration_points)
-            #
-            # yy = self._likelihood_model.get_total_flux(xx)
-            #
-            # assert np.allclose(yy, all_yy[i])
-            xx = self._all_xx_split[i]
-            yy = all_yy[i]
 
-            length = interval_container.stop - interval_container.start
+        all_yy = self._likelihood_model.get_total_flux(self._all_xx)
 
-            expected_flux = scipy.integrate.simps(yy, xx) / length
+        # Average flux in each interval
 
-            this_log_l = interval_container(expected_flux)
+        expected_fluxes = self._integration_matrix.dot(all_yy)
 
-            log_l += this_log_l
+        log_l = np.sum(self._likelihood_table(expected_fluxes))
 
         return log_l
 
@@ -4,12 +4,14 @@ import ROOT
 import numpy as np
 
 import scipy.integrate
+import scipy.sparse
 import astromodels
 
 from threeML.io.cern_root_utils.io_utils import get_list_of_keys, open_ROOT_file
 from threeML.io.cern_root_utils.tobject_to_numpy import tgraph_to_arrays, th2_to_arrays, tree_to_ndarray
 from threeML.plugin_prototype import PluginPrototype
 from threeML.exceptions.custom_exceptions import custom_warnings
+from threeML.utils.source_stack import PointSourceStack
 
 from threeML.utils.statistics.likelihood_functions import poisson_observed_poisson_background
 
@@ -101,6 +103,10 @@ class VERITASRun(object):
         # Exposure is tOn*(1-tDeadtimeFrac)
         self._exposure = float(1 - self._tRunSummary['DeadTimeFracOn']) * float(self._tRunSummary['tOn'])
 
+        # Precompute everything which does not depend on the source model
+
+        self._precompute_folding()
+
         # Members for generating OGIP equivalents
 
         self._mission = "VERITAS"
@@ -175,6 +181,45 @@ class VERITASRun(object):
 
         self._hMigration = hMigration_new
 
+    def _precompute_folding(self):
+        """
+        Precompute the migration matrix multiplied by the exposure and divided by the simulated spectrum (for the
+        fast and for the slow evaluation), as well as the grid used to integrate the model in each Monte Carlo energy
+        bin. Then the predicted counts are a single matrix-vector product with the differential flux of the model
+        (fast) or with its integral in the Monte Carlo bins (slow), and only the model needs to be evaluated in
+        get_log_like
+        """
+
+        e1 = 10 ** self._log_mc_energies[:-1]
+        e2 = 10 ** self._log_mc_energies[1:]
+
+        # Grid of 30 points in each Monte Carlo bin, used to integrate the model with Simpson's rule
+
+        self._integration_grid = e1[:, None] + (e2 - e1)[:, None] * np.linspace(0, 1, 30)[None, :]
+
+        # The weights of the Monte Carlo events are the ratio between the model and the simulated spectrum, either
+        # evaluated at the center of the bins (fast) or integrated in the bins (slow). In the latter case the
+        # widths of the bins cancel out
+
+        self._folding_matrix_fast = self._get_folding_matrix(self._simulated_spectrum(self._mc_energies_c))
+
+        self._folding_matrix = self._get_folding_matrix(self._simulated_spectrum_f(e1, e2))
+
+    def _get_folding_matrix(self, sim_spectrum):
+
+        folding_matrix = self._hMigration * self._exposure / sim_spectrum[None, :]
+
+        # The migration matrix is usually mostly empty (only bins close to the diagonal are filled), in which case
+        # a sparse matrix is faster
+
+        if np.count_nonzero(folding_matrix) < 0.25 * folding_matrix.size:
+
+            return scipy.sparse.csr_matrix(folding_matrix)
+
+        else:
+
+            return np.ascontiguousarray(folding_matrix)
+
     @staticmethod
     def _bin_counts_log(counts, log_bins):
 
@@ -217,38 +262,6 @@ class VERITASRun(object):
         print(repr)
 
 
-    def _get_diff_flux_and_integral(self, like_model):
-
-        n_point_sources = like_model.get_number_of_point_sources()
-
-        # Make a function which will stack all point sources (OGIP do not support spatial dimension)
-
-        def differential_flux(energies):
-            fluxes = like_model.get_point_source_fluxes(0, energies)
-
-            # If we have only one point source, this will never be executed
-            for i in range(1, n_point_sources):
-                fluxes += like_model.get_point_source_fluxes(i, energies)
-
-            return fluxes
-
-        # The following integrates the diffFlux function using Simpson's rule
-        # This assume that the intervals e1,e2 are all small, which is guaranteed
-        # for any reasonable response matrix, given that e1 and e2 are Monte-Carlo
-        # energies. It also assumes that the function is smooth in the interval
-        # e1 - e2 and twice-differentiable, again reasonable on small intervals for
-        # decent models. It might fail for models with too sharp features, smaller
-        # than the size of the monte carlo interval.
-
-        def integral(e1, e2):
-            # Simpson's rule
-
-            return (e2 - e1) / 6.0 * (differential_flux(e1)
-                                      + 4 * differential_flux((e1 + e2) / 2.0)
-                                      + differential_flux(e2))
-
-        return differential_flux, integral
-
     @staticmethod
     def _simulated_spectrum(x):
 
@@ -261,51 +274,50 @@ class VERITASRun(object):
 
         return integral_f(e2) - integral_f(e1)
 
-    @staticmethod
-    def _integrate(function, e1, e2):
-
-        integrals = []
+    def get_model_energies(self, fast=True):
+        """
+        Returns the energies where the differential flux of the model must be evaluated to compute the likelihood
 
-        for ee1, ee2 in zip(e1,e2):
+        :param fast: whether to use the fast evaluation (at the center of the Monte Carlo bins) or not (integrating
+        the model in the Monte Carlo bins)
+        :return: energies (keV)
+        """
 
-            grid = np.linspace(ee1, ee2, 30)
+        if fast:
 
-            integrals.append(scipy.integrate.simps(function(grid), grid))
+            return self._mc_energies_c
 
-        # integrals = map(lambda x:scipy.integrate.quad(function, x[0], x[1], epsrel=1e-2)[0], zip(e1, e2))
+        else:
 
-        return np.array(integrals)
+            return self._integration_grid.ravel()
 
     def get_log_like(self, like_model, fast=True):
 
-        # Reweight the response matrix
-        diff_flux, integral = self._get_diff_flux_and_integral(like_model)
-
-        e1 = 10**self._log_mc_energies[:-1]
-        e2 = 10**self._log_mc_energies[1:]
-
-        dE = (e2 - e1)
-
-        if not fast:
+        differential_flux = PointSourceStack(like_model)
 
-            this_spectrum = self._integrate(diff_flux, e1, e2) / dE  # 1 / keV cm2 s
+        return self.get_log_like_from_fluxes(differential_flux(self.get_model_energies(fast)), fast)
 
-            sim_spectrum = self._simulated_spectrum_f(e1, e2) / dE # 1 / keV cm2 s
+    def get_log_like_from_fluxes(self, fluxes, fast=True):
+        """
+        Compute the log likelihood from the differential flux of the model
 
-        else:
-            this_spectrum = diff_flux(self._mc_energies_c)
+        :param fluxes: differential flux of the model (1 / keV cm2 s) at the energies returned by get_model_energies
+        :param fast: whether to use the fast evaluation or not (must be the same used in get_model_energies)
+        :return: (log likelihood, dictionary of intermediate results)
+        """
 
-            sim_spectrum = self._simulated_spectrum(self._mc_energies_c)
+        # Reweight the response matrix
 
-        weight = this_spectrum / sim_spectrum  # type: np.ndarray
+        if not fast:
 
-        # print("Sum of weight: %s" % np.sum(weight))
+            integrals = scipy.integrate.simps(fluxes.reshape(self._integration_grid.shape), self._integration_grid,
+                                              axis=1)  # 1 / cm2 s
 
-        n_pred = np.zeros(self._n_chan)
+            n_pred = self._folding_matrix.dot(integrals)
 
-        for i in range(n_pred.shape[0]):
+        else:
 
-            n_pred[i] = np.sum(self._hMigration[i, :] * weight) * self._exposure
+            n_pred = self._folding_matrix_fast.dot(fluxes)
 
         log_like, _ = poisson_observed_poisson_background(self._counts, self._bkg_counts, self._bkg_renorm,
                                                           n_pred)
@@ -372,6 +384,29 @@ class VERITASLike(PluginPrototype):
                 # self._runs_like[run_name].set_active_measurements("c50-c130")
                 self._runs_like[run_name] = this_run
 
+        # Runs with the same Monte Carlo energy bins (usually all of them) share the evaluation of the model, so
+        # that only the folding scales with the number of runs
+
+        self._run_groups = []
+
+        for run in self._runs_like.values():
+
+            energies = run.get_model_energies()
+
+            for group_energies, group_runs in self._run_groups:
+
+                if np.array_equal(group_energies, energies):
+
+                    group_runs.append(run)
+
+                    break
+
+            else:
+
+                self._run_groups.append((energies, [run]))
+
+        self._source_stack = None
+
         super(VERITASLike, self).__init__(name, {})
 
     def rebin_on_background(self, *args, **kwargs):
@@ -394,6 +429,8 @@ class VERITASLike(PluginPrototype):
         # Set the model for all runs
         self._likelihood_model = likelihood_model_instance  # type: astromodels.Model
 
+        self._source_stack = PointSourceStack(self._likelihood_model)
+
         # for run in self._runs_like.values():
         #
         #     run.set_model(likelihood_model_instance)
@@ -407,9 +444,13 @@ class VERITASLike(PluginPrototype):
         # Collect the likelihood from each run
         total = 0
 
-        for run in self._runs_like.values():
+        for energies, runs in self._run_groups:
+
+            fluxes = self._source_stack(energies)
+
+            for run in runs:
 
-            total += run.get_log_like(self._likelihood_model)[0]
+                total += run.get_log_like_from_fluxes(fluxes)[0]
 
         return total
 
@@ -44,6 +44,20 @@ def reset_random_seed():
               )
 
 
+# This is run automatically before *every* test (autouse=True)
+@pytest.fixture(scope="function", autouse=True)
+def isolate_background_cache(monkeypatch, tmpdir_factory):
+
+    # Use an empty background cache for each test, so that the tests do not write into the user's cache and the
+    # background fits are always executed (instead of being restored from a previous run)
+
+    from threeML.utils.time_series import background_cache
+
+    cache_directory = str(tmpdir_factory.mktemp("backgrounds"))
+
+    monkeypatch.setattr(background_cache, '_get_background_cache_directory', lambda: cache_directory)
+
+
 def get_grb_model(spectrum):
 
     triggerName = 'bn090217206'
@@ -1,3 +1,5 @@
+import pytest
+
 from threeML import *
 from threeML.plugins.XYLike import XYLike
 
@@ -160,6 +162,38 @@ def test_XYLike_assign_to_source():
     assert log_like_before != log_like_after
 
 
+def test_XYLike_point_source_stack():
+
+    xy = XYLike("test", x, np.array(gauss_signal), np.array(gauss_sigma))
+
+    fitfun = Line() + Gaussian()
+    fitfun2 = Line()
+    fitfun2.a = 0.5
+    fitfun2.b = 3.0
+
+    pts1 = PointSource("pts1", ra=0.0, dec=0.0, spectral_shape=fitfun)
+    pts2 = PointSource("pts2", ra=2.5, dec=3.2, spectral_shape=fitfun2)
+
+    model = Model(pts1, pts2)
+
+    xy.set_model(model)
+
+    # The evaluation of the sources does not modify the output of a single source
+
+    expected = fitfun(x) + fitfun2(x)
+
+    assert np.allclose(xy.get_model(), expected)
+    assert np.allclose(xy.get_model(), expected)
+
+    xy.assign_to_source("pts2")
+
+    assert np.allclose(xy.get_model(), fitfun2(x))
+
+    with pytest.raises(AssertionError):
+
+        xy.assign_to_source("pts3")
+
+
 def test_XYLike_dataframe():
 
 
@@ -6,10 +6,14 @@ import astropy.units as u
 from threeML.plugins.XYLike import XYLike
 from threeML import Model, DataList, JointLikelihood, PointSource
 from threeML import BayesianAnalysis, Uniform_prior, Log_uniform_prior
-from threeML.analysis_results import MLEResults, load_analysis_results, AnalysisResultsSet
+from threeML.analysis_results import MLEResults, load_analysis_results, AnalysisResultsSet, AnalysisResultsHDF5
+from threeML.analysis_results import has_h5py
 from astromodels import Line, Gaussian, Powerlaw
 
 
+skip_if_h5py_is_not_available = pytest.mark.skipif(not has_h5py, reason="h5py is not installed")
+
+
 _cache = {}
 
 # These are the same simulated dataset we use in the test of the XY plugin
@@ -105,6 +109,136 @@ def test_analysis_set_input_output(xy_fitted_joint_likelihood):
         _results_are_same(res1, res2)
 
 
+def test_analysis_set_lazy_loading(xy_fitted_joint_likelihood):
+
+    jl, _, _ = xy_fitted_joint_likelihood  # type: JointLikelihood, None, None
+
+    jl.restore_best_fit()
+
+    ar = jl.results  # type: MLEResults
+
+    analysis_set = AnalysisResultsSet([ar, ar, ar])
+
+    temp_file = "_analysis_set_lazy_test"
+
+    analysis_set.write_to(temp_file, overwrite=True)
+
+    analysis_set_reloaded = load_analysis_results(temp_file)
+
+    os.remove(temp_file)
+
+    # The summary is available without building any result
+
+    summary = analysis_set_reloaded.get_summary_frame()
+
+    assert all(not isinstance(result, MLEResults) for result in analysis_set_reloaded._results)
+
+    expected_summary = analysis_set.get_summary_frame()
+
+    assert list(summary.index) == list(expected_summary.index)
+    assert np.allclose(summary['value'].values, expected_summary['value'].values)
+    assert np.all(summary['unit'].values == expected_summary['unit'].values)
+
+    # Results are built when accessed, and only once
+
+    res = analysis_set_reloaded[1]
+
+    assert isinstance(res, MLEResults)
+    assert analysis_set_reloaded[1] is res
+    assert not isinstance(analysis_set_reloaded._results[0], MLEResults)
+
+    assert len(analysis_set_reloaded[1:]) == 2
+
+    _results_are_same(ar, res)
+
+    # Closing the set releases the file: the results already read are still available, the others are not
+
+    analysis_set.write_to(temp_file, overwrite=True)
+
+    with load_analysis_results(temp_file) as analysis_set_reloaded:
+
+        res = analysis_set_reloaded[0]
+
+    assert analysis_set_reloaded._open_fits_file is None
+
+    _results_are_same(ar, res)
+
+    with pytest.raises(RuntimeError):
+
+        _ = analysis_set_reloaded[1]
+
+    os.remove(temp_file)
+
+
+@skip_if_h5py_is_not_available
+def test_analysis_results_hdf5(xy_fitted_joint_likelihood, tmpdir):
+
+    jl, _, _ = xy_fitted_joint_likelihood  # type: JointLikelihood, None, None
+
+    jl.restore_best_fit()
+
+    ar = jl.results  # type: MLEResults
+
+    # One result
+
+    temp_file = str(tmpdir.join("_test_mle.h5"))
+
+    ar.write_to(temp_file, overwrite=True)
+
+    ar_reloaded = load_analysis_results(temp_file)
+
+    _results_are_same(ar, ar_reloaded)
+
+    # A set of results, written at once
+
+    analysis_set = AnalysisResultsSet([ar, ar, ar])
+
+    analysis_set.set_bins("testing", [-1, 1, 3], [1, 3, 5], unit='s')
+
+    temp_file = str(tmpdir.join("_analysis_set_test.h5"))
+
+    analysis_set.write_to(temp_file, overwrite=True)
+
+    with load_analysis_results(temp_file) as analysis_set_reloaded:
+
+        assert len(analysis_set_reloaded) == 3
+
+        assert np.all(analysis_set_reloaded._sequence_tuple[0][1] == [-1, 1, 3] * u.s)
+
+        assert np.allclose(analysis_set_reloaded.get_summary_frame()['value'].values,
+                           analysis_set.get_summary_frame()['value'].values)
+
+        for res1, res2 in zip(analysis_set, analysis_set_reloaded):
+
+            _results_are_same(res1, res2)
+
+    # Results streamed to the file one at a time, appending to an existing file. The model is stored only once
+
+    temp_file = str(tmpdir.join("_analysis_stream_test.h5"))
+
+    with AnalysisResultsHDF5(temp_file) as hdf5_file:
+
+        hdf5_file.append(ar)
+
+    with AnalysisResultsHDF5(temp_file, append=True) as hdf5_file:
+
+        hdf5_file.append(ar)
+
+        assert hdf5_file.n_results == 2
+
+    with pytest.raises(IOError):
+
+        AnalysisResultsHDF5(temp_file)
+
+    with load_analysis_results(temp_file) as analysis_set_reloaded:
+
+        assert len(analysis_set_reloaded) == 2
+
+        assert len(analysis_set_reloaded._open_hdf5_file['models']) == 1
+
+        _results_are_same(ar, analysis_set_reloaded[1])
+
+
 def test_error_propagation(xy_fitted_joint_likelihood):
 
     jl, _, _ = xy_fitted_joint_likelihood  # type: JointLikelihood, None, None
@@ -185,6 +319,24 @@ def test_bayesian_input_output(xy_completed_bayesian_analysis):
     _results_are_same(rb1, rb2, bayes=True)
 
 
+@skip_if_h5py_is_not_available
+def test_bayesian_input_output_hdf5(xy_completed_bayesian_analysis, tmpdir):
+
+    bs, _ = xy_completed_bayesian_analysis
+
+    rb1 = bs.results
+
+    temp_file = str(tmpdir.join("_test_bayes.h5"))
+
+    rb1.write_to(temp_file, overwrite=True)
+
+    rb2 = load_analysis_results(temp_file)
+
+    assert np.allclose(rb1.samples, rb2.samples)
+
+    _results_are_same(rb1, rb2, bayes=True)
+
+
 def test_corner_plotting(xy_completed_bayesian_analysis):
 
     bs, _ = xy_completed_bayesian_analysis
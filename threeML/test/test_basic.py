@@ -1,4 +1,5 @@
 from threeML import *
+from threeML.minimizer.minimization import get_delta_log_like_levels
 
 
 def test_basic_analsis_results(fitted_joint_likelihood_bn090217206_nai):
@@ -68,6 +69,31 @@ def test_basic_analysis_contour_2d(fitted_joint_likelihood_bn090217206_nai):
     assert np.allclose(res[1], exp_p2, rtol=0.1)
 
 
+def test_basic_analysis_contour_2d_adaptive(fitted_joint_likelihood_bn090217206_nai):
+
+    jl, fit_results, like_frame = fitted_joint_likelihood_bn090217206_nai
+
+    jl.restore_best_fit()
+
+    powerlaw = jl.likelihood_model.bn090217206.spectrum.main.Powerlaw
+
+    res = jl.get_contours(powerlaw.index, -1.25, -1.1, 30, powerlaw.K, 1.8, 3.4, 30)
+
+    jl.restore_best_fit()
+
+    res_adaptive = jl.get_contours(powerlaw.index, -1.25, -1.1, 30, powerlaw.K, 1.8, 3.4, 30, adaptive=True)
+
+    assert np.allclose(res_adaptive[0], res[0])
+    assert np.allclose(res_adaptive[1], res[1])
+    assert res_adaptive[2].shape == res[2].shape
+
+    # The regions within the 1 and 2 sigma contours must be the same
+
+    for level in jl.current_minimum + get_delta_log_like_levels(2, sigmas=(1, 2)):
+
+        assert np.all((res_adaptive[2] < level) == (res[2] < level))
+
+
 def test_basic_bayesian_analysis_results(completed_bn090217206_bayesian_analysis):
 
     bayes, samples = completed_bn090217206_bayesian_analysis
@@ -91,6 +117,28 @@ def test_basic_analsis_multicomp_results(fitted_joint_likelihood_bn090217206_nai
     assert np.allclose(fit_results['value'].values, expected, rtol=0.1)
 
 
+def test_basic_analysis_multicomp_contour_2d(fitted_joint_likelihood_bn090217206_nai_multicomp):
+
+    jl, fit_results, like_frame = fitted_joint_likelihood_bn090217206_nai_multicomp
+
+    jl.restore_best_fit()
+
+    composite = jl.likelihood_model.bn090217206.spectrum.main.composite
+
+    res = jl.get_contours(composite.index_1, -1.3, -1.1, 6, composite.K_1, 1.5, 2.3, 6)
+
+    n_iterations = jl.minimizer.contours_n_iterations
+
+    assert n_iterations.shape == (6, 6)
+    assert np.all(n_iterations > 0)
+
+    # The profile cannot go below the minimum, and must reach it close to the best fit
+
+    assert np.all(np.isfinite(res[2]))
+    assert res[2].min() > jl.current_minimum - 0.1
+    assert res[2].min() < jl.current_minimum + 1.0
+
+
 def test_basic_bayesian_analysis_results_multicomp(completed_bn090217206_bayesian_analysis_multicomp):
 
     bayes, samples = completed_bn090217206_bayesian_analysis_multicomp
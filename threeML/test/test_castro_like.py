@@ -0,0 +1,78 @@
+import numpy as np
+import scipy.integrate
+from astromodels import *
+
+from threeML.plugins.experimental.CastroLike import CastroLike, IntervalContainer, _get_simpson_weights
+
+
+def get_interval_containers():
+
+    np.random.seed(1234)
+
+    edges = np.logspace(0, 3, 41)
+
+    containers = []
+
+    for i, (start, stop) in enumerate(zip(edges[:-1], edges[1:])):
+
+        # A parabolic likelihood profile (in log space) around a measured flux, with a different number of points
+        # for each interval
+
+        measured_flux = 10 ** np.random.uniform(-3, -1)
+
+        parameter_values = np.logspace(np.log10(measured_flux) - 2, np.log10(measured_flux) + 2, 20 + i)
+
+        likelihood_values = -0.5 * ((np.log10(parameter_values) - np.log10(measured_flux)) / 0.3) ** 2
+
+        containers.append(IntervalContainer(start, stop, parameter_values, likelihood_values, 21 + 2 * (i % 3)))
+
+    return containers
+
+
+def test_simpson_weights():
+
+    x = np.logspace(0, 1, 11)
+    y = x ** -1.5
+
+    assert np.isclose(np.sum(_get_simpson_weights(x) * y), scipy.integrate.simps(y, x))
+
+
+def test_castro_like_log_like():
+
+    containers = get_interval_containers()
+
+    castro = CastroLike("castro", containers)
+
+    model = Model(PointSource("grb", 0.0, 0.0, spectral_shape=Powerlaw(K=0.1, index=-0.8)))
+
+    castro.set_model(model)
+
+    def get_expected_log_like(active_containers):
+
+        log_l = 0.0
+
+        for container in active_containers:
+
+            xx = np.logspace(np.log10(container.start), np.log10(container.stop), container.n_integration_points)
+
+            expected_flux = scipy.integrate.simps(model.get_total_flux(xx), xx) / (container.stop - container.start)
+
+            log_l += container(expected_flux)
+
+        return log_l
+
+    assert np.isclose(castro.get_log_like(), get_expected_log_like(containers))
+
+    # Including values outside of the likelihood profiles (extrapolation)
+
+    model.grb.spectrum.main.Powerlaw.K = 1e3
+
+    assert np.isclose(castro.get_log_like(), get_expected_log_like(containers))
+
+    model.grb.spectrum.main.Powerlaw.K = 0.05
+
+    n_active = castro.set_active_measurements(10.0, 500.0)
+
+    assert n_active == len(castro.active_containers)
+
+    assert np.isclose(castro.get_log_like(), get_expected_log_like(castro.active_containers))
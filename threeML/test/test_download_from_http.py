@@ -0,0 +1,260 @@
+import os
+import gzip
+import StringIO
+import hashlib
+import threading
+import BaseHTTPServer
+import SocketServer
+
+import pytest
+
+from threeML.io.download_from_http import ApacheDirectory
+
+
+class _FakeApacheHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serves the files in server.files (name -> content) with an Apache-like listing, ETags and Range requests
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+
+        pass
+
+    def do_GET(self):
+
+        self.server.requests.append((self.path, self.headers.getheader('Range')))
+        self.server.accept_encodings.append(self.headers.getheader('Accept-Encoding'))
+
+        if self.path == '/':
+
+            lines = ['<img src="/icons/unknown.gif" alt="[   ]"> <a href="%s">%s</a>    16-Nov-2012 15:14   96K' %
+                     (name, name) for name in sorted(self.server.files)]
+
+            self._send(200, "<pre>\n%s\n</pre>\n" % "\n".join(lines), {})
+
+            return
+
+        name = self.path[1:]
+
+        if name not in self.server.files:
+
+            self._send(404, "", {})
+
+            return
+
+        content = self.server.files[name]
+
+        etag = '"%s"' % hashlib.md5(content).hexdigest()
+
+        headers = {'ETag': etag}
+
+        if name in self.server.encoded_files:
+
+            # A server which applies a content encoding even if it was not requested
+
+            headers['Content-Encoding'] = 'gzip'
+
+        range_header = self.headers.getheader('Range')
+
+        if range_header is not None and self.headers.getheader('If-Range') == etag:
+
+            first_byte = int(range_header.split("=")[1].split("-")[0])
+
+            if first_byte >= len(content):
+
+                self._send(416, "", headers)
+
+                return
+
+            headers['Content-Range'] = 'bytes %i-%i/%i' % (first_byte, len(content) - 1, len(content))
+
+            self._send(206, content[first_byte:], headers)
+
+        else:
+
+            self._send(200, content, headers)
+
+    def _send(self, code, body, headers):
+
+        self.send_response(code)
+
+        for key, value in headers.items():
+
+            self.send_header(key, value)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        self.wfile.write(body)
+
+
+class _FakeApacheServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+
+@pytest.fixture
+def apache_server():
+
+    server = _FakeApacheServer(('127.0.0.1', 0), _FakeApacheHandler)
+
+    server.files = dict([("file_%i.fit" % i, os.urandom(50000 + i)) for i in range(6)])
+    server.requests = []
+    server.accept_encodings = []
+    server.encoded_files = set()
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _get_url(server):
+
+    return "http://127.0.0.1:%i/" % server.server_address[1]
+
+
+def test_concurrent_download(apache_server, tmpdir):
+
+    directory = ApacheDirectory(_get_url(apache_server), max_transfers=3)
+
+    assert sorted(directory.files) == sorted(apache_server.files)
+
+    names = sorted(apache_server.files)
+
+    compress = [i % 2 == 0 for i in range(len(names))]
+
+    local_files = directory.download_files(names, str(tmpdir), progress=False, compress=compress)
+
+    for name, this_compress, local_file in zip(names, compress, local_files):
+
+        if this_compress:
+
+            assert local_file == os.path.join(str(tmpdir), name + '.gz')
+
+            with gzip.open(local_file) as f:
+
+                assert f.read() == apache_server.files[name]
+
+        else:
+
+            assert local_file == os.path.join(str(tmpdir), name)
+
+            with open(local_file, 'rb') as f:
+
+                assert f.read() == apache_server.files[name]
+
+        assert not os.path.exists(local_file + '.part')
+
+    # Downloading again does not transfer anything (the server answers with the same ETag, and the body is not read)
+
+    assert directory.download_all_files(str(tmpdir), progress=False, pattern='file_1.+') == [local_files[1]]
+
+    with open(local_files[1], 'rb') as f:
+
+        assert f.read() == apache_server.files[names[1]]
+
+
+def test_resume_and_validation(apache_server, tmpdir):
+
+    directory = ApacheDirectory(_get_url(apache_server))
+
+    name = "file_0.fit"
+    content = apache_server.files[name]
+
+    local_file = directory.download(name, str(tmpdir), progress=False)
+
+    # Simulate an interrupted download of a new version of the file
+
+    content = os.urandom(80000)
+    apache_server.files[name] = content
+
+    partial_file = local_file + '.part'
+
+    with open(partial_file, 'wb') as f:
+
+        f.write(content[:30000])
+
+    with open(os.path.join(str(tmpdir), '.%s.part.etag' % name), 'w') as f:
+
+        f.write('"%s"' % hashlib.md5(content).hexdigest())
+
+    del apache_server.requests[:]
+
+    assert directory.download(name, str(tmpdir), progress=False) == local_file
+
+    # Only the missing part has been requested
+
+    assert apache_server.requests == [('/%s' % name, 'bytes=30000-')]
+
+    with open(local_file, 'rb') as f:
+
+        assert f.read() == content
+
+    assert not os.path.exists(partial_file)
+
+    # A partial file of an older version of the file is downloaded again from the beginning
+
+    with open(partial_file, 'wb') as f:
+
+        f.write(os.urandom(30000))
+
+    with open(os.path.join(str(tmpdir), '.%s.part.etag' % name), 'w') as f:
+
+        f.write('"old version"')
+
+    os.remove(local_file)
+
+    directory.download(name, str(tmpdir), progress=False)
+
+    with open(local_file, 'rb') as f:
+
+        assert f.read() == content
+
+    # A file which changed on the server is downloaded again, even if it has the same size
+
+    content = os.urandom(80000)
+    apache_server.files[name] = content
+
+    directory.download(name, str(tmpdir), progress=False)
+
+    with open(local_file, 'rb') as f:
+
+        assert f.read() == content
+
+    with pytest.raises(AssertionError):
+
+        directory.download("non_existent.fit", str(tmpdir), progress=False)
+
+
+def test_download_with_content_encoding(apache_server, tmpdir):
+
+    name = "file_2.fit"
+
+    # The server sends a gzip-compressed content with "Content-Encoding: gzip". The file must be saved as it is
+    # sent (as it would be for a .gz file), without being decoded
+
+    compressed_content = StringIO.StringIO()
+
+    with gzip.GzipFile(fileobj=compressed_content, mode='wb') as f:
+
+        f.write(apache_server.files[name])
+
+    apache_server.files[name] = compressed_content.getvalue()
+    apache_server.encoded_files.add(name)
+
+    directory = ApacheDirectory(_get_url(apache_server))
+
+    local_file = directory.download(name, str(tmpdir), progress=False)
+
+    with open(local_file, 'rb') as f:
+
+        assert f.read() == apache_server.files[name]
+
+    assert set(apache_server.accept_encodings) == set(['identity'])
@@ -1,11 +1,13 @@
 import os
 
 import numpy as np
+import pandas as pd
 import pytest
 from conftest import get_test_datasets_directory
 from threeML.io.file_utils import within_directory
 from threeML.utils.time_interval import TimeIntervalSet
-from threeML.utils.time_series.event_list import EventListWithDeadTime, EventList
+from threeML.utils.time_series.event_list import EventListWithDeadTime, EventList, EventListWithLiveTime
+from threeML.utils.time_series.polynomial import Polynomial, PolynomialSet
 
 __this_dir__ = os.path.join(os.path.abspath(os.path.dirname(__file__)))
 datasets_dir = get_test_datasets_directory()
@@ -120,3 +122,318 @@ def test_binned_fit():
         evt_list.__repr__()
 
 
+
+
+def test_active_time_intervals_counts():
+
+    np.random.seed(1234)
+
+    n_channels = 8
+
+    # include events exactly on the boundary between two touching intervals
+
+    arrival_times = np.concatenate((np.random.uniform(-10, 10, 5000), [1., 1., 1.]))
+    measurement = np.random.randint(0, n_channels, len(arrival_times))
+    dead_time = np.random.uniform(0, 1e-5, len(arrival_times))
+
+    evt_list = EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=measurement,
+                                     n_channels=n_channels,
+                                     start_time=-10,
+                                     stop_time=10,
+                                     dead_time=dead_time,
+                                     verbose=False)
+
+    evt_list.set_polynomial_fit_interval('-10--5', '5-10', unbinned=False)
+
+    evt_list.set_active_time_intervals('-3-1', '1-2.5', '4-6')
+
+    time_mask = np.zeros(len(arrival_times), dtype=bool)
+
+    for tmin, tmax in ((-3, 1), (1, 2.5), (4, 6)):
+
+        time_mask |= (tmin <= arrival_times) & (arrival_times <= tmax)
+
+    expected_counts = np.array([np.sum(time_mask & (measurement == chan)) for chan in range(n_channels)])
+
+    assert np.all(evt_list._counts == expected_counts)
+
+    assert np.allclose(evt_list._exposure, 7.5 - dead_time[time_mask].sum())
+
+    for chan in range(n_channels):
+
+        poly = evt_list.polynomials[chan]
+
+        intervals = ((-3, 1), (1, 2.5), (4, 6))
+
+        assert np.isclose(evt_list._poly_counts[chan], np.sum([poly.integral(a, b) for a, b in intervals]))
+
+        assert np.isclose(evt_list._poly_count_err[chan],
+                          np.sqrt(np.sum([poly.integral_error(a, b) ** 2 for a, b in intervals])))
+
+
+def test_polynomial_set():
+
+    polynomials = [Polynomial.from_previous_fit([1., 2., 0.5], np.diag([0.1, 0.01, 0.001])),
+                   Polynomial.from_previous_fit([3.], np.array([[0.2]])),
+                   Polynomial.from_previous_fit([0.5, -0.1], np.array([[0.1, 0.01], [0.01, 0.05]]))]
+
+    poly_set = PolynomialSet(polynomials)
+
+    assert len(poly_set) == 3
+    assert poly_set[1] is polynomials[1]
+
+    starts = np.array([-5., 0., 2.])
+    stops = np.array([-1., 1., 10.])
+
+    integrals = poly_set.integral(starts, stops)
+    errors = poly_set.integral_error(starts, stops)
+
+    assert integrals.shape == (3, 3)
+    assert errors.shape == (3, 3)
+
+    for i, poly in enumerate(polynomials):
+
+        assert np.allclose(poly_set(starts)[:, i], poly(starts))
+
+        assert np.allclose(integrals[:, i], [poly.integral(a, b) for a, b in zip(starts, stops)])
+
+        assert np.allclose(errors[:, i], [poly.integral_error(a, b) for a, b in zip(starts, stops)])
+
+    # scalars work as well
+
+    assert np.allclose(poly_set.integral(0., 1.), integrals[1])
+
+
+def test_view_lightcurve():
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-10, 20, 20000))
+
+    evt_list = EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=np.random.randint(0, 4, len(arrival_times)),
+                                     n_channels=4,
+                                     start_time=-10,
+                                     stop_time=20,
+                                     dead_time=np.zeros_like(arrival_times),
+                                     verbose=False)
+
+    evt_list.set_polynomial_fit_interval('-10--1', '10-20', unbinned=False)
+
+    fig = evt_list.view_lightcurve(start=-10, stop=20, dt=0.5)
+
+    expected_counts, _ = np.histogram(arrival_times, bins=np.arange(-10, 20 + 0.5, 0.5))
+
+    light_curve = fig.axes[0].lines[0]
+
+    assert np.allclose(np.array(light_curve.get_ydata())[:-1] * 0.5, expected_counts)
+
+    # downsampling merges consecutive bins preserving the total number of counts
+
+    fig = evt_list.view_lightcurve(start=-10, stop=20, dt=0.001, max_bins=100)
+
+    light_curve = fig.axes[0].lines[0]
+
+    rates = np.array(light_curve.get_ydata())[:-1]
+
+    assert len(rates) <= 100
+
+    widths = np.diff(light_curve.get_xdata())
+
+    assert np.isclose(np.sum(rates * widths), np.sum((arrival_times >= -10) & (arrival_times <= 20.001)))
+
+
+def test_live_time_exposure():
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(0, 10, 1000))
+
+    # Live time bins of 1 s with a gap between 6 and 7 s
+
+    live_time_starts = np.array([0., 1., 2., 3., 4., 5., 7., 8., 9.])
+    live_time_stops = live_time_starts + 1.0
+    live_time = np.random.uniform(0.5, 1.0, len(live_time_starts))
+
+    evt_list = EventListWithLiveTime(arrival_times=arrival_times,
+                                     measurement=np.random.randint(0, 4, len(arrival_times)),
+                                     n_channels=4,
+                                     live_time=live_time,
+                                     live_time_starts=live_time_starts,
+                                     live_time_stops=live_time_stops,
+                                     start_time=0,
+                                     stop_time=10,
+                                     verbose=False)
+
+    # A brute force integration of the live time, assumed uniform within each bin
+
+    def expected_exposure(start, stop):
+
+        overlaps = np.maximum(np.minimum(stop, live_time_stops) - np.maximum(start, live_time_starts), 0.0)
+
+        return np.sum(live_time * overlaps / (live_time_stops - live_time_starts))
+
+    starts = np.array([0.0, 2.0, 2.3, 5.5, -1.0, 6.2, 3.0])
+    stops = np.array([10.0, 5.0, 2.6, 7.5, 1.5, 6.8, 3.0])
+
+    expected = [expected_exposure(start, stop) for start, stop in zip(starts, stops)]
+
+    assert np.allclose(evt_list._exposures_over_intervals(starts, stops), expected)
+
+    for start, stop, this_expected in zip(starts, stops, expected):
+
+        assert np.isclose(evt_list.exposure_over_interval(start, stop), this_expected)
+
+
+def test_compact_event_storage():
+
+    np.random.seed(1234)
+
+    arrival_times = np.random.uniform(0, 100, 10000)
+    pha = np.random.randint(0, 129, len(arrival_times)).astype(np.int16)
+
+    # GBM-like dead time: longer for the events in the overflow channel
+
+    dead_time = np.where(pha == 128, 10.E-6, 2.E-6)
+
+    evt_list = EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=pha,
+                                     n_channels=128,
+                                     start_time=0,
+                                     stop_time=100,
+                                     dead_time=dead_time,
+                                     verbose=False)
+
+    assert evt_list.measurement.dtype == np.uint8
+
+    assert np.all(evt_list.measurement == pha)
+
+    # the events are not sorted, but the selections are the same as with a mask
+
+    starts = np.array([0., 10.5, 42.])
+    stops = np.array([5., 30., 100.])
+
+    exposures = evt_list.exposure_over_interval(starts, stops)
+
+    for start, stop, exposure in zip(starts, stops, exposures):
+
+        mask = (arrival_times >= start) & (arrival_times <= stop)
+
+        assert np.isclose(exposure, (stop - start) - dead_time[mask].sum(), rtol=0, atol=1e-12)
+
+        expected_counts = np.bincount(pha[mask][pha[mask] < 128], minlength=128)
+
+        assert np.all(evt_list.count_per_channel_over_interval(start, stop) == expected_counts)
+
+    evt_list.set_active_time_intervals('0-5', '10.5-30')
+
+    mask = ((arrival_times >= 0) & (arrival_times <= 5)) | ((arrival_times >= 10.5) & (arrival_times <= 30))
+
+    assert np.isclose(evt_list._active_dead_time, dead_time[mask].sum(), rtol=0, atol=1e-12)
+
+
+def test_background_cache(monkeypatch, tmpdir):
+
+    from threeML.utils.time_series import background_cache
+
+    monkeypatch.setattr(background_cache, '_get_background_cache_directory', lambda: str(tmpdir))
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-10, 20, 5000))
+    measurement = np.random.randint(0, 4, len(arrival_times))
+
+    def make_event_list():
+
+        return EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=measurement,
+                                     n_channels=4,
+                                     start_time=-10,
+                                     stop_time=20,
+                                     dead_time=np.zeros_like(arrival_times),
+                                     verbose=False)
+
+    evt_list = make_event_list()
+
+    evt_list.set_polynomial_fit_interval('-10--1', '10-20', unbinned=False)
+
+    assert len(tmpdir.listdir()) == 1
+
+    # the same data with the same selections must not be fit again
+
+    cached_evt_list = make_event_list()
+
+    def no_fit():
+
+        raise AssertionError("The background should have been restored from the cache")
+
+    cached_evt_list._fit_polynomials = no_fit
+
+    cached_evt_list.set_polynomial_fit_interval('-10--1', '10-20', unbinned=False)
+
+    assert np.all(cached_evt_list._polynomials.coefficients == evt_list._polynomials.coefficients)
+    assert np.all(cached_evt_list._polynomials.covariance_matrices == evt_list._polynomials.covariance_matrices)
+    assert cached_evt_list.poly_order == evt_list.poly_order
+
+    # different selections are a different entry
+
+    evt_list.set_polynomial_fit_interval('-10--2', '10-20', unbinned=False)
+
+    assert len(tmpdir.listdir()) == 2
+
+
+def test_restore_fit(tmpdir):
+
+    np.random.seed(1234)
+
+    arrival_times = np.sort(np.random.uniform(-10, 20, 5000))
+    measurement = np.random.randint(0, 4, len(arrival_times))
+
+    def make_event_list():
+
+        return EventListWithDeadTime(arrival_times=arrival_times,
+                                     measurement=measurement,
+                                     n_channels=4,
+                                     start_time=-10,
+                                     stop_time=20,
+                                     dead_time=np.zeros_like(arrival_times) + 1e-5,
+                                     verbose=False)
+
+    evt_list = make_event_list()
+
+    evt_list.set_polynomial_fit_interval('-10--1', '10-20', unbinned=False)
+
+    filename = str(tmpdir.join('background.h5'))
+
+    evt_list.save_background(filename)
+
+    restored = make_event_list()
+
+    restored.restore_fit(filename)
+
+    assert np.all(restored._polynomials.coefficients == evt_list._polynomials.coefficients)
+    assert np.all(restored._polynomials.covariance_matrices == evt_list._polynomials.covariance_matrices)
+
+    assert np.all(restored._poly_selected_counts == evt_list._poly_selected_counts)
+    assert np.isclose(restored._poly_exposure, evt_list._poly_exposure)
+
+    # files written with one array per channel can still be read
+
+    legacy_filename = str(tmpdir.join('legacy.h5'))
+
+    with pd.HDFStore(legacy_filename) as store:
+
+        pd.Series([poly.coefficients for poly in evt_list._polynomials]).to_hdf(store, 'coefficients')
+        pd.Series([poly.covariance_matrix for poly in evt_list._polynomials]).to_hdf(store, 'covariance')
+
+        store.get_storer('coefficients').attrs.metadata = {'poly_order': evt_list.poly_order,
+                                                           'poly_selections': [(-10., -1.), (10., 20.)],
+                                                           'unbinned': False,
+                                                           'fit_method': 'Powell'}
+
+    restored = make_event_list()
+
+    restored.restore_fit(legacy_filename)
+
+    assert np.all(restored._polynomials.coefficients == evt_list._polynomials.coefficients)
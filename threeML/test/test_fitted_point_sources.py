@@ -1,7 +1,9 @@
 import pytest
 from threeML import *
 from threeML.plugins.OGIPLike import OGIPLike
-from threeML.utils.fitted_objects.fitted_point_sources import InvalidUnitError
+from threeML.utils.fitted_objects.fitted_point_sources import InvalidUnitError, FittedPointSourceSpectralHandler
+from threeML.utils.fitted_objects.fitted_point_sources import integrate_on_log_grid
+import scipy.integrate
 from threeML.io.calculate_flux import _calculate_point_source_flux
 import astropy.units as u
 import matplotlib.pyplot as plt
@@ -188,3 +190,119 @@ def test_units_on_energy_range(analysis_to_test):
     with pytest.raises(AssertionError):
         plot_point_source_spectra(analysis_to_test[0], ene_min=1.*u.keV, ene_max=1.)
 
+
+
+def test_broadcast_propagation(analysis_to_test):
+
+    energies = np.logspace(1, 3, 10)
+
+    for x in (analysis_to_test[0], analysis_to_test[3]):
+
+        handler = FittedPointSourceSpectralHandler(x, 'bn090217206', energies, 'keV', '1/(cm2 s keV)')
+
+        # The point by point evaluation must give the same variates as the broadcast one
+
+        broadcast_variates = handler._evaluate_on_grid()
+
+        for energy, variate in zip(energies, broadcast_variates):
+
+            expected = handler._propagated_function(energy)
+
+            assert np.allclose(variate.samples, expected.samples)
+
+    # Composite functions do not support broadcasting and must fall back to the point by point evaluation
+
+    handler = FittedPointSourceSpectralHandler(analysis_to_test[1], 'bn090217206', energies, 'keV', '1/(cm2 s keV)')
+
+    assert np.all(np.isfinite(handler.median))
+
+
+def test_integrate_on_log_grid():
+
+    cutoff_powerlaw = lambda x, index, cutoff: x ** index * np.exp(-x / cutoff)
+
+    indexes = np.array([-2.5, -1.0, 0.5])
+    cutoffs = np.array([30.0, 300.0, 3000.0])
+
+    # All samples at once
+
+    integrals = integrate_on_log_grid(cutoff_powerlaw, 10., 40000., index=indexes, cutoff=cutoffs)
+
+    assert integrals.shape == (3,)
+
+    for integral, index, cutoff in zip(integrals, indexes, cutoffs):
+
+        expected = scipy.integrate.quad(cutoff_powerlaw, 10., 40000., args=(index, cutoff))[0]
+
+        assert np.isclose(integral, expected, rtol=1e-6, atol=0)
+
+    # Many intervals at once
+
+    e1 = np.array([[1.0, 10.0]])
+    e2 = np.array([[100.0, 1e4]])
+
+    integrals = integrate_on_log_grid(cutoff_powerlaw, e1, e2, index=indexes.reshape(-1, 1), cutoff=300.0)
+
+    assert integrals.shape == (3, 2)
+
+    assert np.isclose(integrals[1, 1],
+                      scipy.integrate.quad(cutoff_powerlaw, 10.0, 1e4, args=(-1.0, 300.0))[0],
+                      rtol=1e-6, atol=0)
+
+
+def test_flux_calculation_with_cache(analysis_to_test, monkeypatch, tmpdir):
+
+    import threeML.io.calculate_flux as calculate_flux
+
+    monkeypatch.setattr(calculate_flux, '_get_flux_cache_directory', lambda: str(tmpdir))
+
+    flux_keywords = {'use_components': True,
+                     'components_to_use': ['Powerlaw'],
+                     'flux_unit': 'erg/(cm2 s)',
+                     'energy_unit': 'keV',
+                     'use_cache': True}
+
+    # Use the simple models and the Powerlaw component of the composite one
+
+    analyses = (analysis_to_test[0], analysis_to_test[3], analysis_to_test[4])
+
+    first = _calculate_point_source_flux(10, 40000, *analyses, **flux_keywords)
+
+    n_cached = len(tmpdir.listdir())
+
+    assert n_cached > 0
+
+    # The second time the fluxes must come from the cache (and be identical)
+
+    second = _calculate_point_source_flux(10, 40000, *analyses, **flux_keywords)
+
+    assert len(tmpdir.listdir()) == n_cached
+
+    for df1, df2 in zip(first, second):
+
+        for column in df1.columns:
+
+            assert np.allclose([x.value for x in df1[column]], [x.value for x in df2[column]])
+
+    # A different energy range is a different entry in the cache
+
+    _ = _calculate_point_source_flux(10, 1000, analysis_to_test[0], **flux_keywords)
+
+    assert len(tmpdir.listdir()) == n_cached + 1
+
+
+def test_flux_calculation_parallel(analysis_to_test):
+
+    analyses = (analysis_to_test[0], analysis_to_test[3])
+
+    serial = _calculate_point_source_flux(10, 40000, *analyses, flux_unit='erg/(cm2 s)')
+
+    with parallel_computation(start_cluster=False):
+
+        parallel = _calculate_point_source_flux(10, 40000, *analyses, flux_unit='erg/(cm2 s)')
+
+    for df1, df2 in zip(serial, parallel):
+
+        assert list(df1.index) == list(df2.index)
+
+        assert np.allclose([x.value for x in df1['flux']], [x.value for x in df2['flux']], rtol=0.1)
@@ -1,4 +1,8 @@
+import pytest
+import numpy as np
+
 from threeML import *
+from threeML.analysis_results import has_h5py
 from conftest import data_list_bn090217206_nai6, get_grb_model
 
 
@@ -32,3 +36,70 @@ def test_joint_likelihood_set_parallel():
     print(res)
 
 
+
+
+@pytest.mark.skipif(not has_h5py, reason="h5py is not installed")
+def test_joint_likelihood_set_checkpoint(tmpdir):
+
+    checkpoint = str(tmpdir.join("checkpoint"))
+
+    # Simulate a crash at the fourth iteration
+
+    def get_data_and_crash(id):
+
+        if id == 3:
+
+            raise KeyboardInterrupt()
+
+        return get_data(id)
+
+    jlset = JointLikelihoodSet(data_getter=get_data_and_crash, model_getter=get_model, n_iterations=5)
+
+    with pytest.raises(KeyboardInterrupt):
+
+        jlset.go(compute_covariance=False, checkpoint=checkpoint)
+
+    parameter_frames, like_frames, results = load_joint_likelihood_set_checkpoint(checkpoint)
+
+    assert len(results[0]) == 3
+    assert list(parameter_frames.index.levels[0]) == [0, 1, 2]
+
+    # (the results keep the files open for reading until they are closed)
+
+    for results_set in results:
+
+        results_set.close()
+
+    # Resume: only the missing iterations are computed
+
+    computed = []
+
+    def get_data_and_record(id):
+
+        computed.append(id)
+
+        return get_data(id)
+
+    jlset = JointLikelihoodSet(data_getter=get_data_and_record, model_getter=get_model, n_iterations=5)
+
+    parameter_frames, like_frames = jlset.go(compute_covariance=False, checkpoint=checkpoint)
+
+    assert computed == [3, 4]
+
+    # Compare with a run without checkpoint
+
+    jlset_in_memory = JointLikelihoodSet(data_getter=get_data, model_getter=get_model, n_iterations=5)
+
+    expected_parameter_frames, expected_like_frames = jlset_in_memory.go(compute_covariance=False)
+
+    assert list(parameter_frames.index) == list(expected_parameter_frames.index)
+    assert np.allclose(parameter_frames['value'].values, expected_parameter_frames['value'].values)
+    assert np.all(parameter_frames['unit'].values == expected_parameter_frames['unit'].values)
+
+    assert list(like_frames.index) == list(expected_like_frames.index)
+    assert np.allclose(like_frames.values.astype(float), expected_like_frames.values.astype(float))
+
+    assert len(jlset.results) == 5
+
+    assert np.allclose(jlset.results[4].get_data_frame()['value'].values,
+                       jlset_in_memory.results[4].get_data_frame()['value'].values)
@@ -102,6 +102,22 @@ def test_pagmo(joint_likelihood_bn090217206_nai):
     do_analysis(joint_likelihood_bn090217206_nai, pagmo)
 
 
+@skip_if_pygmo_is_not_available
+def test_pagmo_local_processes(joint_likelihood_bn090217206_nai):
+
+    pagmo = GlobalMinimization("PAGMO")
+    minuit = LocalMinimization("minuit")
+
+    algo = pygmo.algorithm(pygmo.bee_colony(gen=20))
+
+    # Two processes for four islands, with migration between the two evolution cycles
+
+    pagmo.setup(islands=4, population_size=20, evolution_cycles=2, second_minimization=minuit, algorithm=algo,
+                processes=2)
+
+    do_analysis(joint_likelihood_bn090217206_nai, pagmo)
+
+
 @skip_if_pygmo_is_not_available
 def test_parallel_pagmo(joint_likelihood_bn090217206_nai):
 
@@ -1,4 +1,6 @@
 import pytest
+import numpy as np
+import astropy.constants as constants
 import speclite.filters as spec_filters
 from astromodels import *
 from threeML.utils.photometry.filter_set import FilterSet, NotASpeclikeFilter
@@ -59,6 +61,34 @@ def test_filter_set():
 
 
 
+def test_filter_set_ab_magnitudes():
+
+    sf = spec_filters.load_filters('bessell-*')
+
+    fs = FilterSet(sf, mask=np.ones(len(sf.names), dtype=bool))
+
+    spec = Powerlaw()
+    spec.K = 1e-2
+    spec.index = -1.7
+
+    source = PointSource('grb', 0, 0, spectral_shape=spec)
+
+    fs.set_model(source)
+
+    # Compare with the convolution done by speclite (with units)
+
+    conversion_factor = (constants.c ** 2 * constants.h ** 2).to('keV2 * cm2')
+
+    def wrapped_model(x):
+
+        return source(x) * conversion_factor / x ** 3
+
+    expected = [-2.5 * np.log10((filter.convolve_with_function(wrapped_model) / filter.ab_zeropoint).to('').value)
+                for filter in sf]
+
+    assert np.allclose(fs.ab_magnitudes(), expected)
+
+
 def test_constructor():
 
 
@@ -3,6 +3,8 @@ __author__ = 'drjfunk'
 from threeML.plugins.OGIPLike import OGIPLike
 from threeML.plugins.SwiftXRTLike import SwiftXRTLike
 import os
+import sys
+import pytest
 from conftest import get_test_datasets_directory
 from threeML.io.file_utils import within_directory
 
@@ -29,3 +31,63 @@ def test_loading_xrt():
                            background=os.path.join(xrt_dir, "xrt_bkg.pha"),
                            response=os.path.join(xrt_dir, "xrt.rmf"),
                            arf_file=os.path.join(xrt_dir, "xrt.arf"))
+
+
+def test_lazy_plugin_loading():
+
+    import threeML
+    from threeML.plugin_registry import get_plugin_names, get_plugin_class
+
+    assert "OGIPLike" in get_plugin_names()
+
+    # Plugins are imported on first access, and only once
+
+    assert threeML.XYLike is get_plugin_class("XYLike")
+    assert "XYLike" in threeML.__dict__
+
+    assert "XYLike" in threeML.__all__
+
+    # Every importable plugin is exported by a star import
+
+    for name in get_plugin_names():
+
+        if get_plugin_class(name) is not None:
+
+            assert name in threeML.__all__
+
+    with pytest.raises(RuntimeError):
+
+        get_plugin_class("NonExistentLike")
+
+    with pytest.raises(AttributeError):
+
+        _ = threeML.NonExistentLike
+
+
+def test_import_profiler():
+
+    from threeML.utils.import_profiler import ImportProfiler
+
+    profiler = ImportProfiler()
+
+    # A stdlib module with no imports (and no output)
+
+    sys.modules.pop('colorsys', None)
+
+    with profiler:
+
+        import colorsys
+
+    names = [name for name, _, _ in profiler.records]
+
+    assert names == ['colorsys']
+
+    name, self_time, cumulative_time = profiler.records[0]
+
+    assert 0 <= self_time <= cumulative_time
+
+    # The profiler is not active anymore
+
+    import __builtin__
+
+    assert __builtin__.__import__ != profiler._import
@@ -5,6 +5,7 @@ import warnings
 
 from threeML.io.package_data import get_path_of_data_file
 from threeML.utils.OGIP.response import InstrumentResponseSet, InstrumentResponse, OGIPResponse
+from threeML.utils.OGIP.response import IntervalOfInterestNotCovered
 from threeML.utils.time_interval import TimeInterval
 
 
@@ -338,6 +339,34 @@ def test_response_set_weighting():
     assert np.allclose(weighted_matrix.matrix, 0.5625000000000001 * rsp_a.matrix)
 
 
+def test_response_set_weighting_in_bins():
+
+    [rsp_a, rsp_b], exposure_getter, counts_getter = get_matrix_set_elements_with_coverage()
+
+    rsp_set = InstrumentResponseSet([rsp_a, rsp_b], exposure_getter, counts_getter)
+
+    starts = np.array([0.0, 5.0, 12.3456789, 20.0])
+    stops = np.array([5.0, 25.0, 13.7654321, 30.0])
+
+    weighted_matrices = rsp_set.weight_by_counts_in_bins(starts, stops)
+
+    assert len(weighted_matrices) == len(starts)
+
+    for start, stop, weighted_matrix in zip(starts, stops, weighted_matrices):
+
+        expected = rsp_set.weight_by_counts("%.10f - %.10f" % (start, stop))
+
+        assert np.allclose(weighted_matrix.matrix, expected.matrix)
+
+    weighted_matrices = rsp_set.weight_by_exposure_in_bins(starts, stops)
+
+    assert np.allclose(weighted_matrices[1].matrix, 0.625 * rsp_a.matrix)
+
+    with pytest.raises(IntervalOfInterestNotCovered):
+
+        _ = rsp_set.weight_by_counts_in_bins([-5.0], [10.0])
+
+
 def test_response_set_weighting_with_reference_time():
 
     # Now repeat the same tests but using a reference time
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 
 from threeML.utils.time_interval import TimeInterval, TimeIntervalSet
@@ -422,6 +423,65 @@ def test_merging_set_intervals():
 
 
 
+def test_merging_chain_of_intervals():
+
+    # each interval overlaps only with the next one, so they all merge in a single interval
+
+    ts1 = TimeIntervalSet.from_starts_and_stops([0., 1., 2.5, 3.5], [2., 3., 4., 5.])
+
+    ts2 = ts1.merge_intersecting_intervals(in_place=False)
+
+    assert len(ts2) == 1
+    assert TimeInterval(0., 5.) == ts2[0]
+
+    # touching intervals are not merged
+
+    ts1 = TimeIntervalSet.from_list_of_edges([0., 1., 2.])
+
+    assert len(ts1.merge_intersecting_intervals()) == 2
+
+
+def test_array_backed_interval_set():
+
+    edges = np.linspace(-10., 10., 100001)
+
+    ts1 = TimeIntervalSet.from_list_of_edges(edges)
+
+    assert len(ts1) == 100000
+
+    assert isinstance(ts1[10], TimeInterval)
+    assert ts1[10] == TimeInterval(edges[10], edges[11])
+    assert ts1[-1] == TimeInterval(edges[-2], edges[-1])
+
+    assert np.all(ts1.time_edges == edges)
+    assert np.allclose(ts1.widths, 2e-4)
+
+    sub_set = ts1.containing_interval(-1., 1.)
+
+    assert isinstance(sub_set, TimeIntervalSet)
+    assert len(sub_set) == 10000
+    assert sub_set.absolute_start_time == -1.
+    assert sub_set.absolute_stop_time == 1.
+
+    shifted = sub_set + 1.
+
+    assert np.allclose(shifted.start_times, sub_set.start_times + 1.)
+
+    # the provided interval objects are kept
+
+    t1 = TimeInterval(5., 10.)
+    t2 = TimeInterval(-10., 0.)
+
+    ts2 = TimeIntervalSet([t1, t2])
+
+    assert ts2[0] is t1
+    assert ts2.sort()[1] == t1
+
+    with pytest.raises(RuntimeError):
+
+        TimeIntervalSet.from_starts_and_stops([0., 2.], [1., 1.])
+
+
 def test_interval_set_to_string():
 
     # also tests the time interval to string
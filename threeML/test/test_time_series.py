@@ -8,6 +8,8 @@ from threeML.utils.data_builders.time_series_builder import TimeSeriesBuilder
 from threeML.io.file_utils import within_directory
 from threeML.plugins.DispersionSpectrumLike import DispersionSpectrumLike
 from threeML.plugins.OGIPLike import OGIPLike
+from threeML.utils.data_builders.fermi.gbm_data import GBMTTEFile
+from threeML.utils.data_builders.fermi.lat_data import LLEFile
 from conftest import get_test_datasets_directory
 import astropy.io.fits as fits
 
@@ -138,6 +140,45 @@ def test_read_gbm_cspec():
         nai3.write_pha_from_binner('test_from_nai3', start=0, stop=2, overwrite=True)
 
 
+def test_binned_spectrum_series_lookups():
+    with within_directory(datasets_directory):
+        data_dir = os.path.join('gbm', 'bn080916009')
+
+        nai3 = TimeSeriesBuilder.from_gbm_cspec_or_ctime('NAI3',
+                                                         os.path.join(data_dir, "glg_cspec_n3_bn080916009_v01.pha"),
+                                                         rsp_file=os.path.join(data_dir,
+                                                                               "glg_cspec_n3_bn080916009_v00.rsp2"),
+                                                         poly_order=-1)
+
+        series = nai3._time_series
+
+        counts_per_bin = series._binned_spectrum_set.counts_per_bin
+        exposure_per_bin = series._binned_spectrum_set.exposure_per_bin
+
+        bins = series.bins
+
+        # the binary search selects the same bins as the masks
+
+        for start, stop in [(-10., 10.), (bins.start_times[3], bins.stop_times[20]), (0.5, 0.6), (-1e6, 1e6)]:
+
+            mask = series._select_bins(start, stop)
+
+            assert np.allclose(series.count_per_channel_over_interval(start, stop), counts_per_bin[mask].sum(axis=0))
+            assert np.isclose(series.counts_over_interval(start, stop), counts_per_bin[mask].sum())
+            assert np.isclose(series.exposure_over_interval(start, stop), exposure_per_bin[mask].sum())
+
+        nai3.set_active_time_interval('-5-2', '1-10')
+
+        mask = np.zeros(len(bins), dtype=bool)
+
+        for interval in series.time_intervals:
+
+            mask |= series._select_bins(interval.start_time, interval.stop_time)
+
+        assert np.allclose(series._counts, counts_per_bin[mask].sum(axis=0))
+        assert np.isclose(series._exposure, exposure_per_bin[mask].sum())
+
+
 def test_read_gbm_tte():
     with within_directory(datasets_directory):
         data_dir = os.path.join('gbm', 'bn080916009')
@@ -231,6 +272,44 @@ def test_read_gbm_tte():
         nai3.write_pha_from_binner('test_from_nai3', overwrite=True)
 
 
+def test_bulk_spectrumlike_from_bins():
+    with within_directory(datasets_directory):
+        data_dir = os.path.join('gbm', 'bn080916009')
+
+        nai3 = TimeSeriesBuilder.from_gbm_tte('NAI3',
+                                              os.path.join(data_dir, "glg_tte_n3_bn080916009_v01.fit.gz"),
+                                              rsp_file=os.path.join(data_dir, "glg_cspec_n3_bn080916009_v00.rsp2"),
+                                              poly_order=-1)
+
+        nai3.set_background_interval('-20--10', '100-200')
+
+        nai3.create_time_bins(start=0, stop=10, method='constant', dt=2.5)
+
+        for extract in (False, True):
+
+            speclikes = nai3.to_spectrumlike(from_bins=True, extract_measured_background=extract)
+
+            assert len(speclikes) == len(nai3.bins)
+
+            # compare with the selection of each bin in turn
+
+            for interval, bulk_like in zip(nai3.bins, speclikes):
+
+                nai3.set_active_time_interval(interval.to_string())
+
+                speclike = nai3.to_spectrumlike(extract_measured_background=extract)
+
+                assert np.allclose(bulk_like.observed_counts, speclike.observed_counts)
+
+                assert np.allclose(bulk_like.exposure, speclike.exposure, rtol=1e-5)
+
+                assert np.allclose(bulk_like.background_counts, speclike.background_counts, rtol=1e-4)
+
+                assert bulk_like.background_spectrum.is_poisson == extract
+
+                assert np.allclose(bulk_like.response.matrix, speclike.response.matrix, rtol=1e-4)
+
+
 def test_reading_of_written_pha():
     with within_directory(datasets_directory):
         # check the number of items written
@@ -247,6 +326,52 @@ def test_reading_of_written_pha():
         os.remove('test_from_nai3.pha')
 
 
+def test_read_time_window():
+    with within_directory(datasets_directory):
+        tte_file = os.path.join('gbm', 'bn080916009', "glg_tte_n3_bn080916009_v01.fit.gz")
+
+        full_tte = GBMTTEFile(tte_file)
+
+        windowed_tte = GBMTTEFile(tte_file, time_window=(-20., 100.))
+
+        relative_times = full_tte.arrival_times - full_tte.trigger_time
+
+        idx = (relative_times >= -20.) & (relative_times <= 100.)
+
+        assert np.all(windowed_tte.arrival_times == full_tte.arrival_times[idx])
+        assert np.all(windowed_tte.energies == full_tte.energies[idx])
+        assert np.all(windowed_tte.deadtime == full_tte.deadtime[idx])
+
+        assert windowed_tte.tstart == full_tte.trigger_time - 20.
+        assert windowed_tte.tstop == full_tte.trigger_time + 100.
+
+        nai3 = TimeSeriesBuilder.from_gbm_tte('NAI3',
+                                              tte_file,
+                                              rsp_file=os.path.join('gbm', 'bn080916009',
+                                                                    "glg_cspec_n3_bn080916009_v00.rsp2"),
+                                              poly_order=1,
+                                              time_window=(-20., 100.))
+
+        nai3.set_active_time_interval('0-10')
+
+        assert nai3.to_spectrumlike().observed_counts.sum() == np.sum((relative_times >= 0) & (relative_times <= 10))
+
+        lle_files = [os.path.join('lat', "gll_lle_bn080916009_v10.fit"),
+                     os.path.join('lat', "gll_pt_bn080916009_v10.fit"),
+                     os.path.join('lat', "gll_cspec_bn080916009_v10.rsp")]
+
+        full_lle = LLEFile(*lle_files)
+
+        windowed_lle = LLEFile(*lle_files, time_window=(-10., 50.))
+
+        relative_times = full_lle.arrival_times - full_lle.trigger_time
+
+        idx = (relative_times >= -10.) & (relative_times <= 50.)
+
+        assert np.all(windowed_lle.arrival_times == full_lle.arrival_times[idx])
+        assert np.all(windowed_lle.energies == full_lle.energies[idx])
+
+
 def test_read_lle():
     with within_directory(datasets_directory):
         data_dir = 'lat'
@@ -0,0 +1,119 @@
+import pytest
+import numpy as np
+import scipy.integrate
+from astromodels import *
+
+
+try:
+
+    from threeML.plugins.experimental.VERITASLike import VERITASRun
+
+except ImportError:
+
+    has_ROOT = False
+
+else:
+
+    has_ROOT = True
+
+from threeML.utils.statistics.likelihood_functions import poisson_observed_poisson_background
+
+# This defines a decorator which can be applied to single tests to
+# skip them if the condition is not met
+skip_if_ROOT_is_not_available = pytest.mark.skipif(not has_ROOT, reason="ROOT is not available")
+
+
+def get_synthetic_run(fraction_of_empty_entries):
+
+    # Build a run without a ROOT file, by filling in only what is needed to compute the likelihood
+
+    rng = np.random.RandomState(1234)
+
+    run = object.__new__(VERITASRun)
+
+    run._log_mc_energies = np.linspace(7, 10.5, 41)
+    run._mc_energies_c = (10 ** run._log_mc_energies[1:] + 10 ** run._log_mc_energies[:-1]) / 2.0
+
+    hMigration = rng.rand(30, 40)
+    hMigration[hMigration < fraction_of_empty_entries] = 0
+
+    run._hMigration = hMigration * 1e5
+    run._n_chan = 30
+    run._exposure = 1200.0
+
+    run._counts = rng.poisson(20, 30)
+    run._bkg_counts = rng.poisson(30, 30)
+    run._bkg_renorm = 0.2
+
+    run._first_chan = 2
+    run._last_chan = 25
+
+    run._precompute_folding()
+
+    return run
+
+
+def get_expected_n_pred(run, diff_flux, fast):
+
+    # This is the straightforward computation, with a loop over the channels
+
+    e1 = 10 ** run._log_mc_energies[:-1]
+    e2 = 10 ** run._log_mc_energies[1:]
+
+    if fast:
+
+        weight = diff_flux(run._mc_energies_c) / run._simulated_spectrum(run._mc_energies_c)
+
+    else:
+
+        integrals = []
+
+        for ee1, ee2 in zip(e1, e2):
+
+            grid = np.linspace(ee1, ee2, 30)
+
+            integrals.append(scipy.integrate.simps(diff_flux(grid), grid))
+
+        weight = np.array(integrals) / run._simulated_spectrum_f(e1, e2)
+
+    n_pred = np.zeros(run._n_chan)
+
+    for i in range(n_pred.shape[0]):
+
+        n_pred[i] = np.sum(run._hMigration[i, :] * weight) * run._exposure
+
+    return n_pred
+
+
+@skip_if_ROOT_is_not_available
+@pytest.mark.parametrize("fast", [True, False])
+@pytest.mark.parametrize("fraction_of_empty_entries, is_sparse", [(0.1, False), (0.9, True)])
+def test_veritas_run_log_like(fast, fraction_of_empty_entries, is_sparse):
+
+    run = get_synthetic_run(fraction_of_empty_entries)
+
+    # Dense migration matrices are kept as arrays, mostly empty ones are stored as sparse matrices
+
+    folding_matrix = run._folding_matrix_fast if fast else run._folding_matrix
+
+    assert isinstance(folding_matrix, np.ndarray) != is_sparse
+
+    model = Model(PointSource('a', 0.0, 0.0, spectral_shape=Powerlaw(K=1e-10, index=-2.3)),
+                  PointSource('b', 1.0, 0.0, spectral_shape=Powerlaw(K=1e-11, index=-2.0)))
+
+    diff_flux = lambda x: model.a(x) + model.b(x)
+
+    expected_n_pred = get_expected_n_pred(run, diff_flux, fast)
+
+    log_like, intermediate = run.get_log_like_from_fluxes(diff_flux(run.get_model_energies(fast)), fast)
+
+    assert np.allclose(intermediate['n_pred'], expected_n_pred, rtol=1e-10)
+
+    expected_log_like, _ = poisson_observed_poisson_background(run._counts, run._bkg_counts, run._bkg_renorm,
+                                                               expected_n_pred)
+
+    assert np.isclose(log_like, np.sum(expected_log_like[run._first_chan: run._last_chan + 1]), rtol=1e-10)
+
+    # The model is evaluated through the point sources of the likelihood model
+
+    assert np.isclose(run.get_log_like(model, fast)[0], log_like, rtol=1e-10)
@@ -616,15 +616,16 @@ class InstrumentResponseSet(object):
 
         # Create the corresponding list of coverage intervals
 
-        self._coverage_intervals = TimeIntervalSet(map(lambda x: x.coverage_interval,
-                                                       self._matrix_list))
+        coverage_intervals = map(lambda x: x.coverage_interval, self._matrix_list)
 
         # Make sure that all matrices have coverage interval set
 
-        if None in self._coverage_intervals:
+        if None in coverage_intervals:
 
             raise NoCoverageIntervals("You need to specify the coverage interval for all matrices in the matrix_list")
 
+        self._coverage_intervals = TimeIntervalSet(coverage_intervals)
+
         # Remove from the list matrices that cover intervals of zero duration (yes, the GBM publishes those too,
         # one example is in data/ogip_test_gbm_b0.rsp2)
         to_be_removed = []
@@ -771,6 +772,99 @@ class InstrumentResponseSet(object):
 
         return self._get_weighted_matrix("counts", *intervals)
 
+    def weight_by_counts_in_bins(self, starts, stops):
+        """
+        Returns one response weighted by counts for each of the given bins (this is much faster than calling
+        weight_by_counts for each bin). The counts_getter must accept arrays of start and stop times
+
+        :param starts: array of start times of the bins
+        :param stops: array of stop times of the bins
+        :return: list of InstrumentResponse instances
+        """
+
+        return self._get_weighted_matrices_in_bins("counts", starts, stops)
+
+    def weight_by_exposure_in_bins(self, starts, stops):
+        """
+        Returns one response weighted by exposure for each of the given bins (this is much faster than calling
+        weight_by_exposure for each bin). The exposure_getter must accept arrays of start and stop times
+
+        :param starts: array of start times of the bins
+        :param stops: array of stop times of the bins
+        :return: list of InstrumentResponse instances
+        """
+
+        return self._get_weighted_matrices_in_bins("exposure", starts, stops)
+
+    def _get_weighted_matrices_in_bins(self, switch, starts, stops):
+
+        weights = self.get_weights_in_bins(starts, stops, switch)
+
+        # Weight all matrices at once: (n_bins x n_matrices) . (n_matrices x n_channels x n_mc_energies)
+
+        matrices = np.tensordot(weights, np.array(map(attrgetter("matrix"), self._matrix_list)), axes=(1, 0))
+
+        ebounds = self._matrix_list[0].ebounds
+
+        mc_channels = self._matrix_list[0].monte_carlo_energies
+
+        return [InstrumentResponse(matrix, ebounds, mc_channels) for matrix in matrices]
+
+    def get_weights_in_bins(self, starts, stops, switch='counts'):
+        """
+        Compute the weights of the matrices for each of the given bins, with the same rules as the weight_by_* methods
+        but for all the bins at once. The counts_getter (or exposure_getter) is called only once, with the arrays of
+        the start and stop times of the parts of the bins covered by each matrix
+
+        :param starts: array of start times of the bins
+        :param stops: array of stop times of the bins
+        :param switch: either 'counts' or 'exposure'
+        :return: (n_bins x n_matrices) array of weights, normalized to 1 for each bin
+        """
+
+        assert switch in ('counts', 'exposure'), "switch must be either 'counts' or 'exposure'"
+
+        starts = np.atleast_1d(np.array(starts, dtype=float))
+        stops = np.atleast_1d(np.array(stops, dtype=float))
+
+        coverage_starts = np.array(self._coverage_intervals.start_times)
+        coverage_stops = np.array(self._coverage_intervals.stop_times)
+
+        # These are the "effective intervals", i.e., how much of each coverage interval is used by each bin
+        # (the matrices are sorted and contiguous, so there are no gaps)
+
+        effective_starts = np.maximum(starts[:, None], coverage_starts[None, :])
+        effective_stops = np.minimum(stops[:, None], coverage_stops[None, :])
+
+        overlaps = effective_starts < effective_stops
+
+        for i in np.where(~np.any(overlaps, axis=1))[0]:
+
+            raise NoMatrixForInterval("Could not find any matrix applicable to %s-%s\n Have intervals:%s" %
+                                      (starts[i], stops[i],
+                                       ', '.join([str(interval) for interval in self._coverage_intervals])))
+
+        not_covered = (starts < coverage_starts[0]) | (stops > coverage_stops[-1])
+
+        for i in np.where(not_covered)[0]:
+
+            raise IntervalOfInterestNotCovered('The interval of interest (%s-%s) is not covered by the matrices' %
+                                               (starts[i], stops[i]))
+
+        getter = self._counts_getter if switch == 'counts' else self._exposure_getter
+
+        weights = np.zeros(overlaps.shape)
+
+        weights[overlaps] = getter(effective_starts[overlaps], effective_stops[overlaps])
+
+        weight_sums = np.sum(weights, axis=1)
+
+        # if all weights are zero, there is something clearly wrong with the exposure or the counts computation
+        assert np.all(weight_sums > 0), "All weights are zero. There must be a bug in the exposure or counts " \
+                                        "computation"
+
+        return weights / weight_sums[:, None]
+
     def _get_weighted_matrix(self, switch, *intervals):
 
         assert len(intervals) > 0, "You have to provide at least one interval"
@@ -7,50 +7,74 @@ import re
 import requests
 import warnings
 
+from threeML.io.fits_file import get_rows_in_time_window
 from threeML.utils.fermi_relative_mission_time import compute_fermi_relative_mission_times
 from threeML.utils.spectrum.pha_spectrum import PHASpectrumSet
 
 
 class GBMTTEFile(object):
-    def __init__(self, ttefile):
+    def __init__(self, ttefile, time_window=None, reference_time=None):
         """
 
         A simple class for opening and easily accessing Fermi GBM
         TTE Files.
 
+        If a time window is given, the file is memory mapped and only the events in the window are read (the TIME
+        column must be sorted, as it is in GBM TTE and CTTE files). The start and stop of the data are then those of
+        the window.
+
         :param ttefile: The filename of the TTE file to be stored
+        :param time_window: (start, stop) of the events to read, relative to reference_time (default: read all events)
+        :param reference_time: the reference time (in MET) for the time window. By default it is the trigger time
+        in the file (0, i.e., MET, for continuous data)
 
         """
 
-        tte = fits.open(ttefile)
+        with fits.open(ttefile, memmap=True) as tte:
 
-        self._events = tte['EVENTS'].data['TIME']
-        self._pha = tte['EVENTS'].data['PHA']
+            try:
+                self._trigger_time = tte['PRIMARY'].header['TRIGTIME']
 
-        try:
-            self._trigger_time = tte['PRIMARY'].header['TRIGTIME']
 
+            except:
 
-        except:
+                # For continuous data
+                warnings.warn("There is no trigger time in the TTE file. Must be set manually or using MET relative times.")
 
-            # For continuous data
-            warnings.warn("There is no trigger time in the TTE file. Must be set manually or using MET relative times.")
+                self._trigger_time = 0
 
-            self._trigger_time = 0
+            self._start_events = tte['PRIMARY'].header['TSTART']
+            self._stop_events = tte['PRIMARY'].header['TSTOP']
+
+            self._utc_start = tte['PRIMARY'].header['DATE-OBS']
+            self._utc_stop = tte['PRIMARY'].header['DATE-END']
+
+            self._n_channels = tte['EBOUNDS'].header['NAXIS2']
+
+            self._det_name = "%s_%s" % (tte['PRIMARY'].header['INSTRUME'], tte['PRIMARY'].header['DETNAM'])
+
+            self._telescope = tte['PRIMARY'].header['TELESCOP']
+
+            events = tte['EVENTS'].data
 
-        self._start_events = tte['PRIMARY'].header['TSTART']
-        self._stop_events = tte['PRIMARY'].header['TSTOP']
+            if time_window is not None:
 
-        self._utc_start = tte['PRIMARY'].header['DATE-OBS']
-        self._utc_stop = tte['PRIMARY'].header['DATE-END']
+                if reference_time is None:
 
-        self._n_channels = tte['EBOUNDS'].header['NAXIS2']
+                    reference_time = self._trigger_time
 
-        self._det_name = "%s_%s" % (tte['PRIMARY'].header['INSTRUME'], tte['PRIMARY'].header['DETNAM'])
+                window_start = reference_time + time_window[0]
+                window_stop = reference_time + time_window[1]
 
-        self._telescope = tte['PRIMARY'].header['TELESCOP']
+                events = events[get_rows_in_time_window(events, window_start, window_stop)]
 
-        self._calculate_deadtime()
+                self._start_events = max(self._start_events, window_start)
+                self._stop_events = min(self._stop_events, window_stop)
+
+            # copy the columns, so that they do not depend on the (memory mapped) file
+
+            self._events = np.array(events['TIME'])
+            self._pha = np.array(events['PHA'])
 
     @property
     def trigger_time(self):
@@ -104,25 +128,29 @@ class GBMTTEFile(object):
         return self._det_name
 
     @property
-    def deadtime(self):
-        return self._deadtime
+    def overflow_mask(self):
+        """
+        Return a boolean array which is True for the events in the overflow channel
+
+        :return:
+        """
+
+        return self._pha == self._n_channels  # specific to gbm! should work for CTTE
 
-    def _calculate_deadtime(self):
+    @property
+    def deadtime(self):
         """
-        Computes an array of deadtimes following the perscription of Meegan et al. (2009).
+        Computes an array of deadtimes following the perscription of Meegan et al. (2009). It is derived from the
+        overflow mask each time it is requested, instead of being stored for each event.
 
         The array can be summed over to obtain the total dead time
 
         """
-        self._deadtime = np.zeros_like(self._events)
-        overflow_mask = self._pha == self._n_channels  # specific to gbm! should work for CTTE
 
         # From Meegan et al. (2009)
-        # Dead time for overflow (note, overflow sometimes changes)
-        self._deadtime[overflow_mask] = 10.E-6  # s
+        # Dead time for overflow (note, overflow sometimes changes) and normal dead time
 
-        # Normal dead time
-        self._deadtime[~overflow_mask] = 2.E-6  # s
+        return np.where(self.overflow_mask, 10.E-6, 2.E-6)  # s
 
     def _compute_mission_times(self):
 
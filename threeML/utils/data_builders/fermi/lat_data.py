@@ -5,20 +5,26 @@ import astropy.io.fits as fits
 import numpy as np
 import pandas as pd
 
+from threeML.io.fits_file import get_rows_in_time_window
 from threeML.utils.fermi_relative_mission_time import compute_fermi_relative_mission_times
 
 
 class LLEFile(object):
-    def __init__(self, lle_file, ft2_file, rsp_file):
+    def __init__(self, lle_file, ft2_file, rsp_file, time_window=None, reference_time=None):
         """
         Class to read the LLE and FT2 files
 
         Inspired heavily by G. Vianello
 
-
+        If a time window is given, the LLE file is memory mapped and only the events in the window are read (the TIME
+        column must be sorted). The start and stop of the data are then those of the window.
 
         :param lle_file:
         :param ft2_file:
+        :param rsp_file:
+        :param time_window: (start, stop) of the events to read, relative to reference_time (default: read all events)
+        :param reference_time: the reference time (in MET) for the time window. By default it is the trigger time
+        in the file (0, i.e., MET, if there is none)
         """
 
         with fits.open(rsp_file) as rsp_:
@@ -29,12 +35,7 @@ class LLEFile(object):
             self._emax = data.E_MAX
             self._channels = data.CHANNEL
 
-        with fits.open(lle_file) as ft1_:
-
-            data = ft1_['EVENTS'].data
-
-            self._events = data.TIME  # - trigger_time
-            self._energy = data.ENERGY * 1E3  # keV
+        with fits.open(lle_file, memmap=True) as ft1_:
 
             self._tstart = ft1_['PRIMARY'].header['TSTART']
             self._tstop = ft1_['PRIMARY'].header['TSTOP']
@@ -42,8 +43,8 @@ class LLEFile(object):
             self._utc_stop = ft1_['PRIMARY'].header['DATE-END']
             self._instrument = ft1_['PRIMARY'].header['INSTRUME']
             self._telescope = ft1_['PRIMARY'].header['TELESCOP'] + "_LLE"
-            self._gti_start = ft1_['GTI'].data['START']
-            self._gti_stop = ft1_['GTI'].data['STOP']
+            self._gti_start = np.array(ft1_['GTI'].data['START'])
+            self._gti_stop = np.array(ft1_['GTI'].data['STOP'])
 
             try:
                 self._trigger_time = ft1_['EVENTS'].header['TRIGTIME']
@@ -57,6 +58,27 @@ class LLEFile(object):
 
                 self._trigger_time = 0
 
+            data = ft1_['EVENTS'].data
+
+            if time_window is not None:
+
+                if reference_time is None:
+
+                    reference_time = self._trigger_time
+
+                window_start = reference_time + time_window[0]
+                window_stop = reference_time + time_window[1]
+
+                data = data[get_rows_in_time_window(data, window_start, window_stop)]
+
+                self._tstart = max(self._tstart, window_start)
+                self._tstop = min(self._tstop, window_stop)
+
+            # copy the columns, so that they do not depend on the (memory mapped) file
+
+            self._events = np.array(data.TIME)  # - trigger_time
+            self._energy = data.ENERGY * 1E3  # keV
+
         # bin the energies into PHA channels
         # and filter out over/underflow
         self._bin_energies_into_pha()
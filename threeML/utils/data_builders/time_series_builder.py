@@ -324,18 +324,19 @@ class TimeSeriesBuilder(object):
 
         self._time_series.save_background(filename, overwrite)
 
-    def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False):
-        # type: (float, float, float, bool) -> None
+    def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False, max_bins=None):
+        # type: (float, float, float, bool, int) -> None
 
         """
         :param start:
         :param stop:
         :param dt:
         :param use_binner:
+        :param max_bins: if given, consecutive bins are merged so that at most max_bins bins are plotted
 
         """
 
-        return self._time_series.view_lightcurve(start, stop, dt, use_binner)
+        return self._time_series.view_lightcurve(start, stop, dt, use_binner, max_bins)
 
     @property
     def tstart(self):
@@ -613,21 +614,10 @@ class TimeSeriesBuilder(object):
 
             assert self._time_series.bins is not None, 'This time series does not have any bins!'
 
-            # save the original interval if there is one
-            old_interval = copy.copy(self._active_interval)
-            old_verbose = copy.copy(self._verbose)
-
-            # we will keep it quiet to keep from being annoying
-
-            self._verbose = False
-
-            list_of_speclikes = []
-
             # get the bins from the time series
             # for event lists, these are from created bins
             # for binned spectra sets, these are the native bines
 
-
             these_bins = self._time_series.bins  # type: TimeIntervalSet
 
             if start is not None:
@@ -638,7 +628,21 @@ class TimeSeriesBuilder(object):
 
                 these_bins = these_bins.containing_interval(start, stop, inner=False)
 
+            if hasattr(self._container_type, 'from_information_dict'):
+
+                # extract all the bins at once
 
+                return self._bulk_to_spectrumlike(these_bins, interval_name, extract_measured_background)
+
+            # save the original interval if there is one
+            old_interval = copy.copy(self._active_interval)
+            old_verbose = copy.copy(self._verbose)
+
+            # we will keep it quiet to keep from being annoying
+
+            self._verbose = False
+
+            list_of_speclikes = []
 
            # loop through the intervals and create spec likes
 
@@ -706,10 +710,105 @@ class TimeSeriesBuilder(object):
 
             return list_of_speclikes
 
+    def _bulk_to_spectrumlike(self, these_bins, interval_name, extract_measured_background):
+        """
+        Create the plugins for all the bins at once. Instead of selecting each bin in turn, the counts, exposures and
+        background counts of all bins are extracted from the time series with one bulk selection, and then the
+        spectra are built from the slices. The active time interval is not changed.
+
+        :param these_bins: the TimeIntervalSet with the bins
+        :param interval_name: the name of the interval
+        :param extract_measured_background: Use the selected background rather than a polynomial fit to the background
+        :return: list of SpectrumLike plugins
+        """
+
+        bulk_selection = self._time_series.get_bulk_selection(these_bins)
+
+        observed_information = self._time_series.get_information_dicts_from_bulk_selection(bulk_selection,
+                                                                                            these_bins,
+                                                                                            use_poly=False)
+
+        if not self._time_series.poly_fit_exists:
+
+            custom_warnings.warn('No background selection has been made. These plugins will contain no background!')
+
+            background_information = [None] * len(these_bins)
+
+        else:
+
+            background_information = self._time_series.get_information_dicts_from_bulk_selection(
+                bulk_selection,
+                these_bins,
+                use_poly=not extract_measured_background,
+                extract=extract_measured_background)
+
+        if self._rsp_is_weighted:
+
+            # weight the responses of all the bins at once, using the exact bin edges
+
+            responses = self._weighted_rsp.weight_by_counts_in_bins(these_bins.start_times, these_bins.stop_times)
+
+        else:
+
+            responses = [self._response] * len(these_bins)
+
+        list_of_speclikes = []
+
+        with progress_bar(len(these_bins), title='Creating plugins') as p:
+
+            for i, interval in enumerate(these_bins):
+
+                response = responses[i]
+
+                observed_spectrum = self._container_type.from_information_dict(observed_information[i],
+                                                                               response,
+                                                                               use_poly=False)
+
+                if background_information[i] is None:
+
+                    background_spectrum = None
+
+                else:
+
+                    background_spectrum = self._container_type.from_information_dict(
+                        background_information[i],
+                        response,
+                        use_poly=not extract_measured_background)
+
+                try:
+
+                    if self._response is None:
+
+                        sl = SpectrumLike(name="%s%s%d" % (self._name, interval_name, i),
+                                          observation=observed_spectrum,
+                                          background=background_spectrum,
+                                          verbose=False,
+                                          tstart=interval.start_time,
+                                          tstop=interval.stop_time)
+
+                    else:
+
+                        sl = DispersionSpectrumLike(name="%s%s%d" % (self._name, interval_name, i),
+                                                    observation=observed_spectrum,
+                                                    background=background_spectrum,
+                                                    verbose=False,
+                                                    tstart=interval.start_time,
+                                                    tstop=interval.stop_time)
+
+                    list_of_speclikes.append(sl)
+
+                except(NegativeBackground):
+
+                    custom_warnings.warn('Something is wrong with interval %s. skipping.' % interval)
+
+                p.increase()
+
+        return list_of_speclikes
+
     @classmethod
     def from_gbm_tte(cls, name, tte_file, rsp_file, restore_background=None,
                      trigger_time=None,
-                     poly_order=-1, unbinned=True, verbose=True):
+                     poly_order=-1, unbinned=True, verbose=True, time_window=None):
         """
            A plugin to natively bin, view, and handle Fermi GBM TTE data.
            A TTE event file are required as well as the associated response
@@ -731,6 +830,8 @@ class TimeSeriesBuilder(object):
            :param poly_order: 0-4 or -1 for auto
            :param unbinned: unbinned likelihood fit (bool)
            :param verbose: verbose (bool)
+           :param time_window: (start, stop) relative to the trigger time. If given, only the events in this window are
+           read from the TTE file, which saves memory for long (continuous) TTE files
 
 
 
@@ -740,7 +841,7 @@ class TimeSeriesBuilder(object):
 
         # Load the relevant information from the TTE file
 
-        gbm_tte_file = GBMTTEFile(tte_file)
+        gbm_tte_file = GBMTTEFile(tte_file, time_window=time_window, reference_time=trigger_time)
 
         # Set a trigger time if one has not been set
 
@@ -927,7 +1028,7 @@ class TimeSeriesBuilder(object):
 
     @classmethod
     def from_lat_lle(cls, name, lle_file, ft2_file, rsp_file, restore_background=None,
-                     trigger_time=None, poly_order=-1, unbinned=False, verbose=True):
+                     trigger_time=None, poly_order=-1, unbinned=False, verbose=True, time_window=None):
 
         """
                A plugin to natively bin, view, and handle Fermi LAT LLE data.
@@ -951,11 +1052,13 @@ class TimeSeriesBuilder(object):
                :param poly_order: 0-4 or -1 for auto
                :param unbinned: unbinned likelihood fit (bool)
                :param verbose: verbose (bool)
+               :param time_window: (start, stop) relative to the trigger time. If given, only the events in this window
+               are read from the LLE file, which saves memory for large files
 
 
                """
 
-        lat_lle_file = LLEFile(lle_file, ft2_file, rsp_file)
+        lat_lle_file = LLEFile(lle_file, ft2_file, rsp_file, time_window=time_window, reference_time=trigger_time)
 
         if trigger_time is not None:
             lat_lle_file.trigger_time = trigger_time
@@ -1,6 +1,6 @@
 from threeML.io.file_utils import sanitize_filename, if_directory_not_existing_then_make, file_existing_and_readable
 from threeML.config.config import threeML_config
-from threeML.io.download_from_http import ApacheDirectory, RemoteDirectoryNotFound
+from threeML.io.download_from_http import ApacheDirectory, RemoteDirectoryNotFound, remove_downloaded_file
 from threeML.io.dict_with_pretty_print import DictWithPrettyPrint
 
 from threeML.exceptions.custom_exceptions import TriggerDoesNotExist
@@ -161,29 +161,44 @@ def download_GBM_trigger_data(trigger_name, detectors=None, destination_director
 
     download_info = DictWithPrettyPrint([(det, DictWithPrettyPrint()) for det in detectors])
 
+    # Collect all the files first, so that they are downloaded together (several at the same time)
+
+    files_to_download = []
+    compress_flags = []
+    destinations = []
+
     for detector in remote_files_info.keys():
 
         remote_detector_info = remote_files_info[detector]
-        local_detector_info = download_info[detector]
 
         # Get CSPEC file
-        local_detector_info['cspec'] = downloader.download(remote_detector_info['cspec'], destination_directory,
-                                                           progress=True)
+        files_to_download.append(remote_detector_info['cspec'])
+        compress_flags.append(False)
+        destinations.append((detector, 'cspec'))
 
         # Get the RSP2 file if it exists, otherwise get the RSP file
         if 'rsp2' in remote_detector_info:
 
-            local_detector_info['rsp'] = downloader.download(remote_detector_info['rsp2'], destination_directory,
-                                                              progress=True)
+            files_to_download.append(remote_detector_info['rsp2'])
 
         else:
 
-            local_detector_info['rsp'] = downloader.download(remote_detector_info['rsp'], destination_directory,
-                                                             progress=True)
+            files_to_download.append(remote_detector_info['rsp'])
+
+        compress_flags.append(False)
+        destinations.append((detector, 'rsp'))
 
         # Get TTE file (compressing it if requested)
-        local_detector_info['tte'] = downloader.download(remote_detector_info['tte'], destination_directory,
-                                                         progress=True, compress=compress_tte)
+        files_to_download.append(remote_detector_info['tte'])
+        compress_flags.append(compress_tte)
+        destinations.append((detector, 'tte'))
+
+    local_files = downloader.download_files(files_to_download, destination_directory, progress=True,
+                                            compress=compress_flags)
+
+    for (detector, file_type), local_file in zip(destinations, local_files):
+
+        download_info[detector][file_type] = local_file
 
     return download_info
 
@@ -270,6 +285,6 @@ def cleanup_downloaded_GBM_data(detector_information_dict):
         for data_file in detector_information_dict[detector].values():
             print("Removing: %s" % data_file)
 
-            os.remove(data_file)
+            remove_downloaded_file(data_file)
 
     print('\n')
@@ -358,7 +358,7 @@ def download_LAT_data(ra, dec, radius, tstart, tstop, time_type, data_type='Phot
 
         downloader = ApacheDirectory(remotePath)
 
-        downloaded_files = [downloader.download(filename, destination_directory) for filename in filenames]
+        downloaded_files = downloader.download_files(filenames, destination_directory)
 
     else:
 
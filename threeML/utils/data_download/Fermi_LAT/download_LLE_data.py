@@ -1,7 +1,7 @@
 from threeML.io.file_utils import sanitize_filename, if_directory_not_existing_then_make
 from threeML.config.config import threeML_config
 from threeML.exceptions.custom_exceptions import TriggerDoesNotExist
-from threeML.io.download_from_http import ApacheDirectory, RemoteDirectoryNotFound
+from threeML.io.download_from_http import ApacheDirectory, RemoteDirectoryNotFound, remove_downloaded_file
 from threeML.io.dict_with_pretty_print import DictWithPrettyPrint
 from threeML.utils.data_download.Fermi_GBM.download_GBM_data import _validate_fermi_trigger_name
 
@@ -165,6 +165,6 @@ def cleanup_downloaded_LLE_data(detector_information_dict):
 
         print("Removing: %s"%data_file)
 
-        os.remove(data_file)
+        remove_downloaded_file(data_file)
 
     print('\n')
\ No newline at end of file
@@ -13,6 +13,82 @@ class NotCompositeModelError(RuntimeError):
     pass
 
 
+def get_model_evaluator(function):
+    """
+    Returns a function f(x, **parameter_specification) equivalent to function.evaluate_at, but which also accepts
+    arrays of parameter values (which evaluate_at does not) by calling directly the evaluate method of the function.
+    This allows to propagate all samples at once for simple functions. Functions which do not support this (for
+    example composite functions) will raise an exception when called with arrays.
+
+    :param function: an astromodels function
+    :return: the evaluator
+    """
+
+    def evaluator(x, **parameter_specification):
+
+        if any([np.ndim(value) > 0 for value in parameter_specification.values()]):
+
+            return function.evaluate(np.asarray(x, dtype=float), **parameter_specification)
+
+        else:
+
+            return function.evaluate_at(x, **parameter_specification)
+
+    return evaluator
+
+
+# Number of Gauss-Legendre nodes used for each decade of the integration interval by integrate_on_log_grid
+
+_n_nodes_per_decade = 16
+
+_gauss_legendre_nodes, _gauss_legendre_weights = np.polynomial.legendre.leggauss(_n_nodes_per_decade)
+
+
+def integrate_on_log_grid(integrand, e1, e2, **parameter_specification):
+    """
+    Integrate integrand(x, **parameter_specification) between e1 and e2 using a fixed-grid Gauss-Legendre quadrature
+    in log space (one block of nodes per decade). Differently from scipy.integrate.quad, the parameters (and the
+    integration bounds) can be arrays, so that all samples are integrated at once. The shape of the output is the one
+    obtained by broadcasting together e1, e2 and the parameters.
+
+    :param integrand: the function to integrate, with calling sequence integrand(x, **parameter_specification)
+    :param e1: lower bound(s) of the integration interval(s) (must be > 0)
+    :param e2: upper bound(s) of the integration interval(s) (must be > 0)
+    :param parameter_specification: the parameters of the integrand (scalars or arrays)
+    :return: the integral(s)
+    """
+
+    log_e1, log_e2 = np.broadcast_arrays(np.log(np.asarray(e1, dtype=float)), np.log(np.asarray(e2, dtype=float)))
+
+    log_width = log_e2 - log_e1
+
+    # Build the nodes and the weights of the composite rule over the interval [0, 1]
+
+    n_segments = max(1, int(np.ceil(np.max(np.abs(log_width)) / np.log(10.0))))
+
+    centers = (np.arange(n_segments) + 0.5) / n_segments
+
+    nodes = (centers[:, np.newaxis] + _gauss_legendre_nodes / (2.0 * n_segments)).flatten()
+
+    weights = np.tile(_gauss_legendre_weights, n_segments) / (2.0 * n_segments)
+
+    # The nodes run along a new last axis, so the parameters need a new last axis as well
+
+    x = np.exp(log_e1[..., np.newaxis] + log_width[..., np.newaxis] * nodes)
+
+    for name, value in parameter_specification.items():
+
+        if np.ndim(value) > 0:
+
+            parameter_specification[name] = np.asarray(value)[..., np.newaxis]
+
+    # dx = x dlog(x)
+
+    values = integrand(x, **parameter_specification) * x
+
+    return np.sum(values * weights, axis=-1) * log_width
+
+
 class InvalidUnitError(RuntimeError):
     pass
 
@@ -179,18 +255,41 @@ class IntegralFluxConversion(FluxConversion):
          def nufnu_integrand(x, param_specification):
              return x * x * flux_model(x, **param_specification)
 
-         self._model_builder = {"photon_flux": lambda e1, e2, **param_specification: integrate.quad(photon_integrand, e1, e2,args=(param_specification))[0],
-                               "energy_flux": lambda e1, e2, **param_specification: integrate.quad(energy_integrand, e1, e2,args=(param_specification))[0],
-                               "nufnu_flux": lambda e1, e2, **param_specification: integrate.quad(nufnu_integrand, e1, e2,args=(param_specification))[0]}
+         self._model_builder = {"photon_flux": self._build_integral(photon_integrand),
+                               "energy_flux": self._build_integral(energy_integrand),
+                               "nufnu_flux": self._build_integral(nufnu_integrand)}
 
 
          super(IntegralFluxConversion, self).__init__(flux_unit,
                                                      energy_unit,
                                                      flux_model)
 
+    @staticmethod
+    def _build_integral(integrand):
+        """
+        Returns a function f(e1, e2, **param_specification) computing the integral of the integrand between e1 and e2.
+        When the parameters are arrays of samples, all of them are integrated at once on a fixed grid (see
+        integrate_on_log_grid), otherwise the adaptive scipy.integrate.quad is used
+
+        :param integrand: a function with calling sequence integrand(x, param_specification)
+        :return: the integral function
+        """
+
+        def integral(e1, e2, **param_specification):
+
+            if any([np.ndim(value) > 0 for value in param_specification.values()]):
+
+                return integrate_on_log_grid(lambda x, **p: integrand(x, p), e1, e2, **param_specification)
+
+            else:
+
+                return integrate.quad(integrand, e1, e2, args=(param_specification))[0]
+
+        return integral
+
 
 class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
-    def __init__(self, analysis_result, source, energy_range, energy_unit, flux_unit, confidence_level=0.68, equal_tailed=True, component=None, is_differential_flux=True):
+    def __init__(self, analysis_result, source, energy_range, energy_unit, flux_unit, confidence_level=0.68, equal_tailed=True, component=None, is_differential_flux=True, samples=None):
         """
 
         A 3ML fitted point source.
@@ -205,6 +304,8 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
         :param energy_unit: string astropy unit
         :param flux_unit: string astropy flux unit
         :param component: the component name to calculate
+        :param samples: (optional) the already propagated samples (see the raw_samples property). If provided, the
+        propagation is skipped
         """
 
         # first extract the source
@@ -229,7 +330,7 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
 
             if self._components is not None:
 
-                model = self._components[component]['function'].evaluate_at
+                model = get_model_evaluator(self._components[component]['function'])
                 parameters =  self._components[component]['function'].parameters
                 test_model = self._components[component]['function']
                 parameter_names = self._components[component]['parameter_names']
@@ -240,7 +341,7 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
 
         else:
 
-            model = self._point_source.spectrum.main.shape.evaluate_at
+            model = get_model_evaluator(self._point_source.spectrum.main.shape)
             parameters = self._point_source.spectrum.main.shape.parameters
             test_model = self._point_source.spectrum.main.shape
             parameter_names = [par.name for par in self._point_source.spectrum.main.shape.parameters.values()]
@@ -290,7 +391,8 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
                                                                    parameters,
                                                                    confidence_level,
                                                                    equal_tailed,
-                                                                   energy_range)
+                                                                   energy_range,
+                                                                   samples=samples)
 
         else:
 
@@ -317,7 +419,8 @@ class FittedPointSourceSpectralHandler(GenericFittedSourceHandler):
                                                                    confidence_level,
                                                                    equal_tailed,
                                                                    e1,
-                                                                   e2)
+                                                                   e2,
+                                                                   samples=samples)
 
         self._is_dimensionless = converter.is_dimensionless
 
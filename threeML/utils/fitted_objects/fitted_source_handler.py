@@ -5,11 +5,16 @@ import functools
 import numpy as np
 
 from threeML.io.progress_bar import progress_bar
+from threeML.random_variates import RandomVariates
 from astromodels import use_astromodels_memoization
 
 
+class CannotBroadcast(RuntimeError):
+    pass
+
+
 class GenericFittedSourceHandler(object):
-    def __init__(self, analysis_result, new_function, parameter_names, parameters, confidence_level, equal_tailed, *independent_variable_range):
+    def __init__(self, analysis_result, new_function, parameter_names, parameters, confidence_level, equal_tailed, *independent_variable_range, **kwargs):
         """
         A generic 3ML fitted source  post-processor. This should be sub-classed in general
 
@@ -19,8 +24,14 @@ class GenericFittedSourceHandler(object):
         :param parameters: astromodels parameter dictionary
         :param confidence_level: the confidence level to compute error
         :param independent_variable_range: the range(s) of independent values to compute the new function over
+        :param samples: (optional keyword) the already propagated samples, as an array of shape (number of points,
+        number of samples) like the one returned by the raw_samples property. If provided, the propagation is skipped
         """
 
+        samples = kwargs.pop('samples', None)
+
+        assert len(kwargs) == 0, "Unknown keyword(s): %s" % ", ".join(kwargs.keys())
+
         # bind the class properties
 
         self._analysis_results = analysis_result
@@ -43,12 +54,28 @@ class GenericFittedSourceHandler(object):
 
         self._out_shape = tuple(map(len, self._independent_variable_range))
 
-        # construct the propagated function
+        if samples is None:
 
-        self._build_propagated_function()
+            # construct the propagated function
+
+            self._build_propagated_function()
+
+            # fold the function through its independent values
+            self._evaluate()
+
+        else:
 
-        # fold the function through its independent values
-        self._evaluate()
+            # the propagation has been already done (for example, in a parallel engine or in a previous session)
+
+            samples = np.asarray(samples)
+
+            assert samples.shape[0] == np.product(self._out_shape), "The provided samples do not match the shape " \
+                                                                    "of the independent variables"
+
+            variates = [RandomVariates(this_samples) for this_samples in samples]
+
+            self._propagated_variates = VariatesContainer(variates, self._out_shape, self._cl, self._transform,
+                                                          self._equal_tailed)
 
 
 
@@ -101,6 +128,11 @@ class GenericFittedSourceHandler(object):
 
         arguments = {}
 
+        # Do not use more than 1000 samples (would make computation too slow for nothing). Use the same
+        # samples for all parameters, so that the correlations between them are preserved
+
+        selected_samples = None
+
         # because we might be using composite functions,
         # we have to keep track of parameter names in a non-elegant way
         for par,name in zip(self._parameters.values(), self._parameter_names):
@@ -109,10 +141,13 @@ class GenericFittedSourceHandler(object):
 
                 this_variate = self._analysis_results.get_variates(par.path)
 
-                # Do not use more than 1000 values (would make computation too slow for nothing)
-
                 if len(this_variate) > 1000:
-                    this_variate = np.random.choice(this_variate, size=1000)
+
+                    if selected_samples is None:
+
+                        selected_samples = np.random.choice(len(this_variate), size=1000)
+
+                    this_variate = this_variate[selected_samples]
 
                 arguments[name] = this_variate
 
@@ -124,6 +159,8 @@ class GenericFittedSourceHandler(object):
 
         # create the propagtor
 
+        self._propagation_arguments = arguments
+
         self._propagated_function = self._analysis_results.propagate(self._function, **arguments)
 
     def _evaluate(self):
@@ -137,19 +174,27 @@ class GenericFittedSourceHandler(object):
         # if there are independent variables
         if self._independent_variable_range:
 
-            variates = []
+            try:
+
+                variates = self._evaluate_on_grid()
+
+            except CannotBroadcast:
+
+                # The function does not support arrays of parameters. Evaluate it point by point
+
+                variates = []
 
-            # scroll through the independent variables
-            n_iterations = np.product(self._out_shape)
+                # scroll through the independent variables
+                n_iterations = np.product(self._out_shape)
 
-            with progress_bar(n_iterations, title="Propagating errors") as p:
+                with progress_bar(n_iterations, title="Propagating errors") as p:
 
-                with use_astromodels_memoization(False):
+                    with use_astromodels_memoization(False):
 
-                    for variables in itertools.product(*self._independent_variable_range):
-                        variates.append(self._propagated_function(*variables))
+                        for variables in itertools.product(*self._independent_variable_range):
+                            variates.append(self._propagated_function(*variables))
 
-                        p.increase()
+                            p.increase()
 
 
         # otherwise just evaluate
@@ -161,6 +206,72 @@ class GenericFittedSourceHandler(object):
 
         self._propagated_variates = VariatesContainer(variates, self._out_shape, self._cl, self._transform, self._equal_tailed)
 
+    def _evaluate_on_grid(self):
+        """
+        Evaluate the function with one single call for all samples and all the points of the grid of independent
+        variables, by passing the samples as arrays of shape (n_samples, 1) and the (flattened) grid as arrays of shape
+        (1, n_points). The result is checked against the point by point evaluation on a few samples.
+
+        :return: a list of RandomVariates, one for each point of the grid (in the same order as itertools.product)
+        :raise CannotBroadcast: if the function does not support arrays of parameters
+        """
+
+        grid = [variable.reshape(1, -1) for variable in np.meshgrid(*self._independent_variable_range, indexing='ij')]
+
+        n_points = grid[0].shape[1]
+
+        samples_arguments = {}
+        n_samples = None
+
+        for name, value in self._propagation_arguments.items():
+
+            if np.ndim(value) > 0:
+
+                samples_arguments[name] = np.asarray(value).reshape(-1, 1)
+
+                n_samples = samples_arguments[name].shape[0]
+
+            else:
+
+                samples_arguments[name] = value
+
+        if n_samples is None:
+
+            raise CannotBroadcast("There are no samples to propagate")
+
+        try:
+
+            with use_astromodels_memoization(False):
+
+                values = np.array(self._function(*grid, **samples_arguments), dtype=float)
+
+                values = np.array(np.broadcast_to(values, (n_samples, n_points)))
+
+                # Make sure the function really supports broadcasting (and, for integrals, that the fixed-grid
+                # quadrature is accurate) by comparing with the point by point evaluation on the first, middle and
+                # last sample, at the first and last point
+
+                for i, j in itertools.product((0, n_samples // 2, n_samples - 1), (0, n_points - 1)):
+
+                    this_sample = dict((name, value[i, 0] if np.ndim(value) > 0 else value)
+                                       for name, value in samples_arguments.items())
+
+                    expected = float(self._function(*[variable[0, j] for variable in grid], **this_sample))
+
+                    if not np.isclose(values[i, j], expected, rtol=1e-5, atol=0, equal_nan=True):
+
+                        raise CannotBroadcast("Broadcast evaluation differs from point by point evaluation")
+
+        except CannotBroadcast:
+
+            raise
+
+        except Exception:
+
+            raise CannotBroadcast("The function does not support arrays of parameters")
+
+        return [RandomVariates(values[:, j]) for j in range(n_points)]
+
     @property
     def values(self):
         """
@@ -170,6 +281,16 @@ class GenericFittedSourceHandler(object):
 
         return self._propagated_variates
 
+    @property
+    def raw_samples(self):
+        """
+
+        :return: the untransformed samples of the variates, as an array of shape (number of points, number of samples),
+        which can be used to re-create the handler without propagating again (see the samples keyword)
+        """
+
+        return np.array([variate.samples for variate in self._propagated_variates.values])
+
     @property
     def samples(self):
         """
@@ -0,0 +1,168 @@
+import __builtin__
+import sys
+import time
+
+
+class ImportProfiler(object):
+    """
+    Records the time spent importing modules. While the profiler is active, every import statement which loads new
+    modules is timed. For each of them the profiler keeps the time spent in the module itself and the cumulative time,
+    which includes the imports made by the module.
+
+    The profiler can be used as a context manager or with start() and stop(), and it can be started several times
+    (it is stopped when stop() has been called as many times as start()).
+    """
+
+    def __init__(self):
+
+        self._depth = 0
+        self._original_import = None
+
+        # Stack with the time spent in nested imports, for each import being executed
+
+        self._children_time = []
+
+        # List of (module name, self time, cumulative time), times in seconds
+
+        self._records = []
+
+    @property
+    def records(self):
+        """
+        :return: a list of (module name, self time, cumulative time), with times in seconds
+        """
+
+        return list(self._records)
+
+    def start(self):
+
+        if self._depth == 0:
+
+            self._original_import = __builtin__.__import__
+
+            __builtin__.__import__ = self._import
+
+        self._depth += 1
+
+    def stop(self):
+
+        assert self._depth > 0, "The import profiler is not active"
+
+        self._depth -= 1
+
+        if self._depth == 0:
+
+            __builtin__.__import__ = self._original_import
+
+            self._original_import = None
+
+    def __enter__(self):
+
+        self.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.stop()
+
+    def _import(self, name, globals=None, locals=None, fromlist=None, level=-1):
+
+        candidate_names = _get_candidate_names(name, globals, level)
+
+        was_loaded = [sys.modules.get(candidate) is not None for candidate in candidate_names]
+
+        self._children_time.append(0.0)
+
+        start = time.time()
+
+        try:
+
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        finally:
+
+            cumulative_time = time.time() - start
+
+            children_time = self._children_time.pop()
+
+            if self._children_time:
+
+                self._children_time[-1] += cumulative_time
+
+            # Only imports which loaded a new module are interesting (the others are just lookups in sys.modules)
+
+            for candidate, candidate_was_loaded in zip(candidate_names, was_loaded):
+
+                if sys.modules.get(candidate) is not None:
+
+                    if not candidate_was_loaded:
+
+                        self._records.append((candidate, cumulative_time - children_time, cumulative_time))
+
+                    break
+
+
+def _get_candidate_names(name, globals, level):
+    """
+    Returns the absolute names that an imported module can have, in the order in which Python tries them (an
+    implicit relative import in Python 2 first looks for the module in the package of the importer)
+
+    :param name: the name in the import statement
+    :param globals: the globals of the importer
+    :param level: the level of the import (0: absolute, >0: explicit relative, -1: implicit relative)
+    :return: list of absolute names
+    """
+
+    if not globals or level == 0:
+
+        return [name]
+
+    package = globals.get('__package__')
+
+    if package is None:
+
+        importer = globals.get('__name__') or ''
+
+        package = importer if '__path__' in globals else importer.rpartition('.')[0]
+
+    if level > 0:
+
+        package = package.rsplit('.', level - 1)[0] if level > 1 else package
+
+        return ["%s.%s" % (package, name) if name else package]
+
+    if package:
+
+        return ["%s.%s" % (package, name), name]
+
+    return [name]
+
+
+# This is the profiler used by threeML. It is active during the import of threeML if the environment variable
+# THREEML_PROFILE_IMPORTS is set, and during the import of plugins
+
+import_profiler = ImportProfiler()
+
+
+def get_import_times():
+    """
+    Returns the time spent importing modules, as recorded by the threeML import profiler. To profile the import of
+    threeML itself, set the environment variable THREEML_PROFILE_IMPORTS before importing it. The import of plugins,
+    which happens the first time they are used, is always profiled.
+
+    :return: a pandas DataFrame with the self and cumulative time (in milliseconds) of each module, sorted by
+    decreasing cumulative time
+    """
+
+    import pandas as pd
+
+    records = import_profiler.records
+
+    report = pd.DataFrame.from_records([(name, self_time * 1000.0, cumulative_time * 1000.0)
+                                        for name, self_time, cumulative_time in records],
+                                       columns=['module', 'self (ms)', 'cumulative (ms)'])
+
+    report = report.set_index('module').sort_values('cumulative (ms)', ascending=False)
+
+    return report
@@ -1,6 +1,5 @@
 import re
 import copy
-from operator import itemgetter, attrgetter
 import numpy as np
 
 
@@ -155,13 +154,108 @@ class IntervalSet(object):
     """
     A set of intervals
 
+    The set is stored as two arrays with the starts and the stops of the intervals. The Interval objects are only
+    created when they are needed (for example when iterating over the set)
+
     """
 
     INTERVAL_TYPE = Interval
 
     def __init__(self, list_of_intervals=()):
 
-        self._intervals = list(list_of_intervals)
+        if isinstance(list_of_intervals, IntervalSet):
+
+            # no need to go through the interval objects
+
+            self._set_arrays(list_of_intervals._starts, list_of_intervals._stops)
+
+            if list_of_intervals._interval_list is not None:
+
+                self._interval_list = list(list_of_intervals._interval_list)
+
+        else:
+
+            intervals = list(list_of_intervals)
+
+            self._set_arrays([interval.start for interval in intervals], [interval.stop for interval in intervals])
+
+            # keep the provided objects, so that they are returned when iterating
+
+            self._interval_list = intervals
+
+    def _set_arrays(self, starts, stops):
+        """
+        Set the starts and the stops of the intervals, dropping the interval objects (if any)
+
+        :param starts: array of starts
+        :param stops: array of stops
+        :return: none
+        """
+
+        self._starts = np.array(starts, dtype=float).reshape(-1)
+        self._stops = np.array(stops, dtype=float).reshape(-1)
+
+        self._interval_list = None
+
+    @classmethod
+    def _from_arrays(cls, starts, stops):
+        """
+        Create a new interval set of this type from arrays of starts and stops, without creating the interval objects
+
+        :param starts: array of starts
+        :param stops: array of stops
+        :return: interval set
+        """
+
+        starts = np.array(starts, dtype=float).reshape(-1)
+        stops = np.array(stops, dtype=float).reshape(-1)
+
+        # Note that this allows to have intervals of zero duration (as Interval does)
+
+        invalid = stops < starts
+
+        if np.any(invalid):
+
+            idx = np.flatnonzero(invalid)[0]
+
+            raise RuntimeError("Invalid time interval! TSTART must be before TSTOP and TSTOP-TSTART >0. "
+                               "Got tstart = %s and tstop = %s" % (starts[idx], stops[idx]))
+
+        interval_set = IntervalSet.__new__(IntervalSet)
+
+        interval_set._set_arrays(starts, stops)
+
+        return cls.new(interval_set)
+
+    @property
+    def _intervals(self):
+        """
+        The list of interval objects, created the first time it is needed
+
+        :return: list of intervals
+        """
+
+        if self._interval_list is None:
+
+            self._interval_list = [self.new_interval(start, stop) for start, stop in zip(self._starts, self._stops)]
+
+        return self._interval_list
+
+    def _subset(self, index):
+        """
+        Returns a new set with the intervals selected by index (a mask or an array of indexes)
+
+        :param index: a boolean mask or an array of indexes
+        :return: new interval set
+        """
+
+        new_set = self._from_arrays(self._starts[index], self._stops[index])
+
+        if self._interval_list is not None:
+
+            new_set._interval_list = [self._interval_list[i] for i in np.arange(len(self))[index]]
+
+        return new_set
 
     @classmethod
     def new(cls, *args, **kwargs):
@@ -194,14 +288,9 @@ class IntervalSet(object):
         :return:
         """
 
-        list_of_intervals = []
-
-        for interval in intervals:
-            imin, imax = cls._parse_interval(interval)
+        bounds = np.array([cls._parse_interval(interval) for interval in intervals], dtype=float).reshape(-1, 2)
 
-            list_of_intervals.append(cls.new_interval(imin, imax))
-
-        return cls(list_of_intervals)
+        return cls._from_arrays(bounds[:, 0], bounds[:, 1])
 
     @staticmethod
     def _parse_interval(time_interval):
@@ -228,12 +317,7 @@ class IntervalSet(object):
         assert len(starts) == len(stops), 'starts length: %d and stops length: %d must have same length' % (
         len(starts), len(stops))
 
-        list_of_intervals = []
-
-        for imin, imax in zip(starts, stops):
-            list_of_intervals.append(cls.new_interval(imin, imax))
-
-        return cls(list_of_intervals)
+        return cls._from_arrays(starts, stops)
 
     @classmethod
     def from_list_of_edges(cls, edges):
@@ -250,12 +334,9 @@ class IntervalSet(object):
 
         edges.sort()
 
-        list_of_intervals = []
-
-        for imin, imax in zip(edges[:-1], edges[1:]):
-            list_of_intervals.append(cls.new_interval(imin, imax))
+        edges = np.array(edges, dtype=float)
 
-        return cls(list_of_intervals)
+        return cls._from_arrays(edges[:-1], edges[1:])
 
     def merge_intersecting_intervals(self, in_place=False):
         """
@@ -266,103 +347,103 @@ class IntervalSet(object):
         :return:
         """
 
-        # get a copy of the sorted intervals
-
-        sorted_intervals = self.sort()
+        # sort the intervals by their start
 
-        new_intervals = []
+        order = np.argsort(self._starts, kind='mergesort')
 
-        while (len(sorted_intervals) > 1):
+        starts = self._starts[order]
+        stops = self._stops[order]
 
-            # pop the first interval off the stack
+        # an interval starts a new group if it does not overlap with any of the previous ones (see
+        # Interval.overlaps_with: intervals which only touch do not overlap, unless they have the same start or stop)
 
-            this_interval = sorted_intervals.pop(0)
+        running_stops = np.maximum.accumulate(stops)
 
-            # see if that interval overlaps with the the next one
+        new_group = np.ones(len(starts), dtype=bool)
 
-            if this_interval.overlaps_with(sorted_intervals[0]):
+        new_group[1:] = (starts[1:] >= running_stops[:-1]) & \
+                        (starts[1:] != starts[:-1]) & \
+                        (stops[1:] != running_stops[:-1])
 
-                # if so, pop the next one
+        group_starts = np.flatnonzero(new_group)
 
-                next_interval = sorted_intervals.pop(0)
+        new_starts = starts[group_starts]
 
-                # and merge the two, appending them to the new intervals
+        if len(group_starts) > 0:
 
-                new_intervals.append(this_interval.merge(next_interval))
+            new_stops = np.maximum.reduceat(stops, group_starts)
 
-            else:
+        else:
 
-                # otherwise just append this interval
+            new_stops = stops
 
-                new_intervals.append(this_interval)
+        if in_place:
 
-                # now if there is only one interval left
-                # it should not overlap with any other interval
-                # and the loop will stop
-                # otherwise, we continue
+            self._set_arrays(new_starts, new_stops)
 
-        # if there was only one interval
-        # or a leftover from the merge
-        # we append it
-        if sorted_intervals:
+        else:
 
-            assert len(
-                sorted_intervals) == 1, "there should only be one interval left over, this is a bug"  # pragma: no cover
+            return self._from_arrays(new_starts, new_stops)
 
-            # we want to make sure that the last new interval did not
-            # overlap with the final interval
-            if new_intervals:
+    def extend(self, list_of_intervals):
 
-                if new_intervals[-1].overlaps_with(sorted_intervals[0]):
+        intervals = list(list_of_intervals)
 
-                    new_intervals[-1] = new_intervals[-1].merge(sorted_intervals[0])
+        if self._interval_list is not None:
 
-                else:
+            self._interval_list.extend(intervals)
 
-                    new_intervals.append(sorted_intervals[0])
+        self._starts = np.append(self._starts, [interval.start for interval in intervals])
+        self._stops = np.append(self._stops, [interval.stop for interval in intervals])
 
+    def __len__(self):
 
-            else:
+        return len(self._starts)
 
-                new_intervals.append(sorted_intervals[0])
+    def __iter__(self):
 
-        if in_place:
+        if self._interval_list is not None:
 
-            self.__init__(new_intervals)
+            for interval in self._interval_list:
+                yield interval
 
         else:
 
-            return self.new(new_intervals)
-
-    def extend(self, list_of_intervals):
-
-        self._intervals.extend(list_of_intervals)
+            for start, stop in zip(self._starts, self._stops):
+                yield self.new_interval(start, stop)
 
-    def __len__(self):
+    def __getitem__(self, item):
 
-        return len(self._intervals)
+        if self._interval_list is None and isinstance(item, (int, long, np.integer)):
 
-    def __iter__(self):
+            # no need to create all the intervals to return one
 
-        for interval in self._intervals:
-            yield interval
-
-    def __getitem__(self, item):
+            return self.new_interval(self._starts[item], self._stops[item])
 
         return self._intervals[item]
 
     def __eq__(self, other):
 
-        for interval_this, interval_other in zip(self.argsort(), other.argsort()):
+        n_intervals = min(len(self), len(other))
 
-            if not self[interval_this] == other[interval_other]:
-                return False
+        this_order = np.argsort(self._starts, kind='mergesort')[:n_intervals]
+        other_order = np.argsort(other._starts, kind='mergesort')[:n_intervals]
 
-        return True
+        return bool(np.all(self._starts[this_order] == other._starts[other_order]) and
+                    np.all(self._stops[this_order] == other._stops[other_order]))
 
     def pop(self, index):
 
-        return self._intervals.pop(index)
+        interval = self[index]
+
+        if self._interval_list is not None:
+
+            self._interval_list.pop(index)
+
+        self._starts = np.delete(self._starts, index)
+        self._stops = np.delete(self._stops, index)
+
+        return interval
 
     def sort(self):
         """
@@ -377,7 +458,7 @@ class IntervalSet(object):
 
         else:
 
-            return self.new(np.atleast_1d(itemgetter(*self.argsort())(self._intervals)))
+            return self._subset(np.argsort(self._starts, kind='mergesort'))
 
     def argsort(self):
         """
@@ -386,10 +467,7 @@ class IntervalSet(object):
         :return:
         """
 
-        # Gather all tstarts
-        tstarts = map(lambda x: x.start, self._intervals)
-
-        return map(lambda x: x[0], sorted(enumerate(tstarts), key=itemgetter(1)))
+        return np.argsort(self._starts, kind='mergesort').tolist()
 
     def is_contiguous(self, relative_tolerance=1e-5):
         """
@@ -399,10 +477,7 @@ class IntervalSet(object):
         :return: True or False
         """
 
-        starts = map(attrgetter("start"), self._intervals)
-        stops = map(attrgetter("stop"), self._intervals)
-
-        return np.allclose(starts[1:], stops[:-1], rtol=relative_tolerance)
+        return np.allclose(self._starts[1:], self._stops[:-1], rtol=relative_tolerance)
 
     @property
     def is_sorted(self):
@@ -411,7 +486,7 @@ class IntervalSet(object):
         :return: True or False
         """
 
-        return np.all(self.argsort() == np.arange(len(self)))
+        return bool(np.all(self._starts[1:] >= self._starts[:-1]))
 
     def containing_bin(self, value):
         """
@@ -439,12 +514,11 @@ class IntervalSet(object):
         :return:
         """
 
-        # loop only once because every call unpacks the array
         # we need to round for the comparison because we may have read from
         # strings which are rounded to six decimals
 
-        starts = np.round(self.starts,decimals=6)
-        stops = np.round(self.stops,decimals=6)
+        starts = np.round(self._starts, decimals=6)
+        stops = np.round(self._stops, decimals=6)
 
         start = np.round(start,decimals=6)
         stop = np.round(stop, decimals=6)
@@ -469,40 +543,37 @@ class IntervalSet(object):
 
         else:
 
-            return self.new(np.asarray(self._intervals)[condition])
-
-
-
+            return self._subset(condition)
 
     @property
     def starts(self):
         """
         Return the starts fo the set
 
-        :return: list of start times
+        :return: array of start times
         """
 
-        return [interval.start for interval in self._intervals]
+        return np.array(self._starts)
 
     @property
     def stops(self):
         """
         Return the stops of the set
 
-        :return:
+        :return: array of stop times
         """
 
-        return [interval.stop for interval in self._intervals]
+        return np.array(self._stops)
 
     @property
     def mid_points(self):
 
-        return np.array([interval.mid_point for interval in self._intervals])
+        return (self._starts + self._stops) / 2.0
 
     @property
     def widths(self):
 
-        return np.array([interval._get_width() for interval in self._intervals])
+        return self._stops - self._starts
 
     @property
     def absolute_start(self):
@@ -511,7 +582,7 @@ class IntervalSet(object):
         :return:
         """
 
-        return min(self.starts)
+        return self._starts.min()
 
     @property
     def absolute_stop(self):
@@ -520,7 +591,7 @@ class IntervalSet(object):
         :return:
         """
 
-        return max(self.stops)
+        return self._stops.max()
 
     @property
     def edges(self):
@@ -531,8 +602,7 @@ class IntervalSet(object):
 
         if self.is_contiguous() and self.is_sorted:
 
-            edges = [interval.start for interval in itemgetter(*self.argsort())(self._intervals)]
-            edges.append([interval.stop for interval in itemgetter(*self.argsort())(self._intervals)][-1])
+            edges = np.append(self._starts, self._stops[-1])
 
         else:
 
@@ -548,7 +618,7 @@ class IntervalSet(object):
         :return:
         """
 
-        return ','.join([interval.to_string() for interval in self._intervals])
+        return ','.join([interval.to_string() for interval in self])
 
     @property
     def bin_stack(self):
@@ -560,4 +630,4 @@ class IntervalSet(object):
         :return:
         """
 
-        return np.vstack((self.starts, self.stops)).T
+        return np.vstack((self._starts, self._stops)).T
@@ -67,6 +67,10 @@ class FilterSet(object):
 
         self._calculate_fwhm()
 
+        # precompute the quadrature of the filter responses
+
+        self._calculate_weights()
+
 
     @property
     def wavelength_bounds(self):
@@ -115,61 +119,80 @@ class FilterSet(object):
         self._wavebounds = IntervalSet.from_starts_and_stops(wmin,wmax)
 
 
-    def set_model(self, differential_flux):
+    def _calculate_weights(self):
         """
-        set the model of that will be used during the convolution. Not that speclite
-        considers a differential flux to be in units of erg/s/cm2/lambda so we must convert
-        astromodels into the proper units (using astropy units!)
-
-
+        precompute the convolution of the filters with a differential flux (what speclite does with
+        convolve_with_function, photon weighted and with the trapezoidal rule) as a matrix which multiplies the
+        differential flux evaluated on the merged wavelength grid of all the filters. The zero points of the filters
+        and the unit conversions are included, so that the product is directly the ratio of the synthetic flux to the
+        AB zero point.
+
+        Speclite considers a differential flux to be in units of erg/s/cm2/lambda, which for a differential
+        photon flux N(E) in 1/(keV cm2 s) is N(E) * h^2 c^2 / lambda^3. The photon-weighted integral is then
+        int N(E) R(lambda) h c / lambda^2 dlambda
+        :return:
         """
 
-        conversion_factor = (constants.c ** 2 * constants.h ** 2).to('keV2 * cm2')
+        # this is h * c in keV * Angstrom, the units of the filter wavelengths
 
-        def wrapped_model(x):
-            return differential_flux(x) * conversion_factor / x ** 3
+        hc = (constants.h * constants.c).to('keV * Angstrom').value
 
+        # merge the wavelength grids of all the filters (have to grab the private members here
+        # bc the library does not expose them!)
 
+        wavelengths = np.unique(np.concatenate([filter._wavelength for filter in self._filters]))
 
-        self._wrapped_model = wrapped_model
+        self._energies = hc / wavelengths
 
-        self._model_set = True
+        self._weights = np.zeros((len(self._filters.names), len(wavelengths)))
 
-    def ab_magnitudes(self):
-        """
-        return the effective stimulus of the model and filter for the given
-        magnitude system
-        :return: np.ndarray of ab magnitudes
-        """
+        for i, filter in enumerate(self._filters):
 
-        assert self._model_set, 'no likelihood model has been set'
+            filter_wavelengths = filter._wavelength
 
-        # speclite has issues with unit conversion
-        # so we will do the calculation manually here
+            idx = np.searchsorted(wavelengths, filter_wavelengths)
 
-        ratio = []
+            # trapezoidal rule
 
-        for filter in self._filters:
+            widths = np.diff(filter_wavelengths)
 
-            # first get the flux and convert it to base units
-            synthetic_flux = filter.convolve_with_function(self._wrapped_model).to('1/(cm2 s)')
+            quadrature = np.zeros_like(filter_wavelengths)
 
-            # normalize it to the filter's AB magnitude
+            quadrature[:-1] += 0.5 * widths
+            quadrature[1:] += 0.5 * widths
 
+            zero_point = filter.ab_zeropoint.to('1/(cm2 s)').value
 
+            self._weights[i, idx] = quadrature * filter._response * hc / filter_wavelengths ** 2 / zero_point
 
-            ratio.append((synthetic_flux/filter.ab_zeropoint.to('1/(cm2 s)')).value)
+    def set_model(self, differential_flux):
+        """
+        set the model of that will be used during the convolution. The differential flux will be evaluated
+        on the energies (in keV) of the precomputed wavelength grid
 
+        :param differential_flux: a function returning the differential photon flux (1/(keV cm2 s)) at the given
+        energies (keV)
+        """
 
+        self._differential_flux = differential_flux
 
-        ratio = np.array(ratio)
+        self._model_set = True
 
-        return -2.5 * np.log10(ratio)
+    def ab_magnitudes(self):
+        """
+        return the effective stimulus of the model and filter for the given
+        magnitude system
+        :return: np.ndarray of ab magnitudes
+        """
 
+        assert self._model_set, 'no likelihood model has been set'
 
+        # speclite has issues with unit conversion, and is slow,
+        # so we use the precomputed quadrature (see _calculate_weights)
 
-        #return self._filters.get_ab_magnitudes(self._wrapped_model).to_pandas().loc[0]
+        ratio = self._weights.dot(self._differential_flux(self._energies))
 
+        return -2.5 * np.log10(ratio)
 
     def plot_filters(self):
         """
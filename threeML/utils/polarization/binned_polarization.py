@@ -38,7 +38,7 @@ class ScatteringChannelSet(IntervalSet):
     @property
     def channels_widths(self):
 
-        return np.array([channel.channel_width for channel in self._intervals])
+        return self.widths
 
 
 class BinnedModulationCurve(BinnedSpectrum):
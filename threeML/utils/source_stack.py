@@ -0,0 +1,59 @@
+class PointSourceStack(object):
+    """
+    Evaluates the sum of the differential fluxes of the point sources a plugin refers to: all the point sources of the
+    model, or only the source the plugin has been assigned to. The sources are looked up once, when the stack is
+    created, so a new stack must be created (i.e., set_model must be called again) when sources are added to or
+    removed from the model.
+
+    :param likelihood_model: the likelihood model (an astromodels.Model instance)
+    :param source_name: name of the source to evaluate, or None to evaluate the sum of all point sources
+    """
+
+    def __init__(self, likelihood_model, source_name=None):
+
+        if source_name is None:
+
+            self._sources = likelihood_model.point_sources.values()
+
+            assert len(self._sources) > 0, "You need to have at least one point source defined"
+
+        else:
+
+            try:
+
+                self._sources = [likelihood_model.sources[source_name]]
+
+            except KeyError:
+
+                raise KeyError("Source %s is not contained in the likelihood model" % source_name)
+
+        self._first_source = self._sources[0]
+        self._other_sources = self._sources[1:]
+
+    @property
+    def sources(self):
+        """
+        :return: the list of the sources in the stack
+        """
+
+        return list(self._sources)
+
+    def __call__(self, energies, tag=None):
+        """
+        Evaluate the sum of the sources. The fluxes of the other sources are accumulated in place into the array
+        returned by the first one, so no list of arrays and no stacked intermediate array are created
+
+        :param energies: where to evaluate the sources (energies, or x values for XYLike)
+        :param tag: the tag to pass to the sources (see astromodels), or None
+        :return: the sum of the differential fluxes of the sources
+        """
+
+        fluxes = self._first_source(energies, tag=tag)
+
+        # If we have only one point source, this will never be executed
+
+        for source in self._other_sources:
+
+            fluxes += source(energies, tag=tag)
+
+        return fluxes
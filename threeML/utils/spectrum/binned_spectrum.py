@@ -37,7 +37,7 @@ class ChannelSet(IntervalSet):
     @property
     def channels_widths(self):
 
-        return np.array([channel.channel_width for channel in self._intervals ])
+        return self.widths
 
 class Quality(object):
     def __init__(self, quality):
@@ -680,15 +680,23 @@ class BinnedSpectrumWithDispersion(BinnedSpectrum):
 
         pha_information = time_series.get_information_dict(use_poly, extract)
 
-        is_poisson = True
-
-        if use_poly:
-            is_poisson = False
-
+        return cls.from_information_dict(pha_information, response, use_poly)
 
+    @classmethod
+    def from_information_dict(cls, pha_information, response=None, use_poly=False):
+        """
+        Build the spectrum from a PHAContainer dictionary (see TimeSeries.get_information_dict)
 
+        :param pha_information: the dictionary
+        :param response: the response
+        :param use_poly: whether the dictionary contains the counts from the polynomial fits
+        :return:
+        """
 
+        is_poisson = True
 
+        if use_poly:
+            is_poisson = False
 
         return cls(instrument=pha_information['instrument'],
                    mission=pha_information['telescope'],
@@ -0,0 +1,169 @@
+__author__ = 'grburgess'
+
+import glob
+import hashlib
+import os
+
+import numpy as np
+
+from threeML.config.config import threeML_config
+from threeML.exceptions.custom_exceptions import custom_warnings
+from threeML.io.file_utils import if_directory_not_existing_then_make
+from threeML.io.package_data import get_path_of_user_dir
+from threeML.utils.time_series.polynomial import Polynomial, PolynomialSet
+
+
+def _get_background_cache_directory():
+    """
+    Returns the path of the directory containing the cache of the fitted backgrounds (~/.threeML/.cache/backgrounds)
+
+    :return: an absolute path
+    """
+
+    return os.path.join(get_path_of_user_dir(), '.cache', 'backgrounds')
+
+
+def get_background_cache_key(data_checksum, poly_intervals, poly_order, unbinned):
+    """
+    Compute the key of a background fit in the cache. The fit is identified by the content of the data, the
+    background intervals, the requested polynomial order (-1 for automatic) and the fit method with its options
+
+    :param data_checksum: the checksum of the content of the time series
+    :param poly_intervals: the TimeIntervalSet of the background selections
+    :param poly_order: the polynomial order requested by the user
+    :param unbinned: whether the fit is unbinned or binned
+    :return: the hex digest of the key
+    """
+
+    fit_type = 'unbinned' if unbinned else 'binned'
+
+    fit_method = threeML_config['event list']['%s fit method' % fit_type]
+    fit_options = threeML_config['event list']['%s fit options' % fit_type]
+
+    key = hashlib.sha1()
+
+    key.update(data_checksum)
+    key.update(np.ascontiguousarray(poly_intervals.start_times, dtype=float).tostring())
+    key.update(np.ascontiguousarray(poly_intervals.stop_times, dtype=float).tostring())
+    key.update("%s %s %s %s" % (poly_order, fit_type, fit_method, sorted(fit_options.items())))
+
+    return key.hexdigest()
+
+
+def _get_cache_file(key):
+
+    return os.path.join(_get_background_cache_directory(), "%s.npz" % key)
+
+
+def read_background_from_cache(key):
+    """
+    Read a fitted background from the cache
+
+    :param key: the key returned by get_background_cache_key
+    :return: (PolynomialSet, polynomial order), or None if the fit is not in the cache
+    """
+
+    cache_file = _get_cache_file(key)
+
+    if not os.path.exists(cache_file):
+
+        return None
+
+    try:
+
+        with np.load(cache_file) as stored:
+
+            coefficients = stored['coefficients']
+            covariance_matrices = stored['covariance_matrices']
+            n_coefficients = stored['n_coefficients']
+            poly_order = int(stored['poly_order'])
+
+    except Exception:
+
+        custom_warnings.warn("Could not read the cached background in %s. Fitting it again." % cache_file)
+
+        return None
+
+    # mark the entry as recently used, so that it is evicted last
+
+    os.utime(cache_file, None)
+
+    polynomials = [Polynomial.from_previous_fit(coefficients[i, :n], covariance_matrices[i, :n, :n])
+                   for i, n in enumerate(n_coefficients)]
+
+    return PolynomialSet(polynomials), poly_order
+
+
+def write_background_to_cache(key, polynomials, poly_order):
+    """
+    Write a fitted background to the cache, then remove the least recently used entries if the cache is larger than
+    the maximum size in the configuration
+
+    :param key: the key returned by get_background_cache_key
+    :param polynomials: the PolynomialSet of the fit
+    :param poly_order: the polynomial order of the fit
+    :return: none
+    """
+
+    cache_file = _get_cache_file(key)
+
+    if_directory_not_existing_then_make(os.path.dirname(cache_file))
+
+    # Write to a temporary file first and then move it, so that other sessions never read a partial file
+
+    temporary_file = "%s.%i.tmp" % (cache_file, os.getpid())
+
+    with open(temporary_file, "wb") as f:
+
+        np.savez(f,
+                 coefficients=polynomials.coefficients,
+                 covariance_matrices=polynomials.covariance_matrices,
+                 n_coefficients=np.array([len(poly.coefficients) for poly in polynomials]),
+                 poly_order=poly_order)
+
+    os.rename(temporary_file, cache_file)
+
+    _evict(threeML_config['background cache']['maximum size'] * 1024 ** 2)
+
+
+def _evict(maximum_size):
+    """
+    Remove the least recently used entries of the cache until its size is at most maximum_size bytes
+
+    :param maximum_size: maximum size in bytes
+    :return: none
+    """
+
+    cache_files = glob.glob(os.path.join(_get_background_cache_directory(), "*.npz"))
+
+    entries = []
+
+    for cache_file in cache_files:
+
+        try:
+
+            entries.append((os.path.getmtime(cache_file), os.path.getsize(cache_file), cache_file))
+
+        except OSError:
+
+            # removed by another session in the meantime
+
+            continue
+
+    total_size = sum([size for _, size, _ in entries])
+
+    for _, size, cache_file in sorted(entries):
+
+        if total_size <= maximum_size:
+
+            break
+
+        try:
+
+            os.remove(cache_file)
+
+        except OSError:
+
+            pass
+
+        total_size -= size
@@ -5,7 +5,7 @@ from threeML.io.plotting.light_curve_plots import binned_light_curve_plot
 from threeML.io.progress_bar import progress_bar
 from threeML.utils.spectrum.binned_spectrum_set import BinnedSpectrumSet
 from threeML.utils.time_interval import TimeIntervalSet
-from threeML.utils.time_series.polynomial import polyfit
+from threeML.utils.time_series.polynomial import polyfit, PolynomialSet
 from threeML.utils.time_series.time_series import TimeSeries
 
 
@@ -41,6 +41,41 @@ class BinnedSpectrumSeries(TimeSeries):
 
         self._binned_spectrum_set = binned_spectrum_set
 
+        # the bins are found with a binary search in their starts and stops (see _get_bin_ranges), and the counts and
+        # exposure of a range of bins are differences of cumulative tables (see _get_cumulative_tables)
+
+        starts = np.array(binned_spectrum_set.time_intervals.start_times, dtype=float)
+        stops = np.array(binned_spectrum_set.time_intervals.stop_times, dtype=float)
+
+        self._bin_order = np.argsort(starts, kind='mergesort')
+
+        self._sorted_bin_starts = starts[self._bin_order]
+        self._sorted_bin_stops = stops[self._bin_order]
+
+        # we need to round for the comparison because we may have read from
+        # strings which are rounded to six decimals (as in TimeIntervalSet.containing_interval)
+
+        self._rounded_bin_starts = np.round(self._sorted_bin_starts, decimals=6)
+        self._rounded_bin_stops = np.round(self._sorted_bin_stops, decimals=6)
+
+        # the binary search needs the stops to be sorted as well, which is not the case only if some bins contain
+        # others. Then we fall back to masks
+
+        self._bins_are_sorted = bool(np.all(self._sorted_bin_stops[1:] >= self._sorted_bin_stops[:-1]))
+
+        self._cumulative_counts = None
+        self._cumulative_exposure = None
+
+    def _update_data_checksum(self, checksum):
+
+        checksum.update(np.ascontiguousarray(self._binned_spectrum_set.counts_per_bin, dtype=float).tostring())
+        checksum.update(np.ascontiguousarray(self._binned_spectrum_set.exposure_per_bin, dtype=float).tostring())
+
+        time_intervals = self._binned_spectrum_set.time_intervals
+
+        checksum.update(np.ascontiguousarray(time_intervals.start_times, dtype=float).tostring())
+        checksum.update(np.ascontiguousarray(time_intervals.stop_times, dtype=float).tostring())
+
     @property
     def bins(self):
         """
@@ -52,14 +87,15 @@ class BinnedSpectrumSeries(TimeSeries):
 
         return self._binned_spectrum_set.time_intervals
 
-    def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False):
-        # type: (float, float, float, bool) -> None
+    def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False, max_bins=None):
+        # type: (float, float, float, bool, int) -> None
 
         """
         :param start:
         :param stop:
         :param dt:
         :param use_binner:
+        :param max_bins: if given, consecutive bins are merged so that at most max_bins bins are plotted
 
         """
 
@@ -67,26 +103,29 @@ class BinnedSpectrumSeries(TimeSeries):
 
         bins = self._binned_spectrum_set.time_intervals.containing_interval( start, stop) # type: TimeIntervalSet
 
-        cnts = []
-        width = []
-
-        for bin in bins:
+        counts, _ = self._counts_and_exposure_over_intervals(bins.start_times, bins.stop_times)
 
-            cnts.append(self.counts_over_interval(bin.start_time, bin.stop_time) )
-            width.append(bin.duration)
+        cnts = counts.sum(axis=1)
 
+        width = bins.widths
 
         # now we want to get the estimated background from the polynomial fit
 
         if self.poly_fit_exists:
 
-            bkg = []
-            for j, tb in enumerate(bins):
-                tmpbkg = 0.
-                for poly in self.polynomials:
-                    tmpbkg += poly.integral(tb.start_time, tb.stop_time)
+            bkg_counts = self.get_total_poly_count(bins.start_times, bins.stop_times)
+
+        else:
+
+            bkg_counts = None
+
+        starts, stops, cnts, width, bkg_counts = self._downsample_light_curve(bins.start_times, bins.stop_times,
+                                                                             np.array(cnts), width, bkg_counts,
+                                                                             max_bins)
 
-                bkg.append(tmpbkg / width[j])
+        if bkg_counts is not None:
+
+            bkg = bkg_counts / width
 
         else:
 
@@ -113,9 +152,9 @@ class BinnedSpectrumSeries(TimeSeries):
 
         # plot the light curve
 
-        fig = binned_light_curve_plot(time_bins=bins.bin_stack,
-                                cnts=np.array(cnts),
-                                width=np.array(width),
+        fig = binned_light_curve_plot(time_bins=np.vstack((starts, stops)).T,
+                                cnts=cnts,
+                                width=width,
                                 bkg=bkg,
                                 selection=selection,
                                 bkg_selections=bkg_selection)
@@ -133,22 +172,11 @@ class BinnedSpectrumSeries(TimeSeries):
         :return:
         """
 
-        # this will be a boolean list and the sum will be the
-        # number of events
-
-        bins = self._select_bins(start, stop)
-
-        total_counts = 0
-
-        for idx in np.where(bins)[0]:
-
-            # sum over channels because we just want the total counts
+        counts, _ = self._counts_and_exposure_over_intervals(start, stop)
 
-            total_counts += self._binned_spectrum_set[idx].counts.sum()
-
-
-        return total_counts
+        # sum over channels because we just want the total counts
 
+        return counts.sum()
 
     def count_per_channel_over_interval(self, start, stop):
         """
@@ -158,20 +186,9 @@ class BinnedSpectrumSeries(TimeSeries):
         :return:
         """
 
-        # this will be a boolean list and the sum will be the
-        # number of events
-
-        bins = self._select_bins(start, stop)
-
-        total_counts = np.zeros(self._n_channels)
-
-        for idx in np.where(bins)[0]:
-
-            # don't sum over channels because we want the spectrum
-            total_counts += self._binned_spectrum_set[idx].counts
-
-        return total_counts
+        counts, _ = self._counts_and_exposure_over_intervals(start, stop)
 
+        return counts
 
     def _select_bins(self, start, stop):
         """
@@ -183,6 +200,102 @@ class BinnedSpectrumSeries(TimeSeries):
 
         return self._binned_spectrum_set.time_intervals.containing_interval(start,stop,as_mask=True)
 
+    def _get_bin_ranges(self, starts, stops):
+        """
+        Find the bins contained in start-stop (the same ones _select_bins would select) with a binary search. They are
+        the bins from first_bin (included) to last_bin (excluded) in time order. Only valid if the bins are sorted
+
+        :param starts: start time (or array of start times)
+        :param stops: stop time (or array of stop times)
+        :return: (first_bin, last_bin)
+        """
+
+        first_bin = np.searchsorted(self._rounded_bin_starts, np.round(starts, decimals=6), side='left')
+        last_bin = np.maximum(np.searchsorted(self._rounded_bin_stops, np.round(stops, decimals=6), side='right'),
+                              first_bin)
+
+        return first_bin, last_bin
+
+    def _get_cumulative_tables(self):
+        """
+        Returns the cumulative sums of the counts per channel and of the exposure of the bins in time order (starting
+        from 0), so that the counts and the exposure of any range of bins can be computed with a subtraction. They are
+        computed only the first time they are needed
+
+        :return: (cumulative counts with shape (number of bins + 1, number of channels), cumulative exposure)
+        """
+
+        if self._cumulative_counts is None:
+
+            counts = self._binned_spectrum_set.counts_per_bin[self._bin_order]
+            exposure = self._binned_spectrum_set.exposure_per_bin[self._bin_order]
+
+            self._cumulative_counts = np.vstack((np.zeros((1, self._n_channels)), np.cumsum(counts, axis=0)))
+            self._cumulative_exposure = np.concatenate(([0.], np.cumsum(exposure)))
+
+        return self._cumulative_counts, self._cumulative_exposure
+
+    def _counts_and_exposure_over_intervals(self, starts, stops):
+        """
+        Compute the counts per channel and the exposure of the bins contained in each interval
+
+        :param starts: start time (or array of start times)
+        :param stops: stop time (or array of stop times)
+        :return: (counts per channel, exposure), with an additional first dimension if arrays were given
+        """
+
+        if self._bins_are_sorted:
+
+            cumulative_counts, cumulative_exposure = self._get_cumulative_tables()
+
+            first_bin, last_bin = self._get_bin_ranges(starts, stops)
+
+            return (cumulative_counts[last_bin] - cumulative_counts[first_bin],
+                    cumulative_exposure[last_bin] - cumulative_exposure[first_bin])
+
+        counts_per_bin = self._binned_spectrum_set.counts_per_bin
+        exposure_per_bin = self._binned_spectrum_set.exposure_per_bin
+
+        masks = [self._select_bins(start, stop) for start, stop in zip(np.atleast_1d(starts), np.atleast_1d(stops))]
+
+        counts = np.array([np.sum(counts_per_bin[mask], axis=0) + np.zeros(self._n_channels) for mask in masks])
+        exposure = np.array([exposure_per_bin[mask].sum() for mask in masks])
+
+        if np.ndim(starts) == 0:
+
+            return counts[0], exposure[0]
+
+        return counts, exposure
+
+    def get_bulk_selection(self, time_intervals):
+        """
+        Compute, for each one of the given time intervals, the same quantities that set_active_time_intervals computes
+        for a single selection, using the cumulative tables of the bins. The current active selection is not changed.
+
+        :param time_intervals: a TimeIntervalSet
+        :return: a dictionary with the arrays 'counts' and (if a polynomial fit exists) 'poly counts' and
+        'poly counts error' with shape (number of intervals, number of channels), and the array 'exposure' with shape
+        (number of intervals,)
+        """
+
+        # as in set_active_time_intervals, the intervals are adjusted to the bins
+
+        time_intervals = self._adjust_to_true_intervals(time_intervals)
+
+        starts = np.array(time_intervals.start_times, dtype=float)
+        stops = np.array(time_intervals.stop_times, dtype=float)
+
+        counts, exposure = self._counts_and_exposure_over_intervals(starts, stops)
+
+        bulk_selection = {'counts': counts, 'exposure': exposure}
+
+        if self._poly_fit_exists:
+
+            bulk_selection['poly counts'], bulk_selection['poly counts error'] = self._get_bulk_poly_counts(starts,
+                                                                                                           stops)
+
+        return bulk_selection
+
     def _adjust_to_true_intervals(self, time_intervals):
         """
 
@@ -193,43 +306,51 @@ class BinnedSpectrumSeries(TimeSeries):
         :return: an adjusted time interval set
         """
 
-        # get all the starts and stops from these time intervals
+        starts = np.array(time_intervals.start_times, dtype=float)
+        stops = np.array(time_intervals.stop_times, dtype=float)
 
-        true_starts = np.array(self._binned_spectrum_set.time_intervals.start_times)
-        true_stops = np.array(self._binned_spectrum_set.time_intervals.stop_times)
+        # we want the actual values of the bins closest to the input
 
-        new_starts = []
-        new_stops = []
+        if self._bins_are_sorted:
 
-        # now go thru all the intervals
-        for interval in time_intervals:
+            new_starts = self._closest_values(self._sorted_bin_starts, starts)
+            new_stops = self._closest_values(self._sorted_bin_stops, stops)
 
-            # find where the suggest intervals hits the true interval
-
-            # searchsorted is fast, but is not returing what we want
-            # we want the actaul values of the bins closest to the input
+        else:
 
-            #idx = np.searchsorted(true_starts, interval.start_time,side)
+            true_starts = np.array(self._binned_spectrum_set.time_intervals.start_times)
+            true_stops = np.array(self._binned_spectrum_set.time_intervals.stop_times)
 
-            idx = (np.abs(true_starts - interval.start_time)).argmin()
+            new_starts = [true_starts[(np.abs(true_starts - start)).argmin()] for start in starts]
+            new_stops = [true_stops[(np.abs(true_stops - stop)).argmin()] for stop in stops]
 
+        # alright, now we can make appropriate time intervals
 
-            new_start = true_starts[idx]
+        return TimeIntervalSet.from_starts_and_stops(new_starts, new_stops)
 
-            #idx = np.searchsorted(true_stops, interval.stop_time)
+    @staticmethod
+    def _closest_values(sorted_values, values):
+        """
+        Find the closest element of sorted_values to each one of values (the smallest one in case of ties) with a
+        binary search
 
-            idx = (np.abs(true_stops - interval.stop_time)).argmin()
+        :param sorted_values: sorted array
+        :param values: array of values
+        :return: array of the closest elements
+        """
 
+        # a single bin has no neighbours
 
-            new_stop = true_stops[idx]
+        if len(sorted_values) == 1:
 
-            new_starts.append(new_start)
+            return np.full(len(values), sorted_values[0])
 
-            new_stops.append(new_stop)
+        idx = np.clip(np.searchsorted(sorted_values, values), 1, len(sorted_values) - 1)
 
-        # alright, now we can make appropriate time intervals
+        left = sorted_values[idx - 1]
+        right = sorted_values[idx]
 
-        return TimeIntervalSet.from_starts_and_stops(new_starts, new_stops)
+        return np.where(np.abs(values - left) <= np.abs(right - values), left, right)
 
 
     def _fit_polynomials(self):
@@ -312,7 +433,7 @@ class BinnedSpectrumSeries(TimeSeries):
                 polynomials.append(polynomial)
                 p.increase()
 
-        self._polynomials = polynomials
+        self._polynomials = PolynomialSet(polynomials)
 
     def set_active_time_intervals(self, *args):
         """
@@ -339,61 +460,59 @@ class BinnedSpectrumSeries(TimeSeries):
         time_intervals = self._adjust_to_true_intervals(time_intervals)
 
 
-        # start out with no time bins selection
-        all_idx = np.zeros(len(self._binned_spectrum_set.time_intervals),dtype=bool)
+        starts = np.array(time_intervals.start_times, dtype=float)
+        stops = np.array(time_intervals.stop_times, dtype=float)
 
-        # now we need to sum up the counts and total time
+        total_time = np.sum(stops - starts)
 
-        total_time = 0
+        if self._bins_are_sorted:
 
-        for interval in time_intervals:
+            first_bins, last_bins = self._get_bin_ranges(starts, stops)
 
-            # the select bins method is called.
-            # since we are sure that the interval bounds
-            # are aligned with the true ones, we do not care if
-            # it is inner or outer
+            # the intervals are sorted, but after the adjustment they might share some bins, which must be counted once
 
-            all_idx = np.logical_or(all_idx,self._select_bins(interval.start_time,interval.stop_time))
+            first_bins[1:] = np.maximum(first_bins[1:], np.maximum.accumulate(last_bins[:-1]))
+            last_bins = np.maximum(last_bins, first_bins)
 
-            total_time += interval.duration
+            cumulative_counts, cumulative_exposure = self._get_cumulative_tables()
 
-        # sum along the time axis
-        self._counts = self._binned_spectrum_set.counts_per_bin[all_idx].sum(axis=0)
+            # sum along the time axis
 
+            self._counts = np.sum(cumulative_counts[last_bins] - cumulative_counts[first_bins], axis=0)
 
-        # the selected time intervals
+            self._exposure = np.sum(cumulative_exposure[last_bins] - cumulative_exposure[first_bins])
 
-        self._time_intervals = time_intervals
+        else:
 
+            # start out with no time bins selection
+            all_idx = np.zeros(len(self._binned_spectrum_set.time_intervals), dtype=bool)
 
-        tmp_counts = []
-        tmp_err = []  # Temporary list to hold the err counts per chan
+            for start, stop in zip(starts, stops):
 
-        if self._poly_fit_exists:
+                # since we are sure that the interval bounds
+                # are aligned with the true ones, we do not care if
+                # it is inner or outer
 
-            if not self._poly_fit_exists:
-                raise RuntimeError('A polynomial fit to the channels does not exist!')
+                all_idx = np.logical_or(all_idx, self._select_bins(start, stop))
 
-            for chan in range(self._n_channels):
+            # sum along the time axis
+            self._counts = self._binned_spectrum_set.counts_per_bin[all_idx].sum(axis=0)
 
-                total_counts = 0
-                counts_err = 0
+            self._exposure = self._binned_spectrum_set.exposure_per_bin[all_idx].sum()
 
-                for tmin, tmax in zip(self._time_intervals.start_times, self._time_intervals.stop_times):
-                    # Now integrate the appropriate background polynomial
-                    total_counts += self._polynomials[chan].integral(tmin, tmax)
-                    counts_err += (self._polynomials[chan].integral_error(tmin, tmax)) ** 2
+        # the selected time intervals
 
-                tmp_counts.append(total_counts)
+        self._time_intervals = time_intervals
 
-                tmp_err.append(np.sqrt(counts_err))
 
-            self._poly_counts = np.array(tmp_counts)
+        if self._poly_fit_exists:
 
-            self._poly_count_err = np.array(tmp_err)
+            poly_counts, poly_count_err = self._get_bulk_poly_counts(np.array(self._time_intervals.start_times),
+                                                                     np.array(self._time_intervals.stop_times))
 
+            self._poly_counts = poly_counts.sum(axis=0)
 
-        self._exposure = self._binned_spectrum_set.exposure_per_bin[all_idx].sum()
+            self._poly_count_err = np.sqrt(np.sum(poly_count_err ** 2, axis=0))
 
         self._active_dead_time = total_time - self._exposure
 
@@ -403,14 +522,11 @@ class BinnedSpectrumSeries(TimeSeries):
         """
         calculate the exposure over the given interval
 
-        :param start: start time
-        :param stop:  stop time
+        :param start: start time (or array of start times)
+        :param stop:  stop time (or array of stop times)
         :return:
         """
 
+        _, exposure = self._counts_and_exposure_over_intervals(start, stop)
 
-        mask = self._select_bins(start, stop)
-
-
-
-        return self._binned_spectrum_set.exposure_per_bin[mask].sum()
\ No newline at end of file
+        return exposure
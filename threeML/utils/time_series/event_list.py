@@ -15,7 +15,7 @@ from threeML.io.progress_bar import progress_bar
 from threeML.io.rich_display import display
 from threeML.utils.binner import TemporalBinner
 from threeML.utils.time_interval import TimeIntervalSet
-from threeML.utils.time_series.polynomial import polyfit, unbinned_polyfit
+from threeML.utils.time_series.polynomial import polyfit, unbinned_polyfit, PolynomialSet
 from threeML.utils.time_series.time_series import TimeSeries
 from threeML.io.plotting.light_curve_plots import binned_light_curve_plot
 
@@ -37,6 +37,33 @@ def ceildiv(a, b):
     return -(-a // b)
 
 
+def compact_measurement(measurement):
+    """
+    Store integer measurements (PHA channels) in the smallest unsigned integer type which can hold them (uint8 for up
+    to 256 channels, uint16 for up to 65536). Anything else (energies, negative values) is returned unchanged
+
+    :param measurement: array of event energies or pha channels
+    :return: the same values, possibly with a smaller data type
+    """
+
+    measurement = np.asarray(measurement)
+
+    if measurement.size == 0 or not np.issubdtype(measurement.dtype, np.integer):
+
+        return measurement
+
+    min_value = measurement.min()
+    max_value = measurement.max()
+
+    for dtype in (np.uint8, np.uint16):
+
+        if min_value >= 0 and max_value <= np.iinfo(dtype).max:
+
+            return measurement.astype(dtype)
+
+    return measurement
+
+
 class EventList(TimeSeries):
 
     def __init__(self,
@@ -81,8 +108,11 @@ class EventList(TimeSeries):
         super(EventList, self).__init__(start_time, stop_time, n_channels, native_quality, first_channel, ra, dec,
                                         mission, instrument, verbose, edges)
 
-        self._arrival_times = np.asarray(arrival_times)
-        self._measurement = np.asarray(measurement)
+        # the arrival times are kept in double precision (single precision offsets from the trigger would already
+        # round them to ~60 us after 1000 s), while the channels are stored in the smallest type that can hold them
+
+        self._arrival_times = np.asarray(arrival_times, dtype=float)
+        self._measurement = compact_measurement(measurement)
 
         self._temporal_binner = None
 
@@ -90,6 +120,23 @@ class EventList(TimeSeries):
             0], "Arrival time (%d) and energies (%d) have different shapes" % (self._arrival_times.shape[0],
                                                                                self._measurement.shape[0])
 
+        # events are usually already sorted in time, in which case no sorted copy is needed. Otherwise we keep the
+        # indexes which sort them (see _to_time_order)
+
+        if np.all(self._arrival_times[1:] >= self._arrival_times[:-1]):
+
+            self._time_order = None
+
+            self._sorted_arrival_times = self._arrival_times
+
+        else:
+
+            # mergesort is stable, so simultaneous events keep their order
+
+            self._time_order = np.argsort(self._arrival_times, kind='mergesort')
+
+            self._sorted_arrival_times = self._arrival_times[self._time_order]
+
     @property
     def n_events(self):
 
@@ -200,13 +247,15 @@ class EventList(TimeSeries):
 
             self._temporal_binner = TemporalBinner.bin_by_bayesian_blocks(events, p0)
 
-    def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False):
-        # type: (float, float, float, bool) -> None
+    def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False, max_bins=None):
+        # type: (float, float, float, bool, int) -> None
         """
         :param start:
         :param stop:
         :param dt:
         :param use_binner:
+        :param max_bins: if given, consecutive bins are merged so that at most max_bins bins are plotted (for example
+        the number of pixels across the figure)
 
         """
 
@@ -219,16 +268,14 @@ class EventList(TimeSeries):
 
             # perhaps we want to look a little before or after the binner
             if start < bins[0]:
-                pre_bins = np.arange(start, bins[0], dt).tolist()[:-1]
-
-                pre_bins.extend(bins)
+                pre_bins = np.arange(start, bins[0], dt)[:-1]
 
-                bins = pre_bins
+                bins = np.concatenate((pre_bins, bins))
 
             if stop > bins[-1]:
                 post_bins = np.arange(bins[-1], stop, dt)
 
-                bins.extend(post_bins[1:])
+                bins = np.concatenate((bins, post_bins[1:]))
 
         else:
 
@@ -236,55 +283,46 @@ class EventList(TimeSeries):
 
             bins = np.arange(start, stop + dt, dt)
 
-        cnts, bins = np.histogram(self.arrival_times, bins=bins)
-        time_bins = np.array([[bins[i], bins[i + 1]] for i in range(len(bins) - 1)])
+        starts = bins[:-1]
+        stops = bins[1:]
 
-        #width = np.diff(bins)
-        width = []
-
-        # now we want to get the estimated background from the polynomial fit
+        # count the events in each bin with a binary search in the time-sorted events. As in np.histogram, the
+        # last bin includes its right edge
 
-        if self.poly_fit_exists:
+        event_index = np.searchsorted(self._sorted_arrival_times, bins, side='left')
+        event_index[-1] = np.searchsorted(self._sorted_arrival_times, bins[-1], side='right')
 
-            # we will store the bkg rate for each time bin
+        cnts = np.diff(event_index)
 
-            bkg = []
+        # we will use the exposure for the width
 
-            for j, tb in enumerate(time_bins):
+        width = self._exposures_over_intervals(starts, stops)
 
-                # zero out the bkg
-                tmpbkg = 0.
+        # now we want to get the estimated background from the polynomial fit
 
-                # we will use the exposure for the width
+        if self.poly_fit_exists:
 
-                this_width = self.exposure_over_interval(tb[0], tb[1])
+            bkg_counts = self.get_total_poly_count(starts, stops)
 
-                # sum up the counts over this interval
+        else:
 
-                for poly in self.polynomials:
+            bkg_counts = None
 
-                    tmpbkg += poly.integral(tb[0], tb[1])
+        starts, stops, cnts, width, bkg_counts = self._downsample_light_curve(starts, stops, cnts, width, bkg_counts,
+                                                                             max_bins)
 
-                # capture the exposure
+        time_bins = np.vstack((starts, stops)).T
 
-                width.append(this_width)
+        # the bkg *rate*
 
-                # capture the bkg *rate*
+        if bkg_counts is not None:
 
-                bkg.append(tmpbkg / this_width)
+            bkg = bkg_counts / width
 
         else:
 
             bkg = None
 
-            for j, tb in enumerate(time_bins):
-
-                this_width = self.exposure_over_interval(tb[0], tb[1])
-
-                width.append(this_width)
-
-        width = np.array(width)
-
         # pass all this to the light curve plotter
 
         if self.time_intervals is not None:
@@ -323,22 +361,17 @@ class EventList(TimeSeries):
         # this will be a boolean list and the sum will be the
         # number of events
 
-        return self._select_events(start, stop).sum()
+        first_event, last_event = self._get_event_ranges(start, stop)
 
-    def count_per_channel_over_interval(self, start, stop):
-
-        channels = range(self._first_channel, self._n_channels + self._first_channel)
-
-        counts_per_channel = np.zeros(len(channels))
+        return last_event - first_event
 
-        selection = self._select_events(start, stop)
+    def count_per_channel_over_interval(self, start, stop):
 
-        for i, channel in enumerate(channels):
-            channel_mask = self._measurement[selection] == channel
+        first_event, last_event = self._get_event_ranges(start, stop)
 
-            counts_per_channel[i] += channel_mask.sum()
+        counts_per_channel = np.bincount(self._get_channel_index(first_event, last_event), minlength=self._n_channels)
 
-        return counts_per_channel
+        return counts_per_channel.astype(float)
 
     def _select_events(self, start, stop):
         """
@@ -350,6 +383,197 @@ class EventList(TimeSeries):
 
         return np.logical_and(start <= self._arrival_times, self._arrival_times <= stop)
 
+    def _to_time_order(self, array):
+        """
+        Reorder an array with one element per event so that it follows the time order of the events (the array
+        itself is returned if the events are already sorted)
+
+        :param array: array with one element per event
+        :return: the array in time order
+        """
+
+        if self._time_order is None:
+
+            return array
+
+        else:
+
+            return array[self._time_order]
+
+    def _get_event_ranges(self, starts, stops):
+        """
+        Find the events with start <= arrival time <= stop (the same ones _select_events would select) with a binary
+        search. They are the events from first_event (included) to last_event (excluded) in time order
+
+        :param starts: start time (or array of start times)
+        :param stops: stop time (or array of stop times)
+        :return: (first_event, last_event)
+        """
+
+        first_event = np.searchsorted(self._sorted_arrival_times, starts, side='left')
+        last_event = np.maximum(np.searchsorted(self._sorted_arrival_times, stops, side='right'), first_event)
+
+        return first_event, last_event
+
+    def _update_data_checksum(self, checksum):
+
+        checksum.update(np.ascontiguousarray(self._arrival_times).tostring())
+        checksum.update(self._measurement.dtype.str)
+        checksum.update(np.ascontiguousarray(self._measurement).tostring())
+
+    def _get_channel_index(self, first_event, last_event):
+        """
+        Returns the index of the channel of the events from first_event (included) to last_event (excluded) in time
+        order, leaving out the events which do not fall in any channel. The indexes are computed on the fly, so that
+        they do not need to be stored for all the events
+
+        :param first_event: index of the first event (in time order)
+        :param last_event: index of the last event (excluded)
+        :return: array of indexes
+        """
+
+        if self._time_order is None:
+
+            measurement = self._measurement[first_event:last_event]
+
+        else:
+
+            measurement = self._measurement[self._time_order[first_event:last_event]]
+
+        if np.issubdtype(measurement.dtype, np.integer):
+
+            # unsigned channels cannot be shifted in place
+
+            channels = measurement.astype(int) - self._first_channel
+
+            valid = (channels >= 0) & (channels < self._n_channels)
+
+        else:
+
+            channels = measurement - self._first_channel
+
+            valid = (channels >= 0) & (channels < self._n_channels) & (channels == np.floor(channels))
+
+        return channels[valid].astype(int)
+
+    def _exposures_over_intervals(self, starts, stops):
+        """
+        Compute the exposure of many intervals. Sub-classes which can compute exposure_over_interval on arrays
+        override this
+
+        :param starts: array of start times
+        :param stops: array of stop times
+        :return: array of exposures
+        """
+
+        return np.array([self.exposure_over_interval(start, stop) for start, stop in zip(starts, stops)])
+
+    def get_bulk_selection(self, time_intervals):
+        """
+        Compute, for each one of the given time intervals, the same quantities that set_active_time_intervals computes
+        for a single selection: the counts per channel, the exposure, and (if a polynomial fit exists) the background
+        counts per channel with their errors. The current active selection is not changed.
+
+        The events are histogrammed in one pass over the time-sorted events, and the exposures and the integrals of
+        the polynomials are computed for all intervals at once.
+
+        :param time_intervals: a TimeIntervalSet
+        :return: a dictionary with the arrays 'counts' and (if a polynomial fit exists) 'poly counts' and
+        'poly counts error' with shape (number of intervals, number of channels), and the array 'exposure' with shape
+        (number of intervals,)
+        """
+
+        starts = np.array(time_intervals.start_times, dtype=float)
+        stops = np.array(time_intervals.stop_times, dtype=float)
+
+        first_events, last_events = self._get_event_ranges(starts, stops)
+
+        counts = np.zeros((len(starts), self._n_channels), dtype=int)
+
+        for i, (first_event, last_event) in enumerate(zip(first_events, last_events)):
+
+            counts[i, :] = np.bincount(self._get_channel_index(first_event, last_event), minlength=self._n_channels)
+
+        bulk_selection = {'counts': counts, 'exposure': self._exposures_over_intervals(starts, stops)}
+
+        if self._poly_fit_exists:
+
+            bulk_selection['poly counts'], bulk_selection['poly counts error'] = self._get_bulk_poly_counts(starts,
+                                                                                                           stops)
+
+        return bulk_selection
+
+    def _get_selection_statistics(self, time_intervals):
+        """
+        Compute the total counts per channel and the total exposure of the given time intervals, with one bincount
+        over the selected events and one exposure computation for all the intervals. As when summing the intervals
+        one at the time, events in overlapping intervals are counted more than once
+
+        :param time_intervals: a TimeIntervalSet
+        :return: (counts per channel, exposure)
+        """
+
+        starts = np.array(time_intervals.start_times, dtype=float)
+        stops = np.array(time_intervals.stop_times, dtype=float)
+
+        first_events, last_events = self._get_event_ranges(starts, stops)
+
+        selected_channels = np.concatenate([np.zeros(0, dtype=int)] +
+                                           [self._get_channel_index(first_event, last_event)
+                                            for first_event, last_event in zip(first_events, last_events)])
+
+        counts = np.bincount(selected_channels, minlength=self._n_channels).astype(float)
+
+        exposure = np.sum(self._exposures_over_intervals(starts, stops))
+
+        return counts, exposure
+
+    def _select_active_time_intervals(self, *args):
+        """
+        Set the active time intervals from the strings and compute the counts per channel and (if a polynomial fit
+        exists) the background counts per channel with their errors. The events are counted with one bincount over the
+        time-sorted events, and the polynomials of all channels are integrated at once.
+
+        :param args: the time intervals as strings 'tmin-tmax'
+        :return: (first_events, last_events) the ranges of the time-sorted events in each interval (see
+        _get_event_ranges). The ranges do not overlap, so that an event on the boundary between two intervals is
+        counted once
+        """
+
+        self._time_selection_exists = True
+
+        time_intervals = TimeIntervalSet.from_strings(*args)
+
+        time_intervals.merge_intersecting_intervals(in_place=True)
+
+        self._time_intervals = time_intervals
+
+        starts = np.array(time_intervals.start_times, dtype=float)
+        stops = np.array(time_intervals.stop_times, dtype=float)
+
+        # the merged intervals are sorted and can only touch at the boundaries, so that removing the events already
+        # selected by the previous interval makes the ranges disjoint
+
+        first_events, last_events = self._get_event_ranges(starts, stops)
+
+        first_events[1:] = np.maximum(first_events[1:], np.maximum.accumulate(last_events[:-1]))
+        last_events = np.maximum(last_events, first_events)
+
+        selected_channels = np.concatenate([self._get_channel_index(first_event, last_event)
+                                            for first_event, last_event in zip(first_events, last_events)])
+
+        self._counts = np.bincount(selected_channels, minlength=self._n_channels)
+
+        if self._poly_fit_exists:
+
+            poly_counts, poly_count_err = self._get_bulk_poly_counts(starts, stops)
+
+            self._poly_counts = poly_counts.sum(axis=0)
+
+            self._poly_count_err = np.sqrt(np.sum(poly_count_err ** 2, axis=0))
+
+        return first_events, last_events
+
     def _fit_polynomials(self):
         """
 
@@ -468,7 +692,7 @@ class EventList(TimeSeries):
 
         # We are now ready to return the polynomials
 
-        self._polynomials = polynomials
+        self._polynomials = PolynomialSet(polynomials)
 
     def _unbinned_fit_polynomials(self):
 
@@ -553,7 +777,7 @@ class EventList(TimeSeries):
 
         # We are now ready to return the polynomials
 
-        self._polynomials = polynomials
+        self._polynomials = PolynomialSet(polynomials)
 
 
 class EventListWithDeadTime(EventList):
@@ -602,117 +826,110 @@ class EventListWithDeadTime(EventList):
 
         if dead_time is not None:
 
-            self._dead_time = np.asarray(dead_time)
+            dead_time = np.asarray(dead_time, dtype=float)
 
-            assert self._arrival_times.shape[0] == self._dead_time.shape[
+            assert self._arrival_times.shape[0] == dead_time.shape[
                 0], "Arrival time (%d) and Dead Time (%d) have different shapes" % (self._arrival_times.shape[0],
-                                                                                    self._dead_time.shape[0])
+                                                                                    dead_time.shape[0])
+
+            self._compact_dead_time(dead_time)
 
         else:
 
-            self._dead_time = None
+            self._dead_time_base = None
 
-    def exposure_over_interval(self, start, stop):
+    def _compact_dead_time(self, dead_time):
         """
-        calculate the exposure over the given interval
+        Store the dead time without keeping one value per event. Most events have the same (smallest) dead time, as
+        in GBM where only the overflow events have a longer one, so we keep that base value and the excess dead time
+        of the few events which exceed it, in time order. The dead time of any range of events is then the base value
+        times the number of events, plus the cumulative excess of the events in the range
 
-        :param start: start time
-        :param stop:  stop time
-        :return:
+        :param dead_time: array of dead time per event
+        :return: none
         """
 
-        mask = self._select_events(start, stop)
-
-        if self._dead_time is not None:
-
-            interval_deadtime = (self._dead_time[mask]).sum()
-
-        else:
-
-            interval_deadtime = 0
-
-        return (stop - start) - interval_deadtime
-
-    def set_active_time_intervals(self, *args):
-        '''Set the time interval(s) to be used during the analysis.
+        dead_time = self._to_time_order(dead_time)
 
-        Specified as 'tmin-tmax'. Intervals are in seconds. Example:
+        self._dead_time_base = dead_time.min() if dead_time.shape[0] > 0 else 0.
 
-        set_active_time_intervals("0.0-10.0")
+        excess = dead_time - self._dead_time_base
 
-        which will set the energy range 0-10. seconds.
-        '''
+        self._excess_dead_time_events = np.flatnonzero(excess > 0)
 
-        self._time_selection_exists = True
+        self._cumulative_excess_dead_time = np.concatenate(([0.],
+                                                            np.cumsum(excess[self._excess_dead_time_events])))
 
-        interval_masks = []
+    def _update_data_checksum(self, checksum):
 
-        time_intervals = TimeIntervalSet.from_strings(*args)
+        super(EventListWithDeadTime, self)._update_data_checksum(checksum)
 
-        time_intervals.merge_intersecting_intervals(in_place=True)
+        if self._dead_time_base is not None:
 
-        for interval in time_intervals:
-            tmin = interval.start_time
-            tmax = interval.stop_time
+            checksum.update(repr(self._dead_time_base))
+            checksum.update(np.ascontiguousarray(self._excess_dead_time_events).tostring())
+            checksum.update(np.ascontiguousarray(self._cumulative_excess_dead_time).tostring())
 
-            mask = self._select_events(tmin, tmax)
+    def _dead_time_over_ranges(self, first_events, last_events):
+        """
+        Compute the dead time of the events from first_events (included) to last_events (excluded) in time order
 
-            interval_masks.append(mask)
+        :param first_events: index (or array of indexes) of the first events
+        :param last_events: index (or array of indexes) of the last events
+        :return: dead time (or array of dead times)
+        """
 
-        self._time_intervals = time_intervals
+        first_excess = np.searchsorted(self._excess_dead_time_events, first_events)
+        last_excess = np.searchsorted(self._excess_dead_time_events, last_events)
 
-        time_mask = interval_masks[0]
-        if len(interval_masks) > 1:
-            for mask in interval_masks[1:]:
-                time_mask = np.logical_or(time_mask, mask)
+        return self._dead_time_base * (last_events - first_events) + \
+               self._cumulative_excess_dead_time[last_excess] - self._cumulative_excess_dead_time[first_excess]
 
-        tmp_counts = []    # Temporary list to hold the total counts per chan
+    def exposure_over_interval(self, start, stop):
+        """
+        calculate the exposure over the given interval
 
-        for chan in range(self._first_channel, self._n_channels + self._first_channel):
+        :param start: start time (or array of start times)
+        :param stop:  stop time (or array of stop times)
+        :return:
+        """
 
-            channel_mask = self._measurement == chan
-            counts_mask = np.logical_and(channel_mask, time_mask)
-            total_counts = len(self._arrival_times[counts_mask])
+        if self._dead_time_base is not None:
 
-            tmp_counts.append(total_counts)
+            first_event, last_event = self._get_event_ranges(start, stop)
 
-        self._counts = np.array(tmp_counts)
+            interval_deadtime = self._dead_time_over_ranges(first_event, last_event)
 
-        tmp_counts = []
-        tmp_err = []    # Temporary list to hold the err counts per chan
+        else:
 
-        if self._poly_fit_exists:
+            interval_deadtime = 0
 
-            if not self._poly_fit_exists:
-                raise RuntimeError('A polynomial fit to the channels does not exist!')
+        return (stop - start) - interval_deadtime
 
-            for chan in range(self._n_channels):
+    def _exposures_over_intervals(self, starts, stops):
 
-                total_counts = 0
-                counts_err = 0
+        return self.exposure_over_interval(starts, stops)
 
-                for tmin, tmax in zip(self._time_intervals.start_times, self._time_intervals.stop_times):
-                    # Now integrate the appropriate background polynomial
-                    total_counts += self._polynomials[chan].integral(tmin, tmax)
-                    counts_err += (self._polynomials[chan].integral_error(tmin, tmax))**2
+    def set_active_time_intervals(self, *args):
+        '''Set the time interval(s) to be used during the analysis.
 
-                tmp_counts.append(total_counts)
+        Specified as 'tmin-tmax'. Intervals are in seconds. Example:
 
-                tmp_err.append(np.sqrt(counts_err))
+        set_active_time_intervals("0.0-10.0")
 
-            self._poly_counts = np.array(tmp_counts)
+        which will set the energy range 0-10. seconds.
+        '''
 
-            self._poly_count_err = np.array(tmp_err)
+        first_events, last_events = self._select_active_time_intervals(*args)
 
         # Dead time correction
 
-        exposure = 0.
-        for interval in self._time_intervals:
-            exposure += interval.duration
+        exposure = np.sum(np.array(self._time_intervals.stop_times) - np.array(self._time_intervals.start_times))
+
+        if self._dead_time_base is not None:
 
-        if self._dead_time is not None:
+            total_dead_time = np.sum(self._dead_time_over_ranges(first_events, last_events))
 
-            total_dead_time = self._dead_time[time_mask].sum()
         else:
 
             total_dead_time = 0.
@@ -780,107 +997,89 @@ class EventListWithDeadTimeFraction(EventList):
 
             self._dead_time_fraction = None
 
-    def exposure_over_interval(self, start, stop):
-        """
-        calculate the exposure over the given interval
+        self._cumulative_dead_time_fraction = None
 
-        :param start: start time
-        :param stop:  stop time
-        :return:
-        """
+    def _update_data_checksum(self, checksum):
 
-        mask = self._select_events(start, stop)
-
-        interval = stop - start
+        super(EventListWithDeadTimeFraction, self)._update_data_checksum(checksum)
 
         if self._dead_time_fraction is not None:
 
-            interval_deadtime = (self._dead_time_fraction[mask]).mean() * interval
-
-        else:
-
-            interval_deadtime = 0
-
-        return interval - interval_deadtime
+            checksum.update(np.ascontiguousarray(self._dead_time_fraction, dtype=float).tostring())
 
-    def set_active_time_intervals(self, *args):
-        '''Set the time interval(s) to be used during the analysis.
+    def _get_cumulative_dead_time_fraction(self):
+        """
+        Returns the cumulative sum of the dead time fractions of the events in time order (starting from 0), so that the
+        average dead time fraction of any interval can be computed with a subtraction
 
-        Specified as 'tmin-tmax'. Intervals are in seconds. Example:
+        :return: array of cumulative dead time fractions
+        """
 
-        set_active_time_intervals("0.0-10.0")
+        if self._cumulative_dead_time_fraction is None:
 
-        which will set the energy range 0-10. seconds.
-        '''
+            self._cumulative_dead_time_fraction = np.concatenate(([0.],
+                                                                  np.cumsum(self._to_time_order(
+                                                                      self._dead_time_fraction))))
 
-        self._time_selection_exists = True
+        return self._cumulative_dead_time_fraction
 
-        interval_masks = []
+    def exposure_over_interval(self, start, stop):
+        """
+        calculate the exposure over the given interval
 
-        time_intervals = TimeIntervalSet.from_strings(*args)
+        :param start: start time (or array of start times)
+        :param stop:  stop time (or array of stop times)
+        :return:
+        """
 
-        time_intervals.merge_intersecting_intervals(in_place=True)
+        interval = stop - start
 
-        for interval in time_intervals:
-            tmin = interval.start_time
-            tmax = interval.stop_time
+        if self._dead_time_fraction is not None:
 
-            mask = self._select_events(tmin, tmax)
+            first_event, last_event = self._get_event_ranges(start, stop)
 
-            interval_masks.append(mask)
+            cumulative_dead_time_fraction = self._get_cumulative_dead_time_fraction()
 
-        self._time_intervals = time_intervals
+            # average dead time fraction of the events in the interval (nan if there are no events, as the mean of an
+            # empty selection)
 
-        time_mask = interval_masks[0]
-        if len(interval_masks) > 1:
-            for mask in interval_masks[1:]:
-                time_mask = np.logical_or(time_mask, mask)
+            with np.errstate(divide='ignore', invalid='ignore'):
 
-        tmp_counts = []    # Temporary list to hold the total counts per chan
+                mean_dead_time_fraction = (cumulative_dead_time_fraction[last_event] -
+                                           cumulative_dead_time_fraction[first_event]) / (last_event - first_event)
 
-        for chan in range(self._first_channel, self._n_channels + self._first_channel):
-            channel_mask = self._measurement == chan
-            counts_mask = np.logical_and(channel_mask, time_mask)
-            total_counts = len(self._arrival_times[counts_mask])
+            interval_deadtime = mean_dead_time_fraction * interval
 
-            tmp_counts.append(total_counts)
+        else:
 
-        self._counts = np.array(tmp_counts)
+            interval_deadtime = 0
 
-        tmp_counts = []
-        tmp_err = []    # Temporary list to hold the err counts per chan
+        return interval - interval_deadtime
 
-        if self._poly_fit_exists:
+    def _exposures_over_intervals(self, starts, stops):
 
-            if not self._poly_fit_exists:
-                raise RuntimeError('A polynomial fit to the channels does not exist!')
+        return self.exposure_over_interval(starts, stops)
 
-            for chan in range(self._n_channels):
+    def set_active_time_intervals(self, *args):
+        '''Set the time interval(s) to be used during the analysis.
 
-                total_counts = 0
-                counts_err = 0
+        Specified as 'tmin-tmax'. Intervals are in seconds. Example:
 
-                for tmin, tmax in zip(self._time_intervals.start_times, self._time_intervals.stop_times):
-                    # Now integrate the appropriate background polynomial
-                    total_counts += self._polynomials[chan].integral(tmin, tmax)
-                    counts_err += (self._polynomials[chan].integral_error(tmin, tmax))**2
+        set_active_time_intervals("0.0-10.0")
 
-                tmp_counts.append(total_counts)
+        which will set the energy range 0-10. seconds.
+        '''
 
-                tmp_err.append(np.sqrt(counts_err))
+        self._select_active_time_intervals(*args)
 
-            self._poly_counts = np.array(tmp_counts)
+        # Dead time correction. The average dead time fraction is computed separately for each interval
 
-            self._poly_count_err = np.array(tmp_err)
+        starts = np.array(self._time_intervals.start_times, dtype=float)
+        stops = np.array(self._time_intervals.stop_times, dtype=float)
 
-        # Dead time correction
+        exposure = np.sum(stops - starts)
 
-        exposure = 0.
-        total_dead_time = 0.
-        for interval, imask in zip(self._time_intervals, interval_masks):
-            exposure += interval.duration
-            if self._dead_time_fraction is not None:
-                total_dead_time += interval.duration * self._dead_time_fraction[imask].mean()
+        total_dead_time = exposure - np.sum(self.exposure_over_interval(starts, stops))
 
         self._exposure = exposure - total_dead_time
 
@@ -947,82 +1146,81 @@ class EventListWithLiveTime(EventList):
         self._live_time_starts = np.asarray(live_time_starts)
         self._live_time_stops = np.asarray(live_time_stops)
 
-    def exposure_over_interval(self, start, stop):
-        """
-
-        :param start: start time of interval
-        :param stop: stop time of interval
-        :return: exposure
-        """
-
-        # First see if the interval is completely contained inside a
-        # livetime interval. In this case we only compute that.
+        # Table of the live time accumulated before each live time bin, used to compute exposures with a binary search
 
-        # Note that this is explicitly on the open boundary of the
-        # intervals because the closed boundary is covered in the
-        # next step
+        self._compute_cumulative_live_time()
 
-        inside_idx = np.logical_and(self._live_time_starts < start, stop < self._live_time_stops)
+    def _update_data_checksum(self, checksum):
 
-        # see if it contains elements
+        super(EventListWithLiveTime, self)._update_data_checksum(checksum)
 
-        if self._live_time[inside_idx]:
+        for array in (self._live_time, self._live_time_starts, self._live_time_stops):
 
-            # we want to take a fraction of the live time covered
+            checksum.update(np.ascontiguousarray(array, dtype=float).tostring())
 
-            dt = self._live_time_stops[inside_idx] - self._live_time_starts[inside_idx]
+    def _compute_cumulative_live_time(self):
 
-            fraction = (stop - start) / dt
+        idx = np.argsort(self._live_time_starts)
 
-            total_livetime = self._live_time[inside_idx] * fraction
+        self._sorted_live_time_starts = np.asarray(self._live_time_starts[idx], dtype=float)
 
-        else:
+        self._sorted_live_time = np.asarray(self._live_time[idx], dtype=float)
 
-            # First we get the live time of bins that are fully contained in the given interval
-            # We now go for the closed interval because it is possible to have overlap with other intervals
-            # when a closed interval exists... but not when there is only an open interval
+        self._sorted_live_time_widths = np.asarray(self._live_time_stops[idx], dtype=float) - \
+                                        self._sorted_live_time_starts
 
-            full_inclusion_idx = np.logical_and(start <= self._live_time_starts, stop >= self._live_time_stops)
+        self._cumulative_live_time = np.concatenate(([0.0], np.cumsum(self._sorted_live_time)))
 
-            full_inclusion_livetime = self._live_time[full_inclusion_idx].sum()
+    def _live_time_before(self, time):
+        """
+        Returns the live time accumulated from the beginning of the live time bins to the given time(s). The live time
+        within a bin is assumed to be uniform, and there is no live time in the gaps between the bins
 
-            # Now we get the fractional parts on the left and right
+        :param time: a time or an array of times
+        :return: the live time (same shape as time)
+        """
 
-            # Get the fractional part of the left bin
+        # Index of the bin starting before each time (-1 if the time is before all bins)
 
-            left_remainder_idx = np.logical_and(start <= self._live_time_stops, self._live_time_starts <= start)
+        idx = np.searchsorted(self._sorted_live_time_starts, time, side='right') - 1
 
-            dt = self._live_time_stops[left_remainder_idx] - self._live_time_starts[left_remainder_idx]
+        in_range = idx >= 0
 
-            # we want the distance to the stop of this bin
+        idx = np.maximum(idx, 0)
 
-            distance_from_next_bin = self._live_time_stops[left_remainder_idx] - start
+        widths = self._sorted_live_time_widths[idx]
 
-            fraction = distance_from_next_bin / dt
+        # Fraction of the bin before the time (bins of zero width are either fully before or after the time)
 
-            left_fractional_livetime = self._live_time[left_remainder_idx] * fraction
+        with np.errstate(divide='ignore', invalid='ignore'):
 
-            # Get the fractional part of the right bin
+            fraction = np.where(widths > 0, (time - self._sorted_live_time_starts[idx]) / widths, 1.0)
 
-            right_remainder_idx = np.logical_and(self._live_time_starts <= stop, stop <= self._live_time_stops)
+        fraction = np.clip(fraction, 0.0, 1.0)
 
-            dt = self._live_time_stops[right_remainder_idx] - self._live_time_starts[right_remainder_idx]
+        live_time = self._cumulative_live_time[idx] + self._sorted_live_time[idx] * fraction
 
-            # we want the distance from the last full bin
+        return np.where(in_range, live_time, 0.0)
 
-            distance_from_next_bin = stop - self._live_time_starts[right_remainder_idx]
+    def exposure_over_interval(self, start, stop):
+        """
+        calculate the exposure over the given interval, from the live time of the bins fully contained in the interval
+        plus the fractions of the bins at the edges
 
-            fraction = distance_from_next_bin / dt
+        :param start: start time of interval (or array of start times)
+        :param stop: stop time of interval (or array of stop times)
+        :return: exposure
+        """
 
-            right_fractional_livetime = self._live_time[right_remainder_idx] * fraction
+        exposure = self._live_time_before(stop) - self._live_time_before(start)
 
-            # sum up all the live time
+        # a numpy scalar for scalar times, an array otherwise
 
-            total_livetime = full_inclusion_livetime + left_fractional_livetime + right_fractional_livetime
+        return exposure[()]
 
-        # the sum at the end converts all the arrays to floats
+    def _exposures_over_intervals(self, starts, stops):
 
-        return total_livetime.sum()
+        return self.exposure_over_interval(np.asarray(starts, dtype=float), np.asarray(stops, dtype=float))
 
     def set_active_time_intervals(self, *args):
         '''Set the time interval(s) to be used during the analysis.
@@ -1034,65 +1232,7 @@ class EventListWithLiveTime(EventList):
         which will set the energy range 0-10. seconds.
         '''
 
-        self._time_selection_exists = True
-
-        interval_masks = []
-
-        time_intervals = TimeIntervalSet.from_strings(*args)
-
-        time_intervals.merge_intersecting_intervals(in_place=True)
-
-        for interval in time_intervals:
-            tmin = interval.start_time
-            tmax = interval.stop_time
-            mask = self._select_events(tmin, tmax)
-
-            interval_masks.append(mask)
-
-        self._time_intervals = time_intervals
-
-        time_mask = interval_masks[0]
-        if len(interval_masks) > 1:
-            for mask in interval_masks[1:]:
-                time_mask = np.logical_or(time_mask, mask)
-
-        tmp_counts = []    # Temporary list to hold the total counts per chan
-
-        for chan in range(self._first_channel, self._n_channels + self._first_channel):
-            channel_mask = self._measurement == chan
-            counts_mask = np.logical_and(channel_mask, time_mask)
-            total_counts = len(self._arrival_times[counts_mask])
-
-            tmp_counts.append(total_counts)
-
-        self._counts = np.array(tmp_counts)
-
-        tmp_counts = []
-        tmp_err = []    # Temporary list to hold the err counts per chan
-
-        if self._poly_fit_exists:
-
-            if not self._poly_fit_exists:
-                raise RuntimeError('A polynomial fit to the channels does not exist!')
-
-            # for chan in range(self._first_channel, self._n_channels + self._first_channel):
-            for chan in range(self._n_channels):
-
-                total_counts = 0
-                counts_err = 0
-
-                for tmin, tmax in zip(self._time_intervals.start_times, self._time_intervals.stop_times):
-                    # Now integrate the appropriate background polynomial
-                    total_counts += self._polynomials[chan].integral(tmin, tmax)
-                    counts_err += (self._polynomials[chan].integral_error(tmin, tmax))**2
-
-                tmp_counts.append(total_counts)
-
-                tmp_err.append(np.sqrt(counts_err))
-
-            self._poly_counts = np.array(tmp_counts)
-
-            self._poly_count_err = np.array(tmp_err)
+        self._select_active_time_intervals(*args)
 
         # Live time correction
 
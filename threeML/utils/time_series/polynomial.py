@@ -155,18 +155,171 @@ class Polynomial(object):
 
     def _eval_basis(self, x):
 
-        return (1. / self._i_plus_1) * np.power(x, self._i_plus_1)
+        # the basis runs along the last axis, so that x can be an array
+
+        return (1. / self._i_plus_1) * np.power(np.asarray(x, dtype=float)[..., np.newaxis], self._i_plus_1)
 
     def integral_error(self, xmin, xmax):
         """
         computes the integral error of an interval
-        :param xmin: start of the interval
-        :param xmax: stop of the interval
-        :return: interval error
+        :param xmin: start of the interval (or array of starts)
+        :param xmax: stop of the interval (or array of stops)
+        :return: interval error (or array of errors)
         """
         c = self._eval_basis(xmax) - self._eval_basis(xmin)
         tmp = c.dot(self._cov_matrix)
-        err2 = tmp.dot(c)
+        err2 = np.sum(tmp * c, axis=-1)
+
+        return np.sqrt(err2)
+
+
+class PolynomialSet(object):
+    def __init__(self, polynomials):
+        """
+        A set of (already fitted) polynomials, one per channel. The coefficients and the covariance matrices of all the
+        polynomials are stacked in arrays, so that the set can be evaluated and integrated for all channels and many
+        intervals at once. Polynomials of lower degree are padded with zeros. The set behaves as a sequence of the
+        original polynomials.
+
+        :param polynomials: list of Polynomial instances
+        """
+
+        self._polynomials = list(polynomials)
+
+        n_coefficients = max([len(poly.coefficients) for poly in self._polynomials])
+
+        self._coefficients = np.zeros((len(self._polynomials), n_coefficients))
+        self._covariance_matrices = np.zeros((len(self._polynomials), n_coefficients, n_coefficients))
+
+        for i, poly in enumerate(self._polynomials):
+
+            n = len(poly.coefficients)
+
+            self._coefficients[i, :n] = poly.coefficients
+            self._covariance_matrices[i, :n, :n] = poly.covariance_matrix
+
+        # the integral of x^k is x^(k+1) / (k+1)
+
+        self._i_plus_1 = np.arange(1, n_coefficients + 1, dtype=float)
+
+    @classmethod
+    def from_arrays(cls, coefficients, covariance_matrices):
+        """
+        Build the set from the stacked coefficients and covariance matrices of previous fits (for example read from a
+        file). Polynomials of lower degree are padded with NaNs, which are not part of their coefficients.
+
+        :param coefficients: array with shape (number of polynomials, number of coefficients)
+        :param covariance_matrices: array with shape (number of polynomials, number of coefficients, number of
+        coefficients)
+        :return: a PolynomialSet
+        """
+
+        coefficients = np.array(coefficients, dtype=float)
+        covariance_matrices = np.array(covariance_matrices, dtype=float)
+
+        n_coefficients = np.sum(np.isfinite(coefficients), axis=1)
+
+        polynomials = [Polynomial.from_previous_fit(coefficients[i, :n], covariance_matrices[i, :n, :n])
+                       for i, n in enumerate(n_coefficients)]
+
+        return cls(polynomials)
+
+    def __len__(self):
+
+        return len(self._polynomials)
+
+    def __iter__(self):
+
+        return iter(self._polynomials)
+
+    def __getitem__(self, item):
+
+        return self._polynomials[item]
+
+    @property
+    def coefficients(self):
+        """
+        the coefficients of all the polynomials, with shape (number of polynomials, number of coefficients)
+        :return:
+        """
+
+        return self._coefficients
+
+    @property
+    def covariance_matrices(self):
+        """
+        the covariance matrices of all the polynomials, with shape
+        (number of polynomials, number of coefficients, number of coefficients)
+        :return:
+        """
+
+        return self._covariance_matrices
+
+    def __call__(self, x):
+        """
+        Evaluate all the polynomials
+
+        :param x: value (or array of values)
+        :return: array with shape x.shape + (number of polynomials,)
+        """
+
+        powers = np.power(np.asarray(x, dtype=float)[..., np.newaxis], self._i_plus_1 - 1)
+
+        return powers.dot(self._coefficients.T)
+
+    def _integral_basis(self, xmin, xmax):
+
+        # the basis runs along the last axis
+
+        xmin = np.asarray(xmin, dtype=float)[..., np.newaxis]
+        xmax = np.asarray(xmax, dtype=float)[..., np.newaxis]
+
+        return (np.power(xmax, self._i_plus_1) - np.power(xmin, self._i_plus_1)) / self._i_plus_1
+
+    def integral(self, xmin, xmax):
+        """
+        Evaluate the integrals of all the polynomials between xmin and xmax
+
+        :param xmin: start of the interval (or array of starts)
+        :param xmax: stop of the interval (or array of stops)
+        :return: array with shape xmin.shape + (number of polynomials,)
+        """
+
+        return self._integral_basis(xmin, xmax).dot(self._coefficients.T)
+
+    def total_integral(self, xmin, xmax, mask=None):
+        """
+        Evaluate the sum of the integrals of (some of) the polynomials between xmin and xmax. The coefficients are
+        summed first, so that the cost does not depend on the number of polynomials
+
+        :param xmin: start of the interval (or array of starts)
+        :param xmax: stop of the interval (or array of stops)
+        :param mask: mask of the polynomials to sum (default: all of them)
+        :return: value (or array of values with the shape of xmin)
+        """
+
+        if mask is None:
+
+            coefficients = self._coefficients.sum(axis=0)
+
+        else:
+
+            coefficients = self._coefficients[mask].sum(axis=0)
+
+        return self._integral_basis(xmin, xmax).dot(coefficients)
+
+    def integral_error(self, xmin, xmax):
+        """
+        computes the errors on the integrals of all the polynomials between xmin and xmax
+
+        :param xmin: start of the interval (or array of starts)
+        :param xmax: stop of the interval (or array of stops)
+        :return: array with shape xmin.shape + (number of polynomials,)
+        """
+
+        c = self._integral_basis(xmin, xmax)
+
+        err2 = np.einsum('...j,pjk,...k->...p', c, self._covariance_matrices, c)
 
         return np.sqrt(err2)
 
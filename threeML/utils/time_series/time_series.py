@@ -1,17 +1,21 @@
 __author__ = 'grburgess'
 
 import collections
+import hashlib
 import os
 
 import numpy as np
 import pandas as pd
 from pandas import HDFStore
 
+from threeML.config.config import threeML_config
 from threeML.exceptions.custom_exceptions import custom_warnings
 from threeML.io.file_utils import sanitize_filename
 from threeML.utils.spectrum.binned_spectrum import Quality
 from threeML.utils.time_interval import TimeIntervalSet
-from threeML.utils.time_series.polynomial import polyfit, unbinned_polyfit, Polynomial
+from threeML.utils.time_series.polynomial import polyfit, unbinned_polyfit, Polynomial, PolynomialSet
+from threeML.utils.time_series.background_cache import get_background_cache_key, read_background_from_cache, \
+    write_background_to_cache
 
 
 class ReducingNumberOfThreads(Warning):
@@ -113,6 +117,10 @@ class TimeSeries(object):
 
         self._fit_method_info = {"bin type": None, 'fit method': None}
 
+        # computed when needed (see _get_data_checksum)
+
+        self._data_checksum = None
+
     def set_active_time_intervals(self, *args):
 
         raise RuntimeError("Must be implemented in subclass")
@@ -180,38 +188,32 @@ class TimeSeries(object):
 
         Get the total poly counts
 
-        :param start:
-        :param stop:
+        :param start: start time (or array of start times)
+        :param stop: stop time (or array of stop times)
+        :param mask: mask of the channels to sum
         :return:
         """
-        if mask is None:
-            mask = np.ones_like(self._polynomials, dtype=np.bool)
-
-        total_counts = 0
 
-        for p in np.asarray(self._polynomials)[mask]:
-            total_counts += p.integral(start, stop)
-
-        return total_counts
+        return self._polynomials.total_integral(start, stop, mask)
 
     def get_total_poly_error(self, start, stop, mask=None):
         """
 
         Get the total poly error
 
-        :param start:
-        :param stop:
+        :param start: start time (or array of start times)
+        :param stop: stop time (or array of stop times)
+        :param mask: mask of the channels to sum
         :return:
         """
-        if mask is None:
-            mask = np.ones_like(self._polynomials, dtype=np.bool)
 
-        total_counts = 0
+        poly_count_err = self._polynomials.integral_error(start, stop)
+
+        if mask is not None:
 
-        for p in np.asarray(self._polynomials)[mask]:
-            total_counts += p.integral_error(start, stop) ** 2
+            poly_count_err = poly_count_err[..., mask]
 
-        return np.sqrt(total_counts)
+        return np.sqrt(np.sum(poly_count_err ** 2, axis=-1))
 
     @property
     def bins(self):
@@ -382,26 +384,60 @@ class TimeSeries(object):
 
         self._poly_intervals = poly_intervals
 
-        # Fit the events with the given intervals
-        if unbinned:
+        self._unbinned = unbinned  # keep track!
+
+        # Restore the fit from the background cache if the same fit was already done, otherwise fit the events with
+        # the given intervals
+
+        if threeML_config['background cache']['use cache']:
+
+            cache_key = get_background_cache_key(self._get_data_checksum(), poly_intervals, self._user_poly_order,
+                                                 unbinned)
+
+            cached_fit = read_background_from_cache(cache_key)
+
+        else:
+
+            cache_key = None
+
+            cached_fit = None
 
-            self._unbinned = True  # keep track!
+        if cached_fit is not None:
 
-            self._unbinned_fit_polynomials()
+            self._polynomials, self._optimal_polynomial_grade = cached_fit
+
+            if unbinned:
+
+                self._fit_method_info['bin type'] = 'Unbinned'
+                self._fit_method_info['fit method'] = threeML_config['event list']['unbinned fit method']
+
+            else:
+
+                self._fit_method_info['bin type'] = 'Binned'
+                self._fit_method_info['fit method'] = threeML_config['event list']['binned fit method']
 
         else:
 
-            self._unbinned = False
+            if unbinned:
+
+                self._unbinned_fit_polynomials()
+
+            else:
+
+                self._fit_polynomials()
 
-            self._fit_polynomials()
+            if cache_key is not None:
+
+                write_background_to_cache(cache_key, self._polynomials, self._optimal_polynomial_grade)
 
         # we have a fit now
 
         self._poly_fit_exists = True
 
         if self._verbose:
-            print("%s %d-order polynomial fit with the %s method" % (
-                self._fit_method_info['bin type'], self._optimal_polynomial_grade, self._fit_method_info['fit method']))
+            print("%s %d-order polynomial fit with the %s method%s" % (
+                self._fit_method_info['bin type'], self._optimal_polynomial_grade, self._fit_method_info['fit method'],
+                ' (restored from the background cache)' if cached_fit is not None else ''))
             print('\n')
 
         # recalculate the selected counts
@@ -409,6 +445,66 @@ class TimeSeries(object):
         if self._time_selection_exists:
             self.set_active_time_intervals(*self._time_intervals.to_string().split(','))
 
+    def get_bulk_selection(self, time_intervals):
+        """
+        Compute, for each one of the given time intervals, the same quantities that set_active_time_intervals computes
+        for a single selection: the counts per channel, the exposure, and (if a polynomial fit exists) the background
+        counts per channel with their errors. The current active selection is not changed.
+
+        This generic implementation selects the intervals one at the time. Sub-classes can override it with a
+        faster version.
+
+        :param time_intervals: a TimeIntervalSet
+        :return: a dictionary with the arrays 'counts' and (if a polynomial fit exists) 'poly counts' and
+        'poly counts error' with shape (number of intervals, number of channels), and the array 'exposure' with shape
+        (number of intervals,)
+        """
+
+        old_time_intervals = self._time_intervals
+
+        counts = []
+        exposure = []
+        poly_counts = []
+        poly_count_err = []
+
+        for interval in time_intervals:
+
+            self.set_active_time_intervals(interval.to_string())
+
+            counts.append(np.array(self._counts))
+            exposure.append(self._exposure)
+
+            if self._poly_fit_exists:
+
+                poly_counts.append(np.array(self._poly_counts))
+                poly_count_err.append(np.array(self._poly_count_err))
+
+        # restore the original selection
+
+        if old_time_intervals is not None:
+
+            self.set_active_time_intervals(*old_time_intervals.to_string().split(','))
+
+        bulk_selection = {'counts': np.array(counts), 'exposure': np.array(exposure)}
+
+        if self._poly_fit_exists:
+
+            bulk_selection['poly counts'] = np.array(poly_counts)
+            bulk_selection['poly counts error'] = np.array(poly_count_err)
+
+        return bulk_selection
+
+    def _get_bulk_poly_counts(self, starts, stops):
+        """
+        Integrate the background polynomials of all channels over many intervals at once
+
+        :param starts: array of start times
+        :param stops: array of stop times
+        :return: the poly counts and their errors, both with shape (number of intervals, number of channels)
+        """
+
+        return self._polynomials.integral(starts, stops), self._polynomials.integral_error(starts, stops)
+
     def get_information_dict(self, use_poly=False, extract=False):
         """
         Return a PHAContainer that can be read by different builders
@@ -418,13 +514,73 @@ class TimeSeries(object):
         if not self._time_selection_exists:
             raise RuntimeError('No time selection exists! Cannot calculate rates')
 
+        return self._build_information_dict(self._counts, self._exposure, self._poly_counts, self._poly_count_err,
+                                            self._time_intervals.absolute_start_time,
+                                            self._time_intervals.absolute_stop_time,
+                                            use_poly, extract)
+
+    def get_information_dicts_from_bulk_selection(self, bulk_selection, time_intervals, use_poly=False,
+                                                  extract=False):
+        """
+        Return the PHAContainers (see get_information_dict) for all the intervals of a bulk selection, as
+        if each interval had been selected with set_active_time_intervals
+
+        :param bulk_selection: the output of get_bulk_selection
+        :param time_intervals: the TimeIntervalSet used for the bulk selection
+        :param use_poly: (bool) choose to build from the polynomial fits
+        :param extract: (bool) choose to build from the counts in the background selection
+        :return: a list of dictionaries
+        """
+
+        information_dicts = []
+
+        for i, interval in enumerate(time_intervals):
+
+            if self._poly_fit_exists:
+
+                # copy, because negative background counts are set to zero in place
+
+                poly_counts = np.array(bulk_selection['poly counts'][i])
+                poly_count_err = np.array(bulk_selection['poly counts error'][i])
+
+            else:
+
+                poly_counts = None
+                poly_count_err = None
+
+            information_dicts.append(self._build_information_dict(bulk_selection['counts'][i],
+                                                                  bulk_selection['exposure'][i],
+                                                                  poly_counts,
+                                                                  poly_count_err,
+                                                                  interval.start_time,
+                                                                  interval.stop_time,
+                                                                  use_poly, extract))
+
+        return information_dicts
+
+    def _build_information_dict(self, selected_counts, selected_exposure, poly_counts, poly_count_err, tstart, tstop,
+                                use_poly, extract):
+        """
+        Build the PHAContainer from the quantities of one selection
+
+        :param selected_counts: counts per channel in the selection
+        :param selected_exposure: exposure of the selection
+        :param poly_counts: background counts per channel in the selection (from the polynomials)
+        :param poly_count_err: errors on poly_counts
+        :param tstart: start of the selection
+        :param tstop: stop of the selection
+        :param use_poly: (bool) choose to build from the polynomial fits
+        :param extract: (bool) choose to build from the counts in the background selection
+        :return: a dictionary
+        """
+
         if extract:
 
             is_poisson = True
 
             counts_err = None
             counts = self._poly_selected_counts
-            rates = self._counts / self._poly_exposure
+            rates = selected_counts / self._poly_exposure
             rate_err = None
             exposure = self._poly_exposure
 
@@ -433,11 +589,11 @@ class TimeSeries(object):
 
             is_poisson = False
 
-            counts_err = self._poly_count_err
-            counts = self._poly_counts
-            rate_err = self._poly_count_err / self._exposure
-            rates = self._poly_counts / self._exposure
-            exposure = self._exposure
+            counts_err = poly_count_err
+            counts = poly_counts
+            rate_err = poly_count_err / selected_exposure
+            rates = poly_counts / selected_exposure
+            exposure = selected_exposure
 
             # removing negative counts
 
@@ -454,11 +610,11 @@ class TimeSeries(object):
             is_poisson = True
 
             counts_err = None
-            counts = self._counts
-            rates = self._counts / self._exposure
+            counts = selected_counts
+            rates = selected_counts / selected_exposure
             rate_err = None
 
-            exposure = self._exposure
+            exposure = selected_exposure
 
 
 
@@ -475,8 +631,8 @@ class TimeSeries(object):
 
         container_dict['instrument'] = self._instrument
         container_dict['telescope'] = self._mission
-        container_dict['tstart'] = self._time_intervals.absolute_start_time
-        container_dict['telapse'] = self._time_intervals.absolute_stop_time - self._time_intervals.absolute_start_time
+        container_dict['tstart'] = tstart
+        container_dict['telapse'] = tstop - tstart
         container_dict['channel'] = np.arange(self._n_channels) + self._first_channel
         container_dict['counts'] = counts
         container_dict['counts error'] = counts_err
@@ -629,6 +785,38 @@ class TimeSeries(object):
 
         raise NotImplementedError('this must be implemented in a subclass')
 
+    def _get_data_checksum(self):
+        """
+        Returns a checksum of the content of the time series, which identifies its fitted backgrounds in the
+        background cache. It is computed only the first time it is needed
+
+        :return: the hex digest of the checksum
+        """
+
+        if self._data_checksum is None:
+
+            checksum = hashlib.sha1()
+
+            checksum.update("%s %r %r %r %r" % (self.__class__.__name__, self._n_channels, self._first_channel,
+                                                self._start_time, self._stop_time))
+
+            self._update_data_checksum(checksum)
+
+            self._data_checksum = checksum.hexdigest()
+
+        return self._data_checksum
+
+    def _update_data_checksum(self, checksum):
+        """
+        Update the checksum with all the data which affect the fit of the background (the events or the spectra, and
+        the exposure)
+
+        :param checksum: a hashlib object
+        :return: none
+        """
+
+        raise NotImplementedError('this must be implemented in a subclass')
+
     def save_background(self, filename, overwrite=False):
         """
         save the background to an HD5F
@@ -665,18 +853,23 @@ class TimeSeries(object):
 
         with HDFStore(filename_sanitized) as store:
 
-            # extract the polynomial information and save it
+            # extract the polynomial information and save it as dense tables with one row per channel. Polynomials of
+            # lower degree are padded with NaNs
 
             if self._poly_fit_exists:
 
-                coeff = []
-                err = []
+                coefficients = np.full(self._polynomials.coefficients.shape, np.nan)
+                covariance_matrices = np.full(self._polynomials.covariance_matrices.shape, np.nan)
 
-                for poly in self._polynomials:
-                    coeff.append(poly.coefficients)
-                    err.append(poly.covariance_matrix)
-                df_coeff = pd.Series(coeff)
-                df_err = pd.Series(err)
+                for i, poly in enumerate(self._polynomials):
+
+                    n = len(poly.coefficients)
+
+                    coefficients[i, :n] = self._polynomials.coefficients[i, :n]
+                    covariance_matrices[i, :n, :n] = self._polynomials.covariance_matrices[i, :n, :n]
+
+                df_coeff = pd.DataFrame(coefficients)
+                df_err = pd.DataFrame(covariance_matrices.reshape(len(coefficients), -1))
 
             else:
 
@@ -695,7 +888,12 @@ class TimeSeries(object):
             print("\nSaved fitted background to %s.\n" % filename)
 
     def restore_fit(self, filename):
+        """
+        Restore a background fit saved with save_background
 
+        :param filename: the HDF5 file
+        :return: none
+        """
 
         filename_sanitized = sanitize_filename(filename)
 
@@ -705,61 +903,123 @@ class TimeSeries(object):
 
             covariance = store['covariance']
 
-            self._polynomials = []
+            metadata = store.get_storer('coefficients').attrs.metadata
+
+        if isinstance(coefficients, pd.DataFrame):
+
+            # one row per channel, padded with NaNs
 
-            # create new polynomials
+            coefficients = coefficients.values
+
+            n_coefficients = coefficients.shape[1]
+
+            covariance_matrices = covariance.values.reshape(len(coefficients), n_coefficients, n_coefficients)
+
+        else:
 
-            for i in range(len(coefficients)):
-                coeff = np.array(coefficients.loc[i])
+            # older files store one array per channel. Pandas stores the non-needed coeff as nans.
 
-                # make sure we get the right order
-                # pandas stores the non-needed coeff
-                # as nans.
+            coefficients = [np.array(coefficients.loc[i]) for i in range(len(coefficients))]
+            covariance = [np.array(covariance.loc[i]) for i in range(len(covariance))]
+
+            n_coefficients = max([len(coeff) for coeff in coefficients])
+
+            stacked_coefficients = np.full((len(coefficients), n_coefficients), np.nan)
+            covariance_matrices = np.full((len(coefficients), n_coefficients, n_coefficients), np.nan)
+
+            for i, (coeff, cov) in enumerate(zip(coefficients, covariance)):
 
                 coeff = coeff[np.isfinite(coeff)]
 
-                cov = covariance.loc[i]
+                stacked_coefficients[i, :len(coeff)] = coeff
+                covariance_matrices[i, :len(coeff), :len(coeff)] = cov[:len(coeff), :len(coeff)]
 
-                self._polynomials.append(Polynomial.from_previous_fit(coeff, cov))
+            coefficients = stacked_coefficients
 
-            metadata = store.get_storer('coefficients').attrs.metadata
+        self._polynomials = PolynomialSet.from_arrays(coefficients, covariance_matrices)
 
-            self._optimal_polynomial_grade = metadata['poly_order']
-            poly_selections = np.array(metadata['poly_selections'])
+        self._optimal_polynomial_grade = metadata['poly_order']
+        poly_selections = np.array(metadata['poly_selections'])
 
-            self._poly_intervals = TimeIntervalSet.from_starts_and_stops(poly_selections[:, 0], poly_selections[:, 1])
-            self._unbinned = metadata['unbinned']
+        self._poly_intervals = TimeIntervalSet.from_starts_and_stops(poly_selections[:, 0], poly_selections[:, 1])
+        self._unbinned = metadata['unbinned']
 
-            if self._unbinned:
-                self._fit_method_info['bin type'] = 'unbinned'
+        if self._unbinned:
+            self._fit_method_info['bin type'] = 'unbinned'
 
-            else:
+        else:
 
-                self._fit_method_info['bin type'] = 'binned'
+            self._fit_method_info['bin type'] = 'binned'
 
-            self._fit_method_info['fit method'] = metadata['fit_method']
+        self._fit_method_info['fit method'] = metadata['fit_method']
 
         # go thru and count the counts!
 
         self._poly_fit_exists = True
 
-
-        # we must go thru and collect the polynomial exposure and counts
+        # we must collect the polynomial exposure and counts
         # so that they be extracted if needed
-        self._poly_exposure = 0.
-        self._poly_selected_counts = []
-        for i, time_interval in enumerate(self._poly_intervals):
+
+        self._poly_selected_counts, self._poly_exposure = self._get_selection_statistics(self._poly_intervals)
+
+        if self._time_selection_exists:
+            self.set_active_time_intervals(*self._time_intervals.to_string().split(','))
+
+    def _get_selection_statistics(self, time_intervals):
+        """
+        Compute the total counts per channel and the total exposure of the given time intervals. Sub-classes can
+        override this with a faster version.
+
+        :param time_intervals: a TimeIntervalSet
+        :return: (counts per channel, exposure)
+        """
+
+        counts = np.zeros(self._n_channels)
+        exposure = 0.
+
+        for time_interval in time_intervals:
 
             t1 = time_interval.start_time
             t2 = time_interval.stop_time
 
-            self._poly_selected_counts.append(self.count_per_channel_over_interval(t1,t2))
-            self._poly_exposure += self.exposure_over_interval(t1,t2)
+            counts = counts + self.count_per_channel_over_interval(t1, t2)
+            exposure += self.exposure_over_interval(t1, t2)
 
-        self._poly_selected_counts = np.sum(self._poly_selected_counts, axis=0)
-        if self._time_selection_exists:
-            self.set_active_time_intervals(*self._time_intervals.to_string().split(','))
+        return counts, exposure
 
-    def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False):
+    def view_lightcurve(self, start=-10, stop=20., dt=1., use_binner=False, max_bins=None):
 
         raise NotImplementedError('must be implemented in subclass')
+
+    @staticmethod
+    def _downsample_light_curve(starts, stops, counts, exposure, background_counts, max_bins):
+        """
+        Merge groups of consecutive bins of a light curve so that there are at most max_bins bins (for example the
+        number of pixels across the figure). The counts, the exposures and the background counts are summed.
+
+        :param starts: array of bin starts
+        :param stops: array of bin stops
+        :param counts: array of counts per bin
+        :param exposure: array of exposures per bin
+        :param background_counts: array of background counts per bin (or None)
+        :param max_bins: maximum number of bins (None for no downsampling)
+        :return: (starts, stops, counts, exposure, background_counts) for the merged bins
+        """
+
+        n_bins = len(starts)
+
+        if max_bins is None or n_bins <= max_bins:
+
+            return starts, stops, counts, exposure, background_counts
+
+        group_size = int(np.ceil(n_bins / float(max_bins)))
+
+        first_bins = np.arange(0, n_bins, group_size)
+        last_bins = np.append(first_bins[1:], n_bins) - 1
+
+        if background_counts is not None:
+
+            background_counts = np.add.reduceat(background_counts, first_bins)
+
+        return (starts[first_bins], stops[last_bins], np.add.reduceat(counts, first_bins),
+                np.add.reduceat(exposure, first_bins), background_counts)